@@ -1,62 +1,323 @@
+import time
+
+# Startzeitpunkt für den Startzeit-Bericht (vor allen übrigen Imports)
+STARTUP_T0 = time.perf_counter()
+
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 import ttkbootstrap as ttkb
 import json
 import os
+import queue
+import threading
 from datetime import datetime
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-
-# Datei für gespeicherte Daten
-DATA_FILE = "verkauf_data.json"
-
-# Daten initialisieren
-if not os.path.exists(DATA_FILE):
-    with open(DATA_FILE, "w") as file:
-        json.dump({"users": {}, "sales": [], "categories": {}}, file)
-
-# Daten laden und speichern
-def load_data():
-    with open(DATA_FILE, "r") as file:
-        data = json.load(file)
 
-    if "categories" not in data:
-        data["categories"] = {}
+# matplotlib wird erst beim ersten Diagramm geladen
+from verkauf_storage import open_store, subcategory_price
+import verkauf_metrics
+from verkauf_metrics import timed
+
+# Einzelne Verkäufe werden seitenweise ins Dashboard geladen
+DASHBOARD_PAGE_SIZE = 200
+PLACEHOLDER_SUFFIX = "|placeholder"
+MORE_SUFFIX = "|more"
+SALE_PREFIX = "sale:"
+
+# Ranglisten im Dashboard: Anzahl Einträge und angezeigte Dimensionen
+LEADERBOARD_SIZE = 10
+LEADERBOARDS = (("buyer", "Top-Käufer"), ("category", "Top-Kategorien"), ("user", "Top-Verkäufer"))
+
+# Auswahl im Diagrammfenster: nur die größten Kategorien, Rest als "Andere"
+CHART_TOP_N_CHOICES = ("10", "25", "50", "Alle")
+
+# Suche: Wartezeit nach dem letzten Tastendruck (Millisekunden) und maximale Trefferzahl
+SEARCH_DELAY_MS = 150
+SEARCH_LIMIT = 200
+SEARCH_FIELD_CHOICES = {
+    "Alle Felder": None,
+    "Käufer": ("buyer",),
+    "Beschreibung": ("description",),
+    "Kategorie": ("category",),
+}
+
+# Wie oft auf Änderungen anderer Instanzen geprüft wird (Millisekunden)
+STORE_POLL_MS = 1000
+
+# Aktualisierung des Diagnose-Tabs (Millisekunden); Export ohne VERKAUF_METRICS_FILE
+DIAGNOSTICS_REFRESH_MS = 1000
+DEFAULT_METRICS_FILE = "verkauf_metrics.jsonl"
+
+# Zeitbudget bis zum fertig aufgebauten Fenster (Sekunden)
+STARTUP_BUDGET = float(os.environ.get("VERKAUF_STARTUP_BUDGET", "2.0"))
+
+# Daten laden
+def load_store():
+    store = open_store(write_behind=True)
+    if store.needs_rewrite:
+        store.compact()  # Nur zurückschreiben, wenn die Struktur ergänzt/korrigiert wurde
+    return store
+
+# Startzeit-Messung
+class StartupTimer:
+    """
+    Merkt sich die Zeitpunkte der Startphasen und gibt am Ende einen
+    Bericht aus. Mit VERKAUF_STARTUP_REPORT=<Datei> wird er zusätzlich als
+    JSON-Zeile angehängt.
+    """
+
+    def __init__(self, t0=STARTUP_T0):
+        self.t0 = t0
+        self.marks = []
+
+    def mark(self, phase):
+        self.marks.append((phase, time.perf_counter() - self.t0))
+
+    def report(self):
+        for phase, seconds in self.marks:
+            print(f"Start: {phase} nach {seconds:.3f} s")
+        total = self.marks[-1][1] if self.marks else 0.0
+        if total > STARTUP_BUDGET:
+            print(f"Warnung: Start dauerte {total:.3f} s (Budget {STARTUP_BUDGET:.3f} s)")
+
+        report_file = os.environ.get("VERKAUF_STARTUP_REPORT")
+        if report_file:
+            with open(report_file, "a", encoding="utf-8") as file:
+                file.write(json.dumps({"phases": dict(self.marks), "total": total, "budget": STARTUP_BUDGET}) + "\n")
+
+# Diagrammfenster
+class ChartWindow:
+    """
+    Wiederverwendbares Fenster für "Umsätze nach Kategorien". Figure und
+    Canvas werden nur einmal angelegt; die Aggregation läuft in einem
+    Hintergrund-Thread und wird nur neu berechnet, wenn sich der
+    Datenstand (store.version) oder die Top-N-Auswahl geändert hat.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.window = None
+        self.rendered_key = None
+        self.pending_key = None
+        self.polling = False
+        self.results = queue.Queue()
+
+    def _build(self):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+        self.window = tk.Toplevel(self.app.root)
+        self.window.title("Umsätze nach Kategorien")
+        # Schließen versteckt das Fenster nur, damit es wiederverwendet werden kann
+        self.window.protocol("WM_DELETE_WINDOW", self.window.withdraw)
+
+        controls = ttkb.Frame(self.window)
+        controls.pack(fill="x", padx=10, pady=5)
+        ttkb.Label(controls, text="Anzeigen (Top):", font=("Arial", 12)).pack(side="left", padx=5)
+        self.top_n_combobox = ttkb.Combobox(controls, values=CHART_TOP_N_CHOICES, width=6, state="readonly")
+        self.top_n_combobox.set(CHART_TOP_N_CHOICES[1])
+        self.top_n_combobox.pack(side="left", padx=5)
+        self.top_n_combobox.bind("<<ComboboxSelected>>", lambda event: self.refresh())
+        self.status_label = ttkb.Label(controls, text="", font=("Arial", 10))
+        self.status_label.pack(side="left", padx=10)
+
+        self.figure = Figure(figsize=(10, 6))
+        self.axes = self.figure.add_subplot()
+        self.canvas = FigureCanvasTkAgg(self.figure, master=self.window)
+        self.canvas.get_tk_widget().pack(fill="both", expand=True)
+
+    def visible(self):
+        return self.window is not None and self.window.winfo_viewable()
+
+    def show(self):
+        if self.window is None:
+            self._build()
+        else:
+            self.window.deiconify()
+            self.window.lift()
+        self.refresh()
+
+    def refresh(self):
+        choice = self.top_n_combobox.get()
+        key = (self.app.store.version, None if choice == "Alle" else int(choice))
+        if key in (self.rendered_key, self.pending_key):
+            return
+        self.pending_key = key
+        self.status_label.configure(text="Berechne …")
+        threading.Thread(target=self._aggregate, args=(key,), daemon=True).start()
+        # Es läuft höchstens eine Abfrage-Kette; sie wartet auch auf neuere Ergebnisse
+        if not self.polling:
+            self.polling = True
+            self.app.root.after(50, self._poll)
+
+    @timed("chart_aggregate")
+    def _aggregate(self, key):
+        # Läuft im Hintergrund-Thread; Ergebnis wird vom UI-Thread abgeholt
+        try:
+            from verkauf_analytics import top_n
 
-    if "users" not in data:
-        data["users"] = {}
-    if "sales" not in data:
-        data["sales"] = []
+            # Summen kommen aus den mitgeführten Aggregaten, ohne alle Verkäufe zu laden
+            with self.app.store.lock:
+                totals = self.app.store.totals_by_category()
+            self.results.put((key, top_n(totals, key[1]), None))
+        except Exception as e:
+            self.results.put((key, None, e))
 
-    save_data(data)  # Speichert ggf. korrigierte Struktur zurück
-    return data
+    def _poll(self):
+        try:
+            key, ranked, error = self.results.get_nowait()
+        except queue.Empty:
+            self.app.root.after(50, self._poll)
+            return
+        if key != self.pending_key:
+            # Veraltetes Ergebnis; auf das aktuelle warten
+            self.app.root.after(50, self._poll)
+            return
+        self.polling = False
+        self.pending_key = None
+        if error is not None:
+            self.status_label.configure(text="")
+            messagebox.showerror("Fehler", f"Diagramm konnte nicht berechnet werden: {error}")
+            return
+        self._draw(ranked)
+        self.rendered_key = key
+        self.status_label.configure(text=f"{len(ranked)} Balken")
+
+    @timed("chart_draw")
+    def _draw(self, ranked):
+        self.axes.clear()
+        self.axes.bar([label for label, _ in ranked], [value for _, value in ranked], color="skyblue")
+        self.axes.set_title("Umsätze nach Kategorien")
+        self.axes.set_xlabel("Kategorie")
+        self.axes.set_ylabel("Umsatz (€)")
+        self.axes.tick_params(axis="x", rotation=45)
+        self.figure.tight_layout()
+        self.canvas.draw_idle()
 
-def save_data(data):
-    with open(DATA_FILE, "w") as file:
-        json.dump(data, file, indent=4)
 
 # GUI-Anwendung
 class SalesToolApp:
-    def __init__(self, root):
+    def __init__(self, root, startup=None):
         self.root = root
         self.root.title("Verkaufsmanagement-Tool")
         self.root.geometry("1400x1000")
         self.style = ttkb.Style("litera")
+        self.startup = startup or StartupTimer()
 
-        self.data = load_data()
+        self.store = None
+        self.data = None
         self.current_user = None
+        self.search_after = None
+
+        # Beim Schließen das Backend sauber abschließen
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
         # Hauptüberschrift
         ttkb.Label(self.root, text="Verkaufsmanagement-Tool", font=("Arial", 22, "bold"), anchor="center").pack(fill="x", pady=10)
 
-        # Tabs erstellen
+        # Tabs erstellen (werden nach dem Laden der Daten nacheinander befüllt)
         self.tabs = ttkb.Notebook(self.root, bootstyle="primary")
         self.tabs.pack(fill="both", expand=True, padx=10, pady=10)
 
-        self.create_login_tab()
-        self.create_sales_tab()
-        self.create_dashboard_tab()
-        self.create_category_management_tab()  # <-- NEU: Kategorien-Tab
+        # Daten im Hintergrund laden, damit das Fenster sofort erscheint
+        self.loading_label = ttkb.Label(self.root, text="Daten werden geladen …", font=("Arial", 14))
+        self.loading_label.pack(pady=10)
+        self.root.after_idle(self.startup.mark, "Fenster sichtbar")
+        self.load_results = queue.Queue()
+        threading.Thread(target=self._load_in_background, daemon=True).start()
+        self.root.after(20, self._poll_loaded)
+
+    # ------------------------- Start -------------------------
+    def _load_in_background(self):
+        try:
+            self.load_results.put((load_store(), None))
+        except Exception as e:
+            self.load_results.put((None, e))
+
+    def _poll_loaded(self):
+        try:
+            store, error = self.load_results.get_nowait()
+        except queue.Empty:
+            self.root.after(20, self._poll_loaded)
+            return
+        if error is not None:
+            messagebox.showerror("Fehler", f"Daten konnten nicht geladen werden: {error}")
+            self.root.destroy()
+            return
+
+        self.store = store
+        self.data = store.data
+        self.startup.mark("Daten geladen")
+        self.loading_label.destroy()
+        self.check_persistence_errors()
+
+        self._build_next_tab([
+            self.create_login_tab,
+            self.create_sales_tab,
+            self.create_dashboard_tab,
+            self.create_category_management_tab,  # <-- NEU: Kategorien-Tab
+            self.create_search_tab,
+            self.create_diagnostics_tab,
+        ])
+
+    def _build_next_tab(self, steps):
+        """
+        Baut die Tabs einzeln auf und gibt dazwischen die Ereignisschleife frei.
+        """
+        if not steps:
+            self.startup.mark("Tabs aufgebaut")
+            self.startup.report()
+            self.root.after(STORE_POLL_MS, self.poll_store_changes)
+            return
+        steps[0]()
+        self.root.after_idle(self._build_next_tab, steps[1:])
+
+    # ------------------------- Speichern -------------------------
+    def check_persistence_errors(self):
+        """
+        Holt Fehler des Hintergrund-Speicherns ab und zeigt sie im UI-Thread an.
+        """
+        writer = getattr(self.store, "writer", None)
+        if writer is not None:
+            while not writer.errors.empty():
+                error = writer.errors.get_nowait()
+                messagebox.showerror("Fehler", f"Speichern fehlgeschlagen, neuer Versuch folgt: {error}")
+        self.root.after(500, self.check_persistence_errors)
+
+    def poll_store_changes(self):
+        """
+        Übernimmt Änderungen anderer Instanzen (Tk oder Streamlit) auf
+        derselben Datei. Es werden nur die neuen Einträge eingelesen und nur
+        die betroffenen Dashboard-Zeilen neu aufgebaut. Wird gerade
+        geschrieben (Hintergrund-Thread, Massenimport), wartet der UI-Thread
+        nicht, sondern versucht es beim nächsten Durchlauf erneut.
+        """
+        try:
+            changes = self.store.poll_changes(blocking=False)
+        except OSError as e:
+            changes = None
+            print(f"Abgleich mit anderen Instanzen fehlgeschlagen: {e}")
+        if changes is not None:
+            for user, category in changes:
+                cat_iid = self._dashboard_iid("category", user, category)
+                if cat_iid in self.dashboard_categories:
+                    self._reset_category_node(cat_iid)
+            self.update_dashboard()
+            self.parent_combo["values"] = list(self.data["categories"].keys())
+            self.refresh_categories_list()
+            self.run_search()
+        self.root.after(STORE_POLL_MS, self.poll_store_changes)
+
+    def on_close(self):
+        if self.store is None:
+            # Noch beim Laden: es gibt nichts zu speichern
+            self.root.destroy()
+            return
+        try:
+            self.store.close()
+        except OSError as e:
+            messagebox.showerror("Fehler", f"Daten konnten nicht gespeichert werden: {e}")
+            return
+        self.root.destroy()
 
     # ------------------------- Login Tab -------------------------
     def create_login_tab(self):
@@ -92,8 +353,7 @@ class SalesToolApp:
         if username in self.data["users"]:
             messagebox.showerror("Fehler", "Benutzername existiert bereits.")
         else:
-            self.data["users"][username] = password
-            save_data(self.data)
+            self.store.register(username, password)
             messagebox.showinfo("Erfolg", "Registrierung erfolgreich!")
 
     # ------------------------- Verkauf hinzufügen Tab -------------------------
@@ -141,10 +401,7 @@ class SalesToolApp:
         selected_parent = self.parent_category_combobox.get()
         selected_subcategory = self.subcategory_combobox.get()
         if selected_parent and selected_subcategory:
-            price = self.data["categories"].get(selected_parent, {}) \
-                                          .get("subcategories", {}) \
-                                          .get(selected_subcategory, {}) \
-                                          .get("price")
+            price = subcategory_price(self.data["categories"], selected_parent, selected_subcategory)
             if price:
                 self.amount_entry.delete(0, tk.END)
                 self.amount_entry.insert(0, str(price))
@@ -173,7 +430,6 @@ class SalesToolApp:
             return
 
         sale = {
-            "id": len(self.data["sales"]) + 1,
             "user": self.current_user,
             "category": f"{parent_category} > {subcategory}",
             "date": date,
@@ -182,9 +438,9 @@ class SalesToolApp:
             "buyer": buyer,
         }
 
-        self.data["sales"].append(sale)
-        save_data(self.data)
+        self.store.add_sale(sale)
         self.update_dashboard()
+        self.run_search()
         messagebox.showinfo("Erfolg", "Verkauf hinzugefügt.")
 
     # ------------------------- Dashboard Tab -------------------------
@@ -194,6 +450,18 @@ class SalesToolApp:
 
         ttkb.Label(self.dashboard_tab, text="Dashboard Übersicht", font=("Arial", 16, "bold")).pack(pady=10)
 
+        # Zeitraumfilter (leer = gesamter Zeitraum)
+        filter_frame = ttkb.Frame(self.dashboard_tab)
+        filter_frame.pack(pady=5)
+        ttkb.Label(filter_frame, text="Von (YYYY-MM-DD):", font=("Arial", 12)).pack(side="left", padx=5)
+        self.dashboard_start_entry = ttkb.Entry(filter_frame, font=("Arial", 12), width=12)
+        self.dashboard_start_entry.pack(side="left", padx=5)
+        ttkb.Label(filter_frame, text="Bis:", font=("Arial", 12)).pack(side="left", padx=5)
+        self.dashboard_end_entry = ttkb.Entry(filter_frame, font=("Arial", 12), width=12)
+        self.dashboard_end_entry.pack(side="left", padx=5)
+        ttkb.Button(filter_frame, text="Filtern", command=self.apply_dashboard_range, bootstyle="secondary-outline").pack(side="left", padx=5)
+        self.dashboard_range = (None, None)
+
         self.dashboard_tree = ttk.Treeview(
             self.dashboard_tab,
             columns=("Umsatz", "Verkäufe"),
@@ -204,72 +472,195 @@ class SalesToolApp:
         self.dashboard_tree.heading("Umsatz", text="Umsatz (€)")
         self.dashboard_tree.heading("Verkäufe", text="Anzahl Verkäufe")
         self.dashboard_tree.pack(fill="both", expand=True, pady=10)
+        self.dashboard_tree.bind("<<TreeviewOpen>>", self.on_dashboard_open)
+
+        # Ranglisten (gelten ebenfalls für den gewählten Zeitraum)
+        leaderboard_frame = ttkb.Frame(self.dashboard_tab)
+        leaderboard_frame.pack(fill="x", pady=5)
+        self.leaderboard_trees = {}
+        for dimension, title in LEADERBOARDS:
+            frame = ttkb.Labelframe(leaderboard_frame, text=title)
+            frame.pack(side="left", fill="both", expand=True, padx=5)
+            tree = ttk.Treeview(frame, columns=("Umsatz", "Verkäufe"), show="tree headings", height=LEADERBOARD_SIZE)
+            tree.heading("#0", text="Name")
+            tree.heading("Umsatz", text="Umsatz (€)")
+            tree.heading("Verkäufe", text="Anzahl")
+            tree.column("Umsatz", width=110, anchor="e")
+            tree.column("Verkäufe", width=70, anchor="e")
+            tree.pack(fill="both", expand=True, padx=5, pady=5)
+            self.leaderboard_trees[dimension] = tree
+
+        # Kategoriezeilen -> (Benutzer, Kategorie) und Anzahl bereits geladener Verkäufe
+        self.dashboard_categories = {}
+        self.dashboard_loaded = {}
+        self.chart_window = ChartWindow(self)
 
         ttkb.Button(self.dashboard_tab, text="Verkauf löschen", command=self.delete_sale, bootstyle="danger-outline").pack(pady=10)
         ttkb.Button(self.dashboard_tab, text="Diagramm anzeigen", command=self.show_chart, bootstyle="info-outline").pack(pady=10)
         ttkb.Button(self.dashboard_tab, text="Aktualisieren", command=self.update_dashboard, bootstyle="primary-outline").pack(pady=10)
 
+    @timed("update_dashboard")
     def update_dashboard(self):
-        """Aktualisiert die Verkaufsübersicht im Dashboard."""
-        self.dashboard_tree.delete(*self.dashboard_tree.get_children())
-
-        total_sales = 0
-        total_revenue = 0
-
-        for user in self.data["users"]:
-            user_sales = [sale for sale in self.data["sales"] if sale["user"] == user]
-            user_revenue = sum(sale["amount"] for sale in user_sales)
-
-            total_sales += len(user_sales)
-            total_revenue += user_revenue
-
-            user_node = self.dashboard_tree.insert("", "end", text=user, values=(f"{user_revenue:.2f} €", len(user_sales)))
-
-            category_totals = {}
-            for sale in user_sales:
-                category = sale["category"]
-                if category not in category_totals:
-                    category_totals[category] = {"revenue": 0, "sales": 0}
-                category_totals[category]["revenue"] += sale["amount"]
-                category_totals[category]["sales"] += 1
-
-            for category, totals in category_totals.items():
-                category_node = self.dashboard_tree.insert(
-                    user_node, "end", text=category, values=(f"{totals['revenue']:.2f} €", totals["sales"])
-                )
-
-                # Einzelne Verkäufe unter der Kategorie auflisten
-                for s in [s for s in user_sales if s["category"] == category]:
-                    self.dashboard_tree.insert(
-                        category_node, "end", text=f"Verkauf #{s['id']}: {s['date']}", values=(f"{s['amount']:.2f} €", 1)
-                    )
+        """
+        Aktualisiert die Verkaufsübersicht im Dashboard.
+        Es werden nur Benutzer- und Kategoriezeilen angelegt; bestehende
+        Zeilen werden aktualisiert statt gelöscht und neu eingefügt.
+        Einzelne Verkäufe werden erst beim Aufklappen geladen.
+        """
+        tree = self.dashboard_tree
 
-        self.dashboard_tree.insert("", "end", text="Gesamtübersicht", values=(f"{total_revenue:.2f} €", total_sales))
+        # Mit Zeitraumfilter kommen die Summen aus den Tages-/Monats-Rollups
+        start, end = self.dashboard_range
+        totals_source = self.store.period_aggregates(start, end) if start or end else self.store
 
-    def show_chart(self):
+        total_revenue, total_sales = totals_source.overall_totals()
+        user_totals = totals_source.totals_by_user()
         category_totals = {}
+        for (user, category), totals in totals_source.totals_by_user_category().items():
+            category_totals.setdefault(user, {})[category] = totals
+
+        wanted = set()
+        for index, user in enumerate(self.data["users"]):
+            user_revenue, user_count = user_totals.get(user, (0, 0))
+            user_iid = self._dashboard_iid("user", user)
+            self._upsert_row("", index, user_iid, user, (f"{user_revenue:.2f} €", user_count))
+            wanted.add(user_iid)
+
+            for cat_index, (category, (revenue, count)) in enumerate(category_totals.get(user, {}).items()):
+                cat_iid = self._dashboard_iid("category", user, category)
+                values = (f"{revenue:.2f} €", count)
+                changed = self._upsert_row(user_iid, cat_index, cat_iid, category, values)
+                self.dashboard_categories[cat_iid] = (user, category)
+                if changed or not tree.get_children(cat_iid):
+                    self._reset_category_node(cat_iid)
+                wanted.add(cat_iid)
+
+            for child in tree.get_children(user_iid):
+                if child not in wanted:
+                    self._forget_dashboard_row(child)
+
+        total_iid = self._dashboard_iid("total")
+        self._upsert_row("", len(self.data["users"]), total_iid, "Gesamtübersicht", (f"{total_revenue:.2f} €", total_sales))
+        wanted.add(total_iid)
+
+        for child in tree.get_children(""):
+            if child not in wanted:
+                self._forget_dashboard_row(child)
+
+        self.update_leaderboards()
+
+        # Offenes Diagramm nachziehen (rechnet nur, wenn sich die Daten geändert haben)
+        if self.chart_window.visible():
+            self.chart_window.refresh()
+
+    @timed("update_leaderboards")
+    def update_leaderboards(self):
+        """
+        Füllt die Ranglisten neu (je höchstens LEADERBOARD_SIZE Zeilen).
+        """
+        start, end = self.dashboard_range
+        for dimension, tree in self.leaderboard_trees.items():
+            tree.delete(*tree.get_children())
+            ranked = self.store.leaderboard(dimension, LEADERBOARD_SIZE, start, end)
+            for rank, (name, revenue, count) in enumerate(ranked, 1):
+                tree.insert("", "end", text=f"{rank}. {name or '—'}", values=(f"{revenue:.2f} €", count))
+
+    def apply_dashboard_range(self):
+        start = self.dashboard_start_entry.get().strip() or None
+        end = self.dashboard_end_entry.get().strip() or None
+        for value in (start, end):
+            if value:
+                try:
+                    datetime.strptime(value, "%Y-%m-%d")
+                except ValueError:
+                    messagebox.showerror("Fehler", "Datum bitte als YYYY-MM-DD angeben.")
+                    return
+        self.dashboard_range = (start, end)
+
+        # Bereits geladene Verkäufe gehören zum alten Zeitraum
+        for cat_iid in list(self.dashboard_categories):
+            self._reset_category_node(cat_iid)
+        self.update_dashboard()
 
-        for sale in self.data["sales"]:
-            category = sale["category"]
-            if category not in category_totals:
-                category_totals[category] = 0
-            category_totals[category] += sale["amount"]
-
-        categories = list(category_totals.keys())
-        revenues = list(category_totals.values())
-
-        fig, ax = plt.subplots(figsize=(10, 6))
-        ax.bar(categories, revenues, color="skyblue")
-        ax.set_title("Umsätze nach Kategorien")
-        ax.set_xlabel("Kategorie")
-        ax.set_ylabel("Umsatz (€)")
-        plt.xticks(rotation=45)
+    @staticmethod
+    def _dashboard_iid(kind, *parts):
+        return json.dumps([kind, *parts])
 
-        chart_window = tk.Toplevel(self.root)
-        chart_window.title("Umsätze nach Kategorien")
-        canvas = FigureCanvasTkAgg(fig, master=chart_window)
-        canvas.get_tk_widget().pack()
-        canvas.draw()
+    def _upsert_row(self, parent, index, iid, text, values):
+        """
+        Legt eine Zeile an oder aktualisiert sie. Gibt True zurück, wenn sich
+        die Werte geändert haben.
+        """
+        tree = self.dashboard_tree
+        values = tuple(str(value) for value in values)
+        if not tree.exists(iid):
+            tree.insert(parent, index, iid=iid, text=text, values=values)
+            return True
+        if tree.index(iid) != index:
+            tree.move(iid, parent, index)
+        if tuple(str(value) for value in tree.item(iid, "values")) == values:
+            return False
+        tree.item(iid, values=values)
+        return True
+
+    def _forget_dashboard_row(self, iid):
+        for child in self.dashboard_tree.get_children(iid):
+            self.dashboard_categories.pop(child, None)
+            self.dashboard_loaded.pop(child, None)
+        self.dashboard_categories.pop(iid, None)
+        self.dashboard_loaded.pop(iid, None)
+        self.dashboard_tree.delete(iid)
+
+    def _reset_category_node(self, cat_iid):
+        """
+        Entfernt geladene Verkäufe und setzt einen Platzhalter, damit die
+        Kategorie aufklappbar bleibt. Ist sie gerade offen, wird die erste
+        Seite direkt nachgeladen.
+        """
+        tree = self.dashboard_tree
+        children = tree.get_children(cat_iid)
+        if children:
+            tree.delete(*children)
+        self.dashboard_loaded[cat_iid] = 0
+        if tree.item(cat_iid, "open"):
+            self._load_sales_page(cat_iid)
+        else:
+            tree.insert(cat_iid, "end", iid=cat_iid + PLACEHOLDER_SUFFIX, text="…")
+
+    def on_dashboard_open(self, event):
+        iid = self.dashboard_tree.focus()
+        if iid.endswith(MORE_SUFFIX):
+            self.dashboard_tree.delete(iid)
+            self._load_sales_page(iid[: -len(MORE_SUFFIX)])
+        elif iid in self.dashboard_categories and self.dashboard_tree.exists(iid + PLACEHOLDER_SUFFIX):
+            self.dashboard_tree.delete(iid + PLACEHOLDER_SUFFIX)
+            self._load_sales_page(iid)
+
+    def _load_sales_page(self, cat_iid):
+        """
+        Lädt die nächste Seite einzelner Verkäufe unter eine Kategorie.
+        """
+        tree = self.dashboard_tree
+        user, category = self.dashboard_categories[cat_iid]
+        offset = self.dashboard_loaded.get(cat_iid, 0)
+        start, end = self.dashboard_range
+        page = self.store.sales_for_user_category(user, category, offset, DASHBOARD_PAGE_SIZE + 1, start, end)
+
+        for s in page[:DASHBOARD_PAGE_SIZE]:
+            tree.insert(
+                cat_iid, "end", iid=f"{SALE_PREFIX}{s['id']}", text=f"Verkauf #{s['id']}: {s['date']}", values=(f"{s['amount']:.2f} €", 1)
+            )
+        self.dashboard_loaded[cat_iid] = offset + min(len(page), DASHBOARD_PAGE_SIZE)
+
+        # Weitere Verkäufe als aufklappbare Zeile anbieten
+        if len(page) > DASHBOARD_PAGE_SIZE:
+            more_iid = cat_iid + MORE_SUFFIX
+            tree.insert(cat_iid, "end", iid=more_iid, text="Weitere Verkäufe laden …")
+            tree.insert(more_iid, "end", text="…")
+
+    @timed("show_chart")
+    def show_chart(self):
+        self.chart_window.show()
 
     def delete_sale(self):
         selected_item = self.dashboard_tree.selection()
@@ -277,15 +668,15 @@ class SalesToolApp:
             messagebox.showerror("Fehler", "Bitte einen Verkauf auswählen.")
             return
 
-        sale_text = self.dashboard_tree.item(selected_item, "text")
-        if "Verkauf #" in sale_text:
-            sale_id = int(sale_text.split("#")[1].split(":")[0])
-            self.data["sales"] = [sale for sale in self.data["sales"] if sale["id"] != sale_id]
-            save_data(self.data)
+        # Die Verkaufs-ID steckt in der Zeilen-ID; mehrere Verkäufe werden gemeinsam gelöscht
+        sale_ids = [int(iid[len(SALE_PREFIX):]) for iid in selected_item if iid.startswith(SALE_PREFIX)]
+        if sale_ids:
+            self.store.delete_sales(sale_ids)
             self.update_dashboard()
-            messagebox.showinfo("Erfolg", "Verkauf gelöscht.")
+            self.run_search()
+            messagebox.showinfo("Erfolg", f"{len(sale_ids)} Verkauf/Verkäufe gelöscht.")
         else:
-            messagebox.showerror("Fehler", "Bitte einen einzelnen Verkauf auswählen.")
+            messagebox.showerror("Fehler", "Bitte einen oder mehrere einzelne Verkäufe auswählen.")
 
     # ------------------------- NEU: Kategorien verwalten Tab -------------------------
     def create_category_management_tab(self):
@@ -352,8 +743,7 @@ class SalesToolApp:
             return
 
         # Neue Hauptkategorie anlegen
-        self.data["categories"][new_parent] = {"subcategories": {}}
-        save_data(self.data)
+        self.store.add_parent_category(new_parent)
 
         messagebox.showinfo("Erfolg", f"Hauptkategorie '{new_parent}' wurde angelegt.")
         self.parent_category_entry.delete(0, tk.END)
@@ -384,17 +774,13 @@ class SalesToolApp:
             messagebox.showerror("Fehler", "Preis muss eine Zahl sein.")
             return
 
-        if parent_cat not in self.data["categories"]:
-            self.data["categories"][parent_cat] = {"subcategories": {}}
-
         # Schon vorhanden?
-        if subcat_name in self.data["categories"][parent_cat]["subcategories"]:
+        if subcat_name in self.data["categories"].get(parent_cat, {}).get("subcategories", {}):
             messagebox.showerror("Fehler", f"Unterkategorie '{subcat_name}' existiert bereits.")
             return
 
         # Neue Unterkategorie mit Preis anlegen
-        self.data["categories"][parent_cat]["subcategories"][subcat_name] = {"price": price_val}
-        save_data(self.data)
+        self.store.add_sub_category(parent_cat, subcat_name, price_val)
 
         messagebox.showinfo("Erfolg", f"Unterkategorie '{subcat_name}' hinzugefügt.")
         self.subcategory_entry.delete(0, tk.END)
@@ -402,6 +788,7 @@ class SalesToolApp:
 
         self.refresh_categories_list()
 
+    @timed("refresh_categories_list")
     def refresh_categories_list(self):
         """
         Zeigt alle Haupt-/Unterkategorien samt Preis in einem Text-Widget an.
@@ -422,6 +809,143 @@ class SalesToolApp:
         # damit neue Hauptkategorien direkt auswählbar sind
         self.parent_category_combobox["values"] = list(self.data["categories"].keys())
 
+    # ------------------------- Suche Tab -------------------------
+    def create_search_tab(self):
+        """
+        Suche über Käufer, Beschreibung und Kategorie. Gesucht wird während
+        der Eingabe (kurz verzögert), angezeigt werden die neuesten Treffer.
+        """
+        self.search_tab = ttkb.Frame(self.tabs)
+        self.tabs.add(self.search_tab, text="🔍 Suche")
+
+        search_frame = ttkb.Frame(self.search_tab)
+        search_frame.pack(fill="x", padx=10, pady=10)
+        ttkb.Label(search_frame, text="Suchen:", font=("Arial", 12)).pack(side="left", padx=5)
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add("write", lambda *args: self.schedule_search())
+        self.search_entry = ttkb.Entry(search_frame, textvariable=self.search_var, font=("Arial", 12), width=40, bootstyle="info")
+        self.search_entry.pack(side="left", padx=5)
+
+        self.search_field_combo = ttkb.Combobox(search_frame, font=("Arial", 12), state="readonly", values=list(SEARCH_FIELD_CHOICES))
+        self.search_field_combo.current(0)
+        self.search_field_combo.pack(side="left", padx=5)
+        self.search_field_combo.bind("<<ComboboxSelected>>", lambda event: self.schedule_search())
+
+        self.search_prefix_var = tk.BooleanVar(value=False)
+        ttkb.Checkbutton(
+            search_frame, text="Nur Wortanfang", variable=self.search_prefix_var, command=self.schedule_search, bootstyle="round-toggle"
+        ).pack(side="left", padx=10)
+
+        self.search_status = ttkb.Label(self.search_tab, text="", font=("Arial", 11))
+        self.search_status.pack(anchor="w", padx=15)
+
+        columns = ("Datum", "Benutzer", "Kategorie", "Käufer", "Betrag", "Beschreibung")
+        self.search_tree = ttk.Treeview(self.search_tab, columns=columns, show="tree headings", height=20)
+        self.search_tree.heading("#0", text="Verkauf")
+        self.search_tree.column("#0", width=110, stretch=False)
+        for column in columns:
+            self.search_tree.heading(column, text=column)
+        self.search_tree.pack(fill="both", expand=True, padx=10, pady=10)
+
+    def schedule_search(self):
+        if self.search_after is not None:
+            self.root.after_cancel(self.search_after)
+        self.search_after = self.root.after(SEARCH_DELAY_MS, self.run_search)
+
+    @timed("search")
+    def run_search(self):
+        """
+        Führt die aktuelle Suche aus (auch nach Änderungen am Bestand, damit
+        die Trefferliste stimmt).
+        """
+        self.search_after = None
+        if not hasattr(self, "search_tree"):
+            return
+        tree = self.search_tree
+        tree.delete(*tree.get_children())
+        query = self.search_var.get().strip()
+        if not query:
+            self.search_status.config(text="")
+            return
+
+        fields = SEARCH_FIELD_CHOICES[self.search_field_combo.get()]
+        t0 = time.perf_counter()
+        rows, total = self.store.search_sales(query, fields, not self.search_prefix_var.get(), 0, SEARCH_LIMIT)
+        elapsed = (time.perf_counter() - t0) * 1000
+
+        for s in rows:
+            tree.insert(
+                "", "end", iid=f"{SALE_PREFIX}{s['id']}", text=f"#{s['id']}",
+                values=(s["date"], s["user"], s["category"], s.get("buyer", ""), f"{s['amount']:.2f} €", s.get("description", "")),
+            )
+        shown = f", die neuesten {len(rows)} angezeigt" if total > len(rows) else ""
+        self.search_status.config(text=f"{total} Treffer{shown} ({elapsed:.0f} ms)")
+
+    # ------------------------- Diagnose Tab -------------------------
+    def create_diagnostics_tab(self):
+        """
+        Zeigt Laufzeiten (p50/p95) und Zähler der Messpunkte aus
+        verkauf_metrics, solange der Tab sichtbar ist, sekündlich aktualisiert.
+        """
+        self.diagnostics_tab = ttkb.Frame(self.tabs)
+        self.tabs.add(self.diagnostics_tab, text="🩺 Diagnose")
+
+        if not verkauf_metrics.ENABLED:
+            ttkb.Label(
+                self.diagnostics_tab,
+                text="Messung ist ausgeschaltet. Zum Einschalten VERKAUF_METRICS=1 setzen und neu starten.",
+                font=("Arial", 12),
+            ).pack(pady=20)
+            return
+
+        columns = ("Aufrufe", "p50 (ms)", "p95 (ms)", "max (ms)")
+        self.diagnostics_tree = ttk.Treeview(self.diagnostics_tab, columns=columns, show="tree headings", height=16)
+        self.diagnostics_tree.heading("#0", text="Messpunkt")
+        for column in columns:
+            self.diagnostics_tree.heading(column, text=column)
+        self.diagnostics_tree.pack(fill="both", expand=True, padx=10, pady=10)
+
+        self.counters_tree = ttk.Treeview(self.diagnostics_tab, columns=("Wert",), show="tree headings", height=5)
+        self.counters_tree.heading("#0", text="Zähler")
+        self.counters_tree.heading("Wert", text="Wert")
+        self.counters_tree.pack(fill="x", padx=10, pady=5)
+
+        buttons = ttkb.Frame(self.diagnostics_tab)
+        buttons.pack(pady=10)
+        ttkb.Button(buttons, text="Als JSON-Zeilen exportieren", command=self.export_metrics, bootstyle="info-outline").pack(side="left", padx=5)
+        ttkb.Button(buttons, text="Zurücksetzen", command=verkauf_metrics.registry.reset, bootstyle="secondary-outline").pack(side="left", padx=5)
+
+        self.refresh_diagnostics()
+
+    def refresh_diagnostics(self):
+        if self.tabs.select() == str(self.diagnostics_tab):
+            summary = verkauf_metrics.registry.summary()
+            for tree, rows in (
+                (self.diagnostics_tree, {
+                    name: (values["calls"], f"{values['p50_ms']:.1f}", f"{values['p95_ms']:.1f}", f"{values['max_ms']:.1f}")
+                    for name, values in summary["timings"].items()
+                }),
+                (self.counters_tree, {name: (value,) for name, value in summary["counters"].items()}),
+            ):
+                for iid in tree.get_children():
+                    if iid not in rows:
+                        tree.delete(iid)
+                for name, values in rows.items():
+                    if tree.exists(name):
+                        tree.item(name, values=values)
+                    else:
+                        tree.insert("", "end", iid=name, text=name, values=values)
+        self.root.after(DIAGNOSTICS_REFRESH_MS, self.refresh_diagnostics)
+
+    def export_metrics(self):
+        path = verkauf_metrics.METRICS_FILE or DEFAULT_METRICS_FILE
+        try:
+            lines = verkauf_metrics.registry.export(path)
+        except OSError as e:
+            messagebox.showerror("Fehler", f"Export fehlgeschlagen: {e}")
+            return
+        messagebox.showinfo("Erfolg", f"{lines} Zeilen nach {path} geschrieben.")
+
 
 # ------------------------- Start -------------------------
 if __name__ == "__main__":
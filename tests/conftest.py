@@ -0,0 +1,73 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from verkauf_storage import BinaryBackend, JsonBackend, PartitionedBackend, make_sale  # noqa: E402
+
+BACKENDS = ("json", "partitioned", "binary")
+
+
+def seed(store):
+    """
+    Ein Benutzer und eine Kategorie mit Preis, wie in der App angelegt.
+    """
+    store.register("abii", "geheim")
+    store.add_parent_category("Camos")
+    store.add_sub_category("Camos", "Dark Matter", 20.0)
+    return store
+
+
+def open_backend(tmp_path, backend="json", **kwargs):
+    """
+    Öffnet ein dateibasiertes Backend ("json", "partitioned" oder "binary")
+    mit allen Dateien unter tmp_path; mehrmals aufgerufen wie mehrere Prozesse.
+    """
+    if backend == "json":
+        return JsonBackend(
+            str(tmp_path / "verkauf_data.json"),
+            str(tmp_path / "verkauf_data.journal"),
+            rollup_file=str(tmp_path / "verkauf_data.rollups.json"),
+            **kwargs,
+        )
+    if backend == "partitioned":
+        return PartitionedBackend(str(tmp_path / "verkauf_data.parts"), **kwargs)
+    if backend == "binary":
+        return BinaryBackend(str(tmp_path / "verkauf_data.vkb"), **kwargs)
+    raise ValueError(backend)
+
+
+def new_sale(store, date="2025-03-15", amount=None, buyer="jonas2"):
+    return make_sale(store.data["categories"], "abii", "Camos", "Dark Matter", date=date, amount=amount, buyer=buyer)
+
+
+def contents(store):
+    """
+    Alle Verkäufe als {ID: (Datum, Käufer, Betrag)}, um Instanzen zu vergleichen.
+    """
+    return {sale["id"]: (sale["date"], sale["buyer"], sale["amount"]) for sale in store.iter_sales()}
+
+
+@pytest.fixture
+def json_store(tmp_path):
+    store = seed(open_backend(tmp_path))
+    yield store
+    store.close()
+
+
+def defer_writes(store):
+    """
+    Sammelt Änderungen wie das Hintergrund-Speichern, schreibt sie aber erst
+    beim nächsten store._commit() (der Writer-Thread wird nicht gestartet).
+    So lässt sich ein anderer Prozess dazwischenschieben.
+    """
+    from verkauf_storage import WriteBehindWriter
+
+    store.writer = WriteBehindWriter(store)
+
+
+def commit_deferred(store):
+    store._commit()
+    store.writer = None
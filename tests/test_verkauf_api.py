@@ -0,0 +1,99 @@
+import asyncio
+import json
+import threading
+from http import HTTPStatus
+
+import pytest
+
+from conftest import open_backend
+from verkauf_api import BatchCommitter, IngestServer, RequestError
+
+GOOD = {"user": "abii", "parent": "Camos", "subcategory": "Dark Matter", "buyer": "jonas2"}
+
+
+@pytest.mark.parametrize("bad", [
+    {**GOOD, "date": 20240101},
+    {**GOOD, "user": ["abii"]},
+    {"user": "abii", "category": 5},
+    {**GOOD, "buyer": {"name": "x"}},
+    {**GOOD, "amount": [1]},
+    "kein Objekt",
+])
+def test_bad_request_does_not_fail_batch(json_store, bad):
+    results = BatchCommitter(json_store).commit([[GOOD], [GOOD, bad], [GOOD, GOOD]])
+
+    assert len(results[0]) == 1 and len(results[2]) == 2
+    assert isinstance(results[1], RequestError)
+    assert results[1].status == HTTPStatus.BAD_REQUEST
+    assert [error["index"] for error in results[1].errors] == [1]
+    # Die fehlerhafte Anfrage wird ganz verworfen, die anderen gespeichert
+    assert json_store.sale_count() == 3
+
+
+def test_concurrent_submits_in_one_batch(json_store):
+    async def scenario():
+        committer = BatchCommitter(json_store, window=0.05)
+        runner = asyncio.create_task(committer.run())
+        try:
+            return await asyncio.gather(
+                committer.submit([GOOD]),
+                committer.submit([{**GOOD, "date": 20240101}]),
+                committer.submit([GOOD, GOOD]),
+                return_exceptions=True,
+            ), committer.batches
+        finally:
+            runner.cancel()
+
+    (good, bad, more), batches = asyncio.run(scenario())
+    assert batches == 1
+    assert isinstance(bad, RequestError) and bad.status == HTTPStatus.BAD_REQUEST
+    assert len(good) == 1 and len(more) == 2
+    assert sorted(good + more) == sorted(json_store.sales)
+
+
+def test_categories_while_another_instance_adds(json_store, tmp_path):
+    server = IngestServer(json_store)
+    other = open_backend(tmp_path)
+    done = threading.Event()
+
+    def poll():
+        # Wie der Commit-Thread: Änderungen der anderen Instanz übernehmen
+        while not done.is_set():
+            json_store.poll_changes()
+
+    async def scenario():
+        seen = set()
+        while not done.is_set():
+            status, payload = await server.dispatch("GET", "/categories", b"")
+            json.dumps(payload)
+            seen.add(len(payload["categories"]))
+            assert payload["categories"]["Camos"]["subcategories"]
+            await asyncio.sleep(0)
+        return seen
+
+    poller = threading.Thread(target=poll)
+    poller.start()
+
+    def add():
+        for i in range(100):
+            other.add_parent_category(f"Neu {i}")
+            # Zwei Kompaktierungen hintereinander: der Abgleich muss alles neu laden
+            other.compact()
+            other.add_sub_category(f"Neu {i}", "Artikel", 1.0)
+            other.compact()
+        done.set()
+
+    adder = threading.Thread(target=add)
+    adder.start()
+    try:
+        seen = asyncio.run(scenario())
+    finally:
+        done.set()
+        adder.join()
+        poller.join()
+
+    json_store.poll_changes()
+    status, payload = asyncio.run(server.dispatch("GET", "/categories", b""))
+    assert status == HTTPStatus.OK
+    assert len(payload["categories"]) == 101
+    assert min(seen) >= 1
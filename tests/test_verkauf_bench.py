@@ -0,0 +1,27 @@
+import datetime
+import io
+
+import verkauf_bench
+
+
+def test_generate_does_not_depend_on_today(tmp_path, monkeypatch):
+    verkauf_bench.generate(tmp_path / "heute.json", sales=500, buyers=50, seed=4)
+
+    class Later(datetime.date):
+        @classmethod
+        def today(cls):
+            return cls(2031, 7, 15)
+
+    monkeypatch.setattr(verkauf_bench, "date", Later)
+    verkauf_bench.generate(tmp_path / "spaeter.json", sales=500, buyers=50, seed=4)
+
+    assert (tmp_path / "heute.json").read_bytes() == (tmp_path / "spaeter.json").read_bytes()
+
+
+def test_run_reports_every_benchmark(tmp_path):
+    data_file = tmp_path / "verkauf_data.json"
+    verkauf_bench.generate(data_file, sales=2000, buyers=50)
+
+    report = verkauf_bench.run(str(data_file), repeat=1, memory=False, log=io.StringIO())
+
+    assert set(report["results"]) == set(verkauf_bench.BENCHMARKS)
@@ -0,0 +1,105 @@
+import io
+
+import pytest
+
+from conftest import contents, new_sale, open_backend, seed
+from verkauf_binary import decode_block, encode_block, encode_file, read_header
+
+SALES = [
+    {"id": 1, "user": "abii", "category": "Camos > Dark Matter", "date": "2024-01-02", "amount": 20.0,
+     "description": "", "buyer": "jonas2"},
+    {"id": 7, "user": "björn", "category": "Camos > Nebula", "date": "2024-01-31", "amount": 0.1,
+     "description": "Rabatt \"50%\" – ✓", "buyer": ""},
+    {"id": 2 ** 40, "user": "abii", "category": "Camos > Dark Matter", "date": "2024-01-15", "amount": -3.5,
+     "description": "mehrzeilig\nText", "buyer": "jonas2"},
+]
+
+
+@pytest.mark.parametrize("compression", [None, "zlib"])
+def test_block_round_trip(compression):
+    block = encode_block(SALES, compression)
+    # Block mitten in einem größeren Puffer, wie im mmap der Datei
+    buffer = b"xyz" + block + b"rest"
+    assert decode_block(buffer, 3, compression) == SALES
+    assert decode_block(memoryview(buffer), 3, compression) == SALES
+    assert decode_block(encode_block([], compression), 0, compression) == []
+
+
+def test_missing_text_fields_decode_empty():
+    sale = {"id": 3, "user": "abii", "category": "C > S", "date": "2024-02-01", "amount": 1.0}
+    assert decode_block(encode_block([sale]))[0] == {**sale, "description": "", "buyer": ""}
+
+
+def test_unknown_compression():
+    with pytest.raises(ValueError):
+        encode_block(SALES, "lz4")
+
+
+def test_file_round_trip():
+    blocks = {"2024-01": encode_block(SALES), "2024-02": encode_block(SALES[:1], "zlib")}
+    header = {"next_id": 8, "partitions": {"2024-01": {"compression": None}, "2024-02": {"compression": "zlib"}}}
+    content, start = encode_file(header, blocks)
+
+    parsed, parsed_start = read_header(io.BytesIO(content))
+    assert parsed_start == start and parsed["next_id"] == 8
+    for month, sales in (("2024-01", SALES), ("2024-02", SALES[:1])):
+        entry = parsed["partitions"][month]
+        assert decode_block(content, start + entry["offset"], entry["compression"]) == sales
+    with pytest.raises(ValueError):
+        read_header(io.BytesIO(b"JSON" + content[4:]))
+
+
+# --- BinaryBackend ---
+MONTHS = ["2024-01", "2024-02", "2024-03"]
+
+
+def open_binary(tmp_path, **kwargs):
+    return open_backend(tmp_path, "binary", **kwargs)
+
+
+def add(store, month, buyer, amount=1.0):
+    return store.add_sale(new_sale(store, f"{month}-10", amount, buyer))
+
+
+@pytest.fixture(params=[None, "zlib"])
+def history(tmp_path, request):
+    store = seed(open_binary(tmp_path, compression=request.param))
+    for month in MONTHS:
+        for i in range(3):
+            add(store, month, f"{month}/{i}", amount=i + 1)
+    store.close()
+    return request.param
+
+
+def test_delete_in_unloaded_month_then_reopen(tmp_path, history):
+    store = open_binary(tmp_path, eager_months=0, compression=history)
+    assert store.loaded == set() and store.sale_count() == 9
+    victim = next(sale for sale in open_binary(tmp_path).iter_sales() if sale["buyer"] == "2024-02/1")
+
+    assert store.delete_sales([victim["id"]]) == [victim["id"]]
+    assert store.sale_count() == 8
+    assert store.overall_totals()[0] == pytest.approx(3 * 6 - 2)
+
+    # Erst nur über das Journal, dann nach dem Kompaktieren aus den Blöcken
+    reopened = open_binary(tmp_path, eager_months=0)
+    assert reopened.get_sale(victim["id"]) is None and reopened.sale_count() == 8
+    store.close()
+    reopened = open_binary(tmp_path, eager_months=0)
+    assert reopened.get_sale(victim["id"]) is None
+    assert sorted(buyer for _, buyer, _ in contents(reopened).values()) == sorted(
+        f"{month}/{i}" for month in MONTHS for i in range(3) if (month, i) != ("2024-02", 1)
+    )
+    assert reopened.revenue_by_month() == {"2024-01": 6, "2024-02": 4, "2024-03": 6}
+
+
+def test_compaction_copies_unchanged_blocks(tmp_path, history):
+    store = open_binary(tmp_path, eager_months=0, compression=history)
+    before = dict(store.partitions)
+    add(store, "2024-03", "neu")
+    store.compact()
+    # Unveränderte Monate bleiben ungelesen und behalten ihren Block
+    assert store.loaded == {"2024-03"}
+    for month in ("2024-01", "2024-02"):
+        assert store.partitions[month]["length"] == before[month]["length"]
+    assert store.partitions["2024-03"]["count"] == 4
+    assert len(contents(open_binary(tmp_path, eager_months=0))) == 10
@@ -0,0 +1,32 @@
+import io
+import json
+
+from verkauf_bulk import import_sales
+
+GOOD = {"parent": "Camos", "subcategory": "Dark Matter", "buyer": "jonas2"}
+
+
+def test_import_reports_invalid_jsonl_rows(json_store):
+    lines = [
+        json.dumps(GOOD),
+        '{"parent": "Camos", kaputt',
+        json.dumps([GOOD]),
+        json.dumps({**GOOD, "date": 20240101}),
+        json.dumps({"category": 5}),
+        json.dumps({**GOOD, "user": ["abii"]}),
+        "",
+        json.dumps({**GOOD, "amount": "7.5"}),
+    ]
+    errors = io.StringIO()
+
+    imported, failed = import_sales(json_store, io.StringIO("\n".join(lines) + "\n"), "jsonl", "abii", errors=errors)
+
+    assert (imported, failed) == (2, 5)
+    assert [line.split(":")[0] for line in errors.getvalue().splitlines()] == [f"Zeile {n}" for n in (2, 3, 4, 5, 6)]
+    assert sorted(sale["amount"] for sale in json_store.all_sales()) == [7.5, 20.0]
+
+
+def test_import_csv(json_store):
+    text = "category,amount,buyer\nCamos > Dark Matter,3,a\nCamos > Nichts,3,b\n"
+    imported, failed = import_sales(json_store, io.StringIO(text), "csv", "abii", errors=io.StringIO())
+    assert (imported, failed) == (1, 1)
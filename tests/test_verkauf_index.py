@@ -0,0 +1,163 @@
+import random
+
+from verkauf_index import SEARCH_FIELDS, SalesAggregates, SalesRollups, SalesSearch, TopK, tokenize, top_totals
+
+
+def test_topk_matches_exact_ranking_under_updates():
+    rng = random.Random(7)
+    board = TopK(capacity=5)
+    totals = {}
+    for _ in range(3000):
+        key = f"k{rng.randrange(40)}"
+        # Ganze Beträge erzeugen viele Gleichstände
+        if key in totals and rng.random() < 0.3:
+            amount = -rng.choice([1, 2, 3])
+            if totals[key][1] == 1:
+                amount = -totals[key][0]
+            board.update(key, amount, -1)
+            entry = totals[key]
+            entry[0] += amount
+            entry[1] -= 1
+            if entry[1] <= 0:
+                del totals[key]
+        else:
+            amount = rng.choice([1, 2, 3])
+            board.update(key, amount, 1)
+            entry = totals.setdefault(key, [0, 0])
+            entry[0] += amount
+            entry[1] += 1
+        for n in (1, 3, 5):
+            assert board.ranked(n) == top_totals(totals, n)
+
+
+def test_topk_ties_ordered_like_a_rebuild():
+    board = TopK(capacity=2)
+    for key in ("a", "b", "c"):
+        board.update(key, 10, 1)
+    rebuilt = TopK(capacity=2)
+    rebuilt.totals = {key: list(value) for key, value in board.totals.items()}
+    rebuilt.rebuild()
+
+    assert board.ranked(2) == rebuilt.ranked(2) == [("c", 10, 1), ("b", 10, 1)]
+
+
+def test_topk_more_than_capacity():
+    board = TopK(capacity=2)
+    for i in range(5):
+        board.update(f"k{i}", i, 1)
+    assert [key for key, _, _ in board.ranked(4)] == ["k4", "k3", "k2", "k1"]
+
+
+def scan(sales, query, fields=None, substring=True):
+    """
+    Vergleichswert: alle Verkäufe durchsuchen.
+    """
+    def matches(term, token):
+        return term in token if substring else token.startswith(term)
+
+    ids = set()
+    for sale in sales.values():
+        tokens = [token for field in fields or SEARCH_FIELDS for token in tokenize(sale.get(field) or "")]
+        if all(any(matches(term, token) for token in tokens) for term in tokenize(query)):
+            ids.add(sale["id"])
+    return ids if tokenize(query) else set()
+
+
+def test_search_matches_scan_after_adds_and_removes():
+    rng = random.Random(3)
+    words = ["Jonas", "jonathan", "Müller", "müll", "Dark", "Matter", "Rabatt", "Straße", "x2"]
+    sales = {}
+    search = SalesSearch()
+    for sale_id in range(1, 400):
+        sale = {
+            "id": sale_id,
+            "buyer": " ".join(rng.sample(words, 1)),
+            "description": " ".join(rng.sample(words, rng.randrange(3))),
+            "category": rng.choice(["Camos > Dark Matter", "Camos > Nebula", "Skins > Gold"]),
+        }
+        sales[sale_id] = sale
+        search.add(sale)
+        if rng.random() < 0.3:
+            removed = sales.pop(rng.choice(list(sales)))
+            search.remove(removed)
+
+    for query in ("jon", "JONAS", "müll", "ull", "dark matter", "camos nebula", "strasse", "straße", "x", "", "fehlt"):
+        for fields in (None, ("buyer",), ("description", "category")):
+            for substring in (True, False):
+                assert search.search(query, fields, substring) == scan(sales, query, fields, substring), (
+                    query, fields, substring,
+                )
+
+
+def test_search_forgets_removed_words():
+    search = SalesSearch()
+    sale = {"id": 1, "buyer": "Jonas", "description": "", "category": "Camos > Dark Matter"}
+    search.add(sale)
+    search.remove(sale)
+    assert search.values == {} and search.tokens == {} and search.vocabulary == []
+    assert search.search("jonas") == set()
+
+
+def random_sales(rng, n):
+    return [
+        {
+            "id": i,
+            "user": rng.choice(["abii", "bea"]),
+            "category": rng.choice(["Camos > Dark Matter", "Camos > Gold", "Skins > Neon"]),
+            "date": f"2024-{rng.randint(1, 4):02d}-{rng.randint(1, 28):02d}",
+            "amount": rng.randint(1, 50),
+        }
+        for i in range(n)
+    ]
+
+
+def test_aggregates_match_rebuild_after_adds_and_removes():
+    rng = random.Random(3)
+    sales = random_sales(rng, 300)
+    aggregates = SalesAggregates()
+    for sale in sales:
+        aggregates.add(sale)
+    for sale in sales[::3]:
+        aggregates.remove(sale)
+
+    kept = [sale for index, sale in enumerate(sales) if index % 3]
+    expected = SalesAggregates.build(kept)
+    assert aggregates.overall_totals() == (sum(sale["amount"] for sale in kept), len(kept))
+    assert aggregates.totals_by_user() == expected.totals_by_user()
+    assert aggregates.totals_by_user_category() == expected.totals_by_user_category()
+    assert aggregates.totals_by_category() == expected.totals_by_category()
+
+
+def test_aggregates_forget_emptied_keys():
+    sale = {"id": 1, "user": "abii", "category": "Skins > Neon", "date": "2024-01-01", "amount": 5}
+    aggregates = SalesAggregates.build([sale])
+    aggregates.remove(sale)
+    assert aggregates.totals_by_user() == {}
+    assert aggregates.totals_by_category() == {}
+
+
+def test_rollups_match_scan_for_ranges():
+    rng = random.Random(5)
+    sales = random_sales(rng, 400)
+    rollups = SalesRollups.build(sales)
+    for sale in sales[::4]:
+        rollups.remove(sale)
+    kept = [sale for index, sale in enumerate(sales) if index % 4]
+
+    ranges = [(None, None), ("2024-01-15", "2024-03-10"), ("2024-02-01", "2024-02-29"), ("2024-02-10", "2024-02-10"), ("2024-03-05", None)]
+    for start, end in ranges:
+        inside = [sale for sale in kept if (start is None or sale["date"] >= start) and (end is None or sale["date"] <= end)]
+        aggregates = rollups.aggregate(start, end)
+        assert aggregates.overall_totals() == (sum(sale["amount"] for sale in inside), len(inside))
+        assert aggregates.totals_by_user_category() == SalesAggregates.build(inside).totals_by_user_category()
+        by_month = {}
+        for sale in inside:
+            by_month[sale["date"][:7]] = by_month.get(sale["date"][:7], 0) + sale["amount"]
+        assert rollups.revenue_by_month(start, end) == dict(sorted(by_month.items()))
+
+
+def test_rollups_json_round_trip():
+    rollups = SalesRollups.build(random_sales(random.Random(9), 100))
+    restored = SalesRollups.from_json(rollups.to_json())
+    assert restored.days == rollups.days and restored.months == rollups.months
+    assert restored.day_keys == rollups.day_keys and restored.month_keys == rollups.month_keys
@@ -0,0 +1,41 @@
+import json
+
+from verkauf_metrics import Metrics, percentile
+
+
+def test_percentile_nearest_rank():
+    ordered = [float(i) for i in range(1, 101)]
+    assert percentile(ordered, 0.5) == 50.0
+    assert percentile(ordered, 0.95) == 95.0
+    assert percentile([3.0], 0.95) == 3.0
+    assert percentile([], 0.5) == 0.0
+
+
+def test_summary_keeps_window_but_counts_all_calls():
+    metrics = Metrics(window=3)
+    for seconds in (0.5, 0.001, 0.002, 0.003):
+        metrics.record("save", seconds)
+    metrics.count("bytes_written", 100)
+    metrics.count("bytes_written", 20)
+
+    summary = metrics.summary()
+    # Die älteste Laufzeit (0,5 s) ist aus dem Fenster gefallen
+    assert summary["timings"]["save"] == {"calls": 4, "p50_ms": 2.0, "p95_ms": 3.0, "max_ms": 3.0}
+    assert summary["counters"] == {"bytes_written": 120}
+
+    metrics.reset()
+    assert metrics.summary() == {"timings": {}, "counters": {}}
+
+
+def test_export_appends_json_lines(tmp_path):
+    metrics = Metrics()
+    path = tmp_path / "metrics.jsonl"
+    assert metrics.export(str(path)) == 0 and not path.exists()
+
+    metrics.record("load", 0.25)
+    metrics.count("sales_loaded", 7)
+    assert metrics.export(str(path)) == 2
+    assert metrics.export(str(path)) == 2
+    rows = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [row["name"] for row in rows] == ["load", "sales_loaded"] * 2
+    assert rows[0]["max_ms"] == 250.0 and rows[1]["value"] == 7
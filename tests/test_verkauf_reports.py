@@ -0,0 +1,56 @@
+import io
+import os
+
+import pytest
+
+from conftest import seed
+from verkauf_reports import generate_reports, report_path
+from verkauf_storage import PartitionedBackend, make_sale
+
+MONTHS = ["2024-01", "2024-02", "2024-03", "2024-04"]
+
+
+def add(store, month, amount, user="abii"):
+    sale = make_sale(store.data["categories"], user, "Camos", "Dark Matter", date=f"{month}-10", amount=amount)
+    store.add_sale(sale)
+    return sale
+
+
+@pytest.fixture
+def partitioned(tmp_path):
+    store = seed(PartitionedBackend(str(tmp_path / "parts")))
+    for month in MONTHS:
+        for amount in (1, 2):
+            add(store, month, amount)
+    store.close()
+    return tmp_path / "parts"
+
+
+def test_month_sales_does_not_keep_months(partitioned):
+    store = PartitionedBackend(str(partitioned), eager_months=0)
+    journaled = add(store, "2024-02", 5)
+    removed = store.month_sales("2024-03")[0]["id"]
+    store.delete_sales([removed])
+
+    assert sorted(sale["amount"] for sale in store.month_sales("2024-02")) == [1, 2, 5]
+    assert [sale["amount"] for sale in store.month_sales("2024-03")] == [2]
+    assert journaled["id"] in {sale["id"] for sale in store.month_sales("2024-02")}
+    # Nur der Monat der Löschung wurde zum Nachschlagen geladen
+    assert store.loaded == {"2024-03"}
+
+
+def test_reports_skip_unchanged(partitioned, tmp_path):
+    pytest.importorskip("matplotlib")
+    out = str(tmp_path / "berichte")
+    store = PartitionedBackend(str(partitioned), eager_months=0)
+
+    stats = generate_reports(store, out, dimensions=("user",), workers=1, log=io.StringIO())
+    assert stats == {"written": 4, "skipped": 0, "removed": 0, "failed": 0}
+    assert store.loaded == set()
+    assert os.path.exists(report_path(out, "2024-01", "user", "abii") + ".png")
+
+    add(store, "2024-02", 7)
+    stats = generate_reports(store, out, dimensions=("user",), workers=1, log=io.StringIO())
+    assert stats == {"written": 1, "skipped": 3, "removed": 0, "failed": 0}
+    with open(report_path(out, "2024-02", "user", "abii") + ".csv", encoding="utf-8") as file:
+        assert len(file.read().splitlines()) == 4
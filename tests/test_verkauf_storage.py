@@ -0,0 +1,367 @@
+import os
+
+import pytest
+
+from conftest import BACKENDS, commit_deferred, contents, defer_writes, new_sale, open_backend, seed
+from verkauf_storage import BinaryBackend, PartitionedBackend, migrate_json_to_binary, migrate_json_to_partitions
+
+
+def test_close_without_changes_keeps_snapshot(tmp_path):
+    store = seed(open_backend(tmp_path))
+    store.add_sale(new_sale(store))
+    store.close()
+    data_file = tmp_path / "verkauf_data.json"
+    stat = os.stat(data_file)
+    generation = open_backend(tmp_path).data["generation"]
+
+    for _ in range(3):
+        reader = open_backend(tmp_path)
+        list(reader.iter_sales())
+        reader.close()
+
+    assert os.stat(data_file).st_mtime_ns == stat.st_mtime_ns
+    assert open_backend(tmp_path).data["generation"] == generation
+
+
+def test_queries_while_another_thread_adds(tmp_path):
+    import threading
+
+    store = seed(open_backend(tmp_path, write_behind=True))
+    for i in range(500):
+        store.add_sale(new_sale(store, buyer=f"b{i}"))
+    done = threading.Event()
+    errors = []
+
+    def add():
+        try:
+            for i in range(3000):
+                store.add_sale(new_sale(store, buyer=f"neu{i}"))
+        finally:
+            done.set()
+
+    def read():
+        try:
+            while not done.is_set():
+                store.query_sales(buyer="b1", offset=0, limit=50)
+                store.search_sales("neu", limit=10)
+                store.sales_between("2025-03-01", "2025-03-31")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=add)] + [threading.Thread(target=read) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    store.close()
+
+    assert errors == []
+    assert open_backend(tmp_path).sale_count() == 3500
+
+
+def test_sqlite_rollups_next_to_database(tmp_path, monkeypatch):
+    from verkauf_storage import SqliteBackend
+
+    monkeypatch.chdir(tmp_path)
+    db_file = str(tmp_path / "db" / "verkauf.sqlite3")
+    os.makedirs(os.path.dirname(db_file))
+    store = seed(SqliteBackend(db_file))
+    store.add_sale(new_sale(store))
+    store.close()
+
+    assert os.path.exists(db_file + ".rollups.json")
+    assert not os.path.exists(tmp_path / "verkauf_data.rollups.json")
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("compact_between", [False, True])
+def test_two_writers_with_id_collision(tmp_path, monkeypatch, backend, compact_between):
+    store = seed(open_backend(tmp_path, backend))
+    old = store.add_sale(new_sale(store, date="2024-01-10", buyer="old"))
+    store.close()
+    # Bei den Monats-Backends sind alte Monate dabei nicht geladen
+    lazy = {} if backend == "json" else {"eager_months": 0}
+    first, second = open_backend(tmp_path, backend, **lazy), open_backend(tmp_path, backend, **lazy)
+    # Nur die neuen Einträge übernehmen, nie alles neu laden
+    for store in (first, second):
+        monkeypatch.setattr(store, "_reload", lambda pending: pytest.fail("vollständiges Neuladen"))
+
+    defer_writes(first)
+    own = new_sale(first, buyer="first", amount=1)
+    first.add_sale(own)
+    other = new_sale(second, date="2025-04-01", buyer="second", amount=2)
+    second.add_sale(other)
+    assert own["id"] == other["id"]
+    second.delete_sales([old])
+    if compact_between:
+        second.compact()
+        second.add_sale(new_sale(second, buyer="after", amount=3))
+    commit_deferred(first)
+
+    assert own["id"] != other["id"]
+    assert first.data["next_id"] > own["id"]
+    # Umnummerierung und fremde Änderungen werden beim nächsten Abgleich gemeldet
+    assert first.poll_changes() == {("abii", "Camos > Dark Matter")}
+    assert first.poll_changes() is None
+    second.poll_changes()
+    expected = contents(first)
+    assert sorted(buyer for _, buyer, _ in expected.values()) == sorted(
+        ["first", "second"] + (["after"] if compact_between else [])
+    )
+    assert contents(second) == expected
+    assert first.sale_count() == second.sale_count() == len(expected)
+    first.close()
+    second.close()
+    assert contents(open_backend(tmp_path, backend, **lazy)) == expected
+
+
+def test_remote_delete_and_renumbered_delete(tmp_path):
+    seed(open_backend(tmp_path)).close()
+    first, second = open_backend(tmp_path), open_backend(tmp_path)
+    shared = second.add_sale(new_sale(second, buyer="shared"))
+
+    # Eigener, noch nicht geschriebener Verkauf wird gleich wieder gelöscht;
+    # beim Umnummerieren muss die Löschung mitwandern
+    defer_writes(first)
+    first.poll_changes()
+    mine = first.add_sale(new_sale(first, buyer="mine"))
+    first.delete_sales([mine, shared])
+    second.add_sale(new_sale(second, buyer="colliding"))
+    commit_deferred(first)
+
+    second.poll_changes()
+    for store in (first, second, open_backend(tmp_path)):
+        assert sorted(buyer for _, buyer, _ in contents(store).values()) == ["colliding"]
+
+
+@pytest.mark.parametrize("migrate, open_target", [
+    (migrate_json_to_partitions, PartitionedBackend),
+    (migrate_json_to_binary, BinaryBackend),
+])
+def test_migrate_without_sales_keeps_users_and_categories(tmp_path, migrate, open_target):
+    seed(open_backend(tmp_path)).close()
+    target = str(tmp_path / "target")
+
+    assert migrate(str(tmp_path / "verkauf_data.json"), str(tmp_path / "verkauf_data.journal"), target) == 0
+
+    store = open_target(target)
+    assert store.data["users"] == {"abii": "geheim"}
+    assert store.data["categories"] == {"Camos": {"subcategories": {"Dark Matter": {"price": 20.0}}}}
+    assert store.sale_count() == 0
+
+
+def test_sqlite_queries_while_another_session_polls(tmp_path):
+    import threading
+
+    from verkauf_storage import SqliteBackend
+
+    db_file = str(tmp_path / "verkauf_data.sqlite3")
+    # Eine Instanz für alle Sitzungen (wie st.cache_resource), eine zweite als anderer Prozess
+    shared = seed(SqliteBackend(db_file))
+    other = SqliteBackend(db_file)
+    done = threading.Event()
+    errors = []
+
+    def run(action):
+        try:
+            while not done.is_set():
+                action()
+        except Exception as e:
+            errors.append(e)
+            done.set()
+
+    readers = [
+        threading.Thread(target=run, args=(action,)) for action in (
+            shared.poll_changes,
+            lambda: shared.leaderboard("buyer", 5),
+            lambda: shared.search_sales("k1", limit=5),
+            shared.totals_by_category,
+        )
+    ]
+    for thread in readers:
+        thread.start()
+    try:
+        for i in range(300):
+            other.add_sale(new_sale(other, buyer=f"k{i}"))
+            if done.is_set():
+                break
+    finally:
+        done.set()
+        for thread in readers:
+            thread.join()
+    shared.close()
+    other.close()
+
+    assert errors == []
+
+
+def test_poll_without_blocking_while_someone_writes(tmp_path):
+    import threading
+
+    from verkauf_storage import FileLock
+
+    seed(open_backend(tmp_path)).close()
+    store, other = open_backend(tmp_path), open_backend(tmp_path)
+    other.add_sale(new_sale(other, buyer="other"))
+
+    # Anderer Prozess (z. B. Massenimport) hält die Dateisperre
+    with FileLock(str(tmp_path / "verkauf_data.json.lock")):
+        assert store.poll_changes(blocking=False) is None
+
+    # Eigener Hintergrund-Thread hält die Dateisperre
+    holding, release = threading.Event(), threading.Event()
+
+    def write():
+        with store.file_lock:
+            holding.set()
+            release.wait()
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    holding.wait()
+    try:
+        assert store.poll_changes(blocking=False) is None
+    finally:
+        release.set()
+        writer.join()
+
+    assert store.poll_changes(blocking=False) == {("abii", "Camos > Dark Matter")}
+    assert [sale["buyer"] for sale in store.iter_sales()] == ["other"]
+
+
+@pytest.mark.parametrize("backend", ["partitioned", "binary"])
+def test_buyer_leaderboard_without_loading_months(tmp_path, monkeypatch, backend):
+    store = seed(open_backend(tmp_path, backend))
+    for month in range(1, 7):
+        for buyer, amount in (("anna", 5), ("ben", 3), ("carl", 5), (f"einmal{month}", 1)):
+            store.add_sale(new_sale(store, date=f"2023-{month:02d}-10", amount=amount, buyer=buyer))
+    store.close()
+
+    store = open_backend(tmp_path, backend, eager_months=0)
+    other = open_backend(tmp_path, backend, eager_months=0)
+    gone = next(sale["id"] for sale in other.iter_sales() if sale["buyer"] == "ben")
+    other.delete_sales([gone])
+    store.poll_changes()
+    store.add_sale(new_sale(store, date="2023-02-11", amount=4, buyer="dora"))
+    monkeypatch.setattr(store, "_partition_sales", lambda month: pytest.fail(f"Monat {month} gelesen"))
+
+    expected = [("carl", 30.0, 6), ("anna", 30.0, 6), ("ben", 15.0, 5), ("dora", 4.0, 1)]
+    assert store.leaderboard("buyer", 4) == expected
+    monkeypatch.undo()
+    other.close()
+    store.close()
+    # Nach dem Neuladen gleiche Reihenfolge (auch bei Gleichstand)
+    assert open_backend(tmp_path, backend, eager_months=0).leaderboard("buyer", 4) == expected
+
+
+def test_buyer_totals_added_to_older_manifest(tmp_path):
+    import json
+
+    store = seed(open_backend(tmp_path, "partitioned"))
+    for buyer in ("anna", "ben", "anna"):
+        store.add_sale(new_sale(store, date="2023-05-10", buyer=buyer))
+    store.close()
+    manifest_file = tmp_path / "verkauf_data.parts" / "manifest.json"
+    manifest = json.loads(manifest_file.read_text())
+    for entry in manifest["partitions"].values():
+        del entry["buyers"]
+    manifest_file.write_text(json.dumps(manifest))
+
+    store = open_backend(tmp_path, "partitioned", eager_months=0)
+    assert store.leaderboard("buyer", 2) == [("anna", 40.0, 2), ("ben", 20.0, 1)]
+    store.close()
+    assert "buyers" in json.loads(manifest_file.read_text())["partitions"]["2023-05"]
+    assert open_backend(tmp_path, "partitioned", eager_months=0).buyer_totals == {
+        "anna": [40.0, 2], "ben": [20.0, 1],
+    }
+
+
+def test_search_sales_pages_newest_first(json_store):
+    ids = [json_store.add_sale(new_sale(json_store, buyer=f"Jonas {i}")) for i in range(5)]
+    json_store.add_sale(new_sale(json_store, buyer="Anna"))
+
+    rows, total = json_store.search_sales("jonas", offset=1, limit=2)
+    assert total == 5
+    assert [sale["id"] for sale in rows] == ids[::-1][1:3]
+
+    # Der Index wird bei Änderungen nachgeführt
+    json_store.delete_sales(ids[:2])
+    json_store.add_sale(new_sale(json_store, buyer="jonathan"))
+    rows, total = json_store.search_sales("jona", fields=("buyer",), substring=False)
+    assert total == 4 and rows[0]["buyer"] == "jonathan"
+    assert json_store.search_sales("dark matter", fields=("buyer",))[1] == 0
+
+
+def test_file_version_tolerates_files_vanishing(tmp_path, monkeypatch):
+    from verkauf_storage import file_version
+
+    present, vanishing = tmp_path / "a", tmp_path / "b"
+    present.write_text("x")
+    vanishing.write_text("y")
+    stat = os.stat
+
+    def racing_stat(path, *args, **kwargs):
+        # Wie ein anderer Prozess, der das Journal zwischen exists() und stat() umbenennt
+        if str(path) == str(vanishing):
+            raise FileNotFoundError(path)
+        return stat(path, *args, **kwargs)
+
+    monkeypatch.setattr(os, "stat", racing_stat)
+    assert [entry[0] for entry in file_version([str(present), str(vanishing)])] == [str(present)]
+
+
+def test_add_appends_to_journal_without_rewriting_snapshot(tmp_path):
+    import json
+
+    store = seed(open_backend(tmp_path))
+    store.add_sale(new_sale(store, amount=1))
+    store.compact()
+    data_file, journal_file = tmp_path / "verkauf_data.json", tmp_path / "verkauf_data.journal"
+    snapshot = data_file.read_bytes()
+
+    added = [store.add_sale(new_sale(store, amount=amount)) for amount in (2, 3)]
+    store.delete_sale(added[0])
+
+    assert data_file.read_bytes() == snapshot
+    ops = [json.loads(line)["op"] for line in journal_file.read_text(encoding="utf-8").splitlines()]
+    assert ops == ["header", "add_sale", "add_sale", "delete_sales"]
+    # Ohne Kompaktieren: ein neuer Prozess spielt das Journal nach
+    assert contents(open_backend(tmp_path)) == contents(store)
+    assert sorted(sale["amount"] for sale in open_backend(tmp_path).iter_sales()) == [1, 3]
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_deleted_ids_are_not_reused(tmp_path, backend):
+    store = seed(open_backend(tmp_path, backend))
+    ids = store.add_sales([new_sale(store, amount=amount) for amount in (1, 2, 3)])
+    assert ids == [1, 2, 3]
+    assert store.delete_sales([3, 2, 99]) == [3, 2]
+    assert store.get_sale(3) is None and store.get_sale(1)["amount"] == 1
+    store.close()
+
+    store = open_backend(tmp_path, backend)
+    # Auch die höchste, gelöschte ID wird nicht neu vergeben
+    assert store.add_sale(new_sale(store)) == 4
+    assert sorted(contents(store)) == [1, 4]
+    store.close()
+
+
+def test_old_months_loaded_only_when_needed(tmp_path):
+    store = seed(open_backend(tmp_path, "partitioned"))
+    for month in range(1, 7):
+        store.add_sales([new_sale(store, date=f"2023-{month:02d}-{day:02d}", amount=month) for day in (5, 20)])
+    store.close()
+
+    store = open_backend(tmp_path, "partitioned", eager_months=0)
+    assert store.loaded == set()
+    assert store.sale_count() == 12 and store.overall_totals() == (42.0, 12)
+    assert store.revenue_by_month()["2023-04"] == 8.0
+
+    # Volle Monate aus den Monatssummen, nur die Randmonate werden geladen
+    assert store.period_aggregates("2023-02-10", "2023-05-10").overall_totals() == (21.0, 6)
+    assert store.loaded == {"2023-02", "2023-05"}
+
+    page, total = store.query_sales(offset=6, limit=2)
+    assert total == 12 and [sale["date"] for sale in page] == ["2023-04-05", "2023-04-20"]
+    assert store.loaded == {"2023-02", "2023-04", "2023-05"}
+    store.close()
@@ -0,0 +1,21 @@
+# Hilfsfunktionen für Diagramme. Die Summen selbst kommen aus den
+# mitgeführten Aggregaten und Rollups der Speicher-Backends
+# (verkauf_index.py): Umsatz nach Benutzer und Kategorie aus
+# SalesAggregates, nach Monat oder Zeitraum aus SalesRollups, nach Käufer aus
+# SalesLeaderboards. Eine spaltenweise Kopie aller Verkäufe (früher
+# SalesColumns mit NumPy) gibt es nicht mehr: sie müsste bei den
+# Monats-Partitionen jeden Monat laden und wäre bei jeder Änderung doppelt
+# nachzuführen.
+
+
+def top_n(totals, n, other_label="Andere"):
+    """
+    Die n größten Einträge eines {Bezeichnung: Umsatz}-Dicts, absteigend
+    sortiert; der Rest wird unter `other_label` zusammengefasst.
+    Ohne n (None) werden alle Einträge sortiert zurückgegeben.
+    """
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)
+    if n is None or len(ranked) <= n:
+        return ranked
+    rest = sum(value for _, value in ranked[n:])
+    return ranked[:n] + [(other_label, rest)]
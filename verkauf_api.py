@@ -0,0 +1,313 @@
+# HTTP-Schnittstelle zum Einliefern von Verkäufen durch andere Programme
+# auf demselben Rechner (z. B. Shop-Bots), ohne GUI.
+#
+#   python verkauf_api.py --port 8765
+#
+#   POST /sales       ein Verkauf als Objekt, mehrere als Liste oder {"sales": [...]}
+#                     -> 201 {"ids": [...]} bzw. 400 {"errors": [{"index": i, "error": ...}]}
+#   GET  /categories  Kategorienbaum mit Preisen
+#   GET  /health      Status und Anzahl Verkäufe
+#
+# Geprüft wird wie beim Import (verkauf_bulk.row_to_sale): Benutzer und
+# Kategorie müssen existieren, ohne Betrag gilt der Preis der
+# Unterkategorie, ohne Datum das heutige. Eine Anfrage wird ganz oder gar
+# nicht gespeichert. Gleichzeitige Anfragen werden gesammelt und gemeinsam
+# mit einem Schreibvorgang (inkl. fsync) gespeichert; geantwortet wird erst,
+# wenn die Verkäufe auf der Platte sind.
+import argparse
+import asyncio
+import copy
+import json
+import signal
+import sys
+from http import HTTPStatus
+
+from verkauf_bulk import row_to_sale
+from verkauf_metrics import timed
+from verkauf_storage import open_store
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Wie lange nach der ersten Anfrage auf weitere gewartet wird (Sekunden)
+BATCH_WINDOW = 0.005
+# Höchstens so viele Verkäufe pro Schreibvorgang
+MAX_BATCH_SALES = 5000
+# Größte angenommene Anfrage (Bytes)
+MAX_BODY = 10 * 1024 * 1024
+# Wartezeit auf das Schreiben, danach 503
+COMMIT_TIMEOUT = 30
+
+
+class RequestError(Exception):
+    """
+    Ungültige Anfrage; wird als JSON-Fehler mit `status` beantwortet.
+    """
+
+    def __init__(self, status, message, errors=None):
+        super().__init__(message)
+        self.status = status
+        self.errors = errors
+
+
+class BatchCommitter:
+    """
+    Sammelt die Verkäufe gleichzeitiger Anfragen und speichert sie gemeinsam.
+    Geschrieben wird in einem Worker-Thread, damit die Ereignisschleife
+    weiter Anfragen annimmt; es läuft immer nur ein Schreibvorgang.
+    """
+
+    def __init__(self, store, window=BATCH_WINDOW, max_sales=MAX_BATCH_SALES):
+        self.store = store
+        self.window = window
+        self.max_sales = max_sales
+        self.queue = asyncio.Queue()
+        self.batches = 0
+
+    async def submit(self, rows):
+        """
+        Speichert die Zeilen einer Anfrage; gibt die IDs zurück oder löst
+        RequestError mit den fehlerhaften Zeilen aus.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((rows, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self.queue.get()]
+            size = len(items[0][0])
+            deadline = loop.time() + self.window
+            while size < self.max_sales:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                items.append(item)
+                size += len(item[0])
+
+            try:
+                results = await loop.run_in_executor(None, self.commit, [rows for rows, _ in items])
+            except Exception as e:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(RequestError(HTTPStatus.SERVICE_UNAVAILABLE, f"Speichern fehlgeschlagen: {e}"))
+                continue
+            for (_, future), result in zip(items, results):
+                if future.done():
+                    continue  # Client hat nicht gewartet
+                if isinstance(result, RequestError):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    @timed("api_commit")
+    def commit(self, requests):
+        """
+        Prüft und speichert mehrere Anfragen mit einem Schreibvorgang (im
+        Worker-Thread). Ergebnis pro Anfrage: Liste der IDs oder RequestError.
+        """
+        store = self.store
+        # Neue Benutzer/Kategorien aus anderen Instanzen berücksichtigen
+        store.poll_changes()
+        results = []
+        accepted = []
+        for rows in requests:
+            sales, errors = [], []
+            for index, row in enumerate(rows):
+                try:
+                    if not isinstance(row, dict):
+                        raise ValueError("Verkauf muss ein JSON-Objekt sein")
+                    sales.append(row_to_sale(store.data["categories"], store.data["users"], row))
+                except (ValueError, TypeError, AttributeError) as e:
+                    # Auch unerwartete Typen betreffen nur diese Anfrage, nicht den ganzen Stapel
+                    errors.append({"index": index, "error": str(e)})
+            if errors:
+                results.append(RequestError(HTTPStatus.BAD_REQUEST, "Ungültige Verkäufe", errors))
+            else:
+                results.append(sales)
+                accepted.extend(sales)
+
+        if accepted:
+            store.add_sales(accepted)
+            writer = getattr(store, "writer", None)
+            if writer is not None:
+                if not writer.flush(COMMIT_TIMEOUT):
+                    raise OSError("Zeitüberschreitung beim Schreiben")
+            else:
+                store.flush()
+            self.batches += 1
+        # IDs erst nach dem Schreiben lesen: bei einer Kollision mit einem
+        # anderen Prozess werden sie beim Speichern noch angepasst
+        return [result if isinstance(result, RequestError) else [sale["id"] for sale in result] for result in results]
+
+
+class IngestServer:
+    """
+    Minimaler HTTP/1.1-Server (Keep-Alive, Content-Length) auf asyncio-Basis.
+    """
+
+    def __init__(self, store, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.store = store
+        self.host = host
+        self.port = port
+        self.committer = BatchCommitter(store)
+        self.connections = {}
+
+    async def serve(self):
+        """
+        Läuft bis SIGINT/SIGTERM; offene Verbindungen werden danach
+        geschlossen und laufende Anfragen zu Ende bearbeitet.
+        """
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass  # Windows: Strg+C beendet über KeyboardInterrupt
+        server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        committer = asyncio.create_task(self.committer.run())
+        address = server.sockets[0].getsockname()
+        print(f"Verkaufs-API auf http://{address[0]}:{address[1]} ({self.store.name}-Backend)", file=sys.stderr)
+        try:
+            await stop.wait()
+        finally:
+            server.close()
+            for writer in list(self.connections.values()):
+                writer.close()
+            await asyncio.gather(*self.connections, return_exceptions=True)
+            committer.cancel()
+
+    async def handle_connection(self, reader, writer):
+        self.connections[asyncio.current_task()] = writer
+        try:
+            while True:
+                try:
+                    request = await self.read_request(reader)
+                except RequestError as e:
+                    await self.respond(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    return
+                if request is None:
+                    return
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                try:
+                    status, payload = await self.dispatch(method, path, body)
+                except RequestError as e:
+                    status, payload = e.status, {"error": str(e)}
+                    if e.errors:
+                        payload["errors"] = e.errors
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            del self.connections[asyncio.current_task()]
+            writer.close()
+
+    async def read_request(self, reader):
+        """
+        Liest eine Anfrage; None, wenn der Client die Verbindung geschlossen hat.
+        """
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, path, _ = line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "Ungültige Anfragezeile")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "Ungültige Content-Length")
+        if length > MAX_BODY:
+            raise RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Anfrage zu groß")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), path.split("?", 1)[0], headers, body
+
+    async def dispatch(self, method, path, body):
+        if path == "/sales":
+            if method != "POST":
+                raise RequestError(HTTPStatus.METHOD_NOT_ALLOWED, "Nur POST erlaubt")
+            rows = parse_sales(body)
+            ids = await self.committer.submit(rows)
+            return HTTPStatus.CREATED, {"ids": ids}
+        if path == "/categories" and method == "GET":
+            categories = await asyncio.get_running_loop().run_in_executor(None, self.categories)
+            return HTTPStatus.OK, {"categories": categories}
+        if path == "/health" and method == "GET":
+            return HTTPStatus.OK, {"status": "ok", "backend": self.store.name, "sales": self.store.sale_count()}
+        raise RequestError(HTTPStatus.NOT_FOUND, f"Unbekannter Pfad: {path}")
+
+    def categories(self):
+        """
+        Kopie des Kategorienbaums (im Worker-Thread): der Commit-Thread
+        kann ihn beim Abgleich mit anderen Instanzen gleichzeitig ändern.
+        """
+        with self.store.lock:
+            return copy.deepcopy(self.store.data["categories"])
+
+    async def respond(self, writer, status, payload, keep_alive=True):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+
+def parse_sales(body):
+    """
+    Anfragekörper -> Liste von Zeilen (Objekt, Liste oder {"sales": [...]}).
+    """
+    try:
+        payload = json.loads(body or b"null")
+    except ValueError as e:
+        raise RequestError(HTTPStatus.BAD_REQUEST, f"Ungültiges JSON: {e}")
+    if isinstance(payload, dict) and isinstance(payload.get("sales"), list):
+        payload = payload["sales"]
+    if isinstance(payload, dict):
+        return [payload]
+    if isinstance(payload, list) and payload:
+        return payload
+    raise RequestError(HTTPStatus.BAD_REQUEST, "Erwartet ein Verkaufsobjekt oder eine nicht leere Liste")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP-Schnittstelle zum Einliefern von Verkäufen.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Nur lokal erreichbar lassen (Standard 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--backend", choices=["json", "sqlite", "partitioned", "binary"], help="Speicher-Backend (sonst automatisch)")
+    args = parser.parse_args(argv)
+
+    # Schreiben im Hintergrund-Thread; gesammelt wird bereits im BatchCommitter
+    store = open_store(args.backend, write_behind=True)
+    if getattr(store, "writer", None) is not None:
+        store.writer.delay = 0
+    try:
+        asyncio.run(IngestServer(store, args.host, args.port).serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
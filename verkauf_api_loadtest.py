@@ -0,0 +1,171 @@
+# Lasttest für verkauf_api.py.
+#
+#   python verkauf_api_loadtest.py --spawn                  eigene Instanz in einem Temp-Verzeichnis
+#   python verkauf_api_loadtest.py --port 8765 --user abii  gegen eine laufende Instanz
+#
+# Öffnet `--clients` Verbindungen, die jeweils `--requests` POST /sales mit
+# `--batch` Verkäufen schicken (Keep-Alive), und gibt Durchsatz sowie
+# Latenzen (p50/p95/max) als JSON aus.
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from verkauf_api import DEFAULT_HOST, DEFAULT_PORT
+from verkauf_metrics import percentile
+from verkauf_storage import (
+    BINARY_FILE, DATA_FILE, DB_FILE, JOURNAL_FILE, PARTITION_DIR, migrate_json_to_binary, migrate_json_to_partitions,
+    migrate_json_to_sqlite,
+)
+
+SPAWN_USER = "loadtest"
+
+
+async def request(reader, writer, method, path, payload=None):
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def client(host, port, rows, requests, batch, latencies, failures):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(requests):
+            payload = [random.choice(rows) for _ in range(batch)]
+            t0 = time.perf_counter()
+            status, answer = await request(reader, writer, "POST", "/sales", payload if batch > 1 else payload[0])
+            latencies.append(time.perf_counter() - t0)
+            if status != 201:
+                failures.append(answer)
+    finally:
+        writer.close()
+
+
+async def run(host, port, user, clients, requests, batch):
+    reader, writer = await asyncio.open_connection(host, port)
+    _, answer = await request(reader, writer, "GET", "/categories")
+    _, health = await request(reader, writer, "GET", "/health")
+    writer.close()
+
+    # Verkäufe ohne Betrag: der Server übernimmt den Preis der Unterkategorie
+    rows = [
+        {"user": user, "parent": parent, "subcategory": subcategory, "buyer": f"bot{i}"}
+        for parent, info in answer["categories"].items()
+        for i, subcategory in enumerate(info.get("subcategories", {}))
+    ]
+    if not rows:
+        raise SystemExit("Keine Unterkategorien vorhanden – nichts zu senden.")
+
+    latencies, failures = [], []
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client(host, port, rows, requests, batch, latencies, failures) for _ in range(clients)))
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+    return {
+        "backend": health["backend"],
+        "clients": clients,
+        "requests": len(latencies),
+        "sales": len(latencies) * batch,
+        "failed": len(failures),
+        "first_error": failures[0] if failures else None,
+        "seconds": elapsed,
+        "requests_per_second": len(latencies) / elapsed,
+        "sales_per_second": len(latencies) * batch / elapsed,
+        "latency_ms": {
+            "p50": percentile(latencies, 0.5) * 1000,
+            "p95": percentile(latencies, 0.95) * 1000,
+            "max": latencies[-1] * 1000 if latencies else 0,
+        },
+    }
+
+
+def spawn(workdir, port, backend):
+    """
+    Startet verkauf_api.py mit leerem Datenbestand (ein Benutzer, eine
+    Kategorie mit Preisen) im Verzeichnis `workdir`.
+    """
+    data = {
+        "users": {SPAWN_USER: "loadtest"},
+        "categories": {"Camos": {"subcategories": {"Dark Matter": {"price": 20.0}, "Nebula": {"price": 5.0}}}},
+        "sales": [],
+        "next_id": 1,
+    }
+    data_file, journal_file = os.path.join(workdir, DATA_FILE), os.path.join(workdir, JOURNAL_FILE)
+    with open(data_file, "w", encoding="utf-8") as file:
+        json.dump(data, file)
+    if backend == "sqlite":
+        migrate_json_to_sqlite(data_file, os.path.join(workdir, DB_FILE), journal_file)
+    elif backend == "partitioned":
+        migrate_json_to_partitions(data_file, journal_file, os.path.join(workdir, PARTITION_DIR))
+    elif backend == "binary":
+        migrate_json_to_binary(data_file, journal_file, os.path.join(workdir, BINARY_FILE))
+    here = os.path.dirname(os.path.abspath(__file__))
+    command = [sys.executable, os.path.join(here, "verkauf_api.py"), "--port", str(port)]
+    if backend:
+        command += ["--backend", backend]
+    env = dict(os.environ, PYTHONPATH=here + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    return subprocess.Popen(command, cwd=workdir, env=env)
+
+
+async def wait_until_ready(host, port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit("API-Prozess wurde beendet.")
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise SystemExit("API nicht erreichbar.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lasttest für die Verkaufs-API.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--user", default=SPAWN_USER, help="Benutzer, für den die Verkäufe eingeliefert werden")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=100, help="Anfragen pro Client")
+    parser.add_argument("--batch", type=int, default=1, help="Verkäufe pro Anfrage")
+    parser.add_argument("--spawn", action="store_true", help="Eigene API-Instanz in einem Temp-Verzeichnis starten")
+    parser.add_argument("--backend", choices=["json", "sqlite", "partitioned", "binary"], help="Backend der gestarteten Instanz")
+    args = parser.parse_args(argv)
+
+    if not args.spawn:
+        report = asyncio.run(run(args.host, args.port, args.user, args.clients, args.requests, args.batch))
+    else:
+        with tempfile.TemporaryDirectory() as workdir:
+            process = spawn(workdir, args.port, args.backend)
+            try:
+                asyncio.run(wait_until_ready(args.host, args.port, process))
+                report = asyncio.run(run(args.host, args.port, args.user, args.clients, args.requests, args.batch))
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+
+    print(json.dumps(report, indent=4))
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
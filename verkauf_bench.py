@@ -0,0 +1,313 @@
+# Benchmarks für die zeitkritischen Pfade, ohne GUI.
+#
+#   python verkauf_bench.py generate gross.json --sales 1000000
+#   python verkauf_bench.py run --sales 100000 --output ergebnis.json
+#   python verkauf_bench.py run --data gross.json --baseline basis.json
+#
+# Gemessen werden Laden/Speichern des Snapshots, der Aufbau des Speichers
+# und die Summen, die Dashboard, Diagramm und Streamlit-Dashboard anzeigen.
+# Pro Operation werden Laufzeit (bester und mittlerer Wert) und der
+# Spitzen-Speicherbedarf (tracemalloc) als JSON ausgegeben.
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from verkauf_index import SalesAggregates
+from verkauf_storage import EAGER_MONTHS, BinaryBackend, JsonBackend, migrate_json_to_binary, read_data, save_data
+
+CHUNK_SIZE = 100000
+
+# Erzeugte Verkäufe liegen in den `days` Tagen vor diesem Datum. Fest statt
+# date.today(), damit derselbe --seed an jedem Tag dieselben Daten (und
+# dieselben Zeiträume in den Benchmarks) ergibt und Basis-Vergleiche passen.
+GENERATED_END = date(2025, 1, 1)
+
+# Abweichungen unterhalb dieser Grenzen gelten als Messrauschen
+MIN_SECONDS_DELTA = 0.005
+MIN_BYTES_DELTA = 1024 * 1024
+
+
+# ------------------------- Testdaten -------------------------
+def generate(path, sales=100000, users=20, parents=10, subcategories=8, buyers=5000, days=730, seed=1):
+    """
+    Schreibt eine verkauf_data.json mit zufälligen, aber realistisch
+    verteilten Verkäufen: wenige Käufer und Kategorien machen den Großteil
+    des Umsatzes aus. Die Verkäufe werden stückweise geschrieben, damit
+    auch 10⁷ Einträge nicht gleichzeitig im Speicher liegen.
+    """
+    rng = random.Random(seed)
+    user_names = [f"user{i}" for i in range(users)]
+    buyer_names = [f"kaeufer{i}" for i in range(buyers)]
+    categories = {}
+    items = []
+    for p in range(parents):
+        parent = f"Kategorie {p}"
+        categories[parent] = {"subcategories": {}}
+        for s in range(subcategories):
+            price = float(rng.choice([1, 2, 5, 10, 20, 50, 100, 400]))
+            categories[parent]["subcategories"][f"Artikel {s}"] = {"price": price}
+            items.append((f"{parent} > Artikel {s}", price))
+
+    # Zipf-artige Gewichte: der i-te Eintrag ist 1/(i+1) so häufig wie der erste
+    buyer_weights = [1 / (i + 1) for i in range(buyers)]
+    item_weights = [1 / (i + 1) for i in range(len(items))]
+    first_day = GENERATED_END - timedelta(days=days)
+
+    with open(path, "w", encoding="utf-8") as file:
+        file.write('{"users": ' + json.dumps({name: "bench" for name in user_names}))
+        file.write(', "categories": ' + json.dumps(categories))
+        file.write(f', "next_id": {sales + 1}, "sales": [\n')
+        sale_id = 1
+        while sale_id <= sales:
+            n = min(CHUNK_SIZE, sales - sale_id + 1)
+            chunk_buyers = rng.choices(buyer_names, weights=buyer_weights, k=n)
+            chunk_items = rng.choices(items, weights=item_weights, k=n)
+            lines = []
+            for buyer, (category, price) in zip(chunk_buyers, chunk_items):
+                lines.append(json.dumps({
+                    "id": sale_id,
+                    "user": rng.choice(user_names),
+                    "category": category,
+                    "date": (first_day + timedelta(days=rng.randrange(days))).isoformat(),
+                    "amount": price * rng.randint(1, 3),
+                    "description": "",
+                    "buyer": buyer,
+                }))
+                sale_id += 1
+            file.write(",\n".join(lines))
+            file.write(",\n" if sale_id <= sales else "\n")
+        file.write("]}\n")
+
+
+# ------------------------- Benchmarks -------------------------
+class BenchContext:
+    """
+    Gemeinsame Vorbereitung der Benchmarks. Der Speicher wird nur einmal
+    geöffnet und danach nur gelesen; Schreib-Benchmarks arbeiten auf
+    Dateien im temporären Verzeichnis.
+    """
+
+    def __init__(self, data_file, workdir):
+        self.data_file = data_file
+        self.journal_file = os.path.join(workdir, "bench.journal")
+        self.scratch_file = os.path.join(workdir, "bench_save.json")
+        self.rollup_file = os.path.join(workdir, "bench.rollups.json")
+        self.binary_file = os.path.join(workdir, "bench.vkb")
+        self._store = None
+
+    def store(self):
+        if self._store is None:
+            self._store = JsonBackend(self.data_file, self.journal_file, rollup_file=self.rollup_file)
+        return self._store
+
+
+def bench_load_data(ctx):
+    return lambda: read_data(ctx.data_file, ctx.journal_file)
+
+
+def bench_save_data(ctx):
+    data = ctx.store().snapshot()
+    return lambda: save_data(data, ctx.scratch_file, ctx.journal_file)
+
+
+def bench_open_store(ctx):
+    # Ohne gespeicherte Rollups, damit jeder Lauf alles neu aufbaut
+    return lambda: JsonBackend(ctx.data_file, ctx.journal_file, rollup_file=ctx.rollup_file)
+
+
+def bench_open_binary(ctx):
+    # Gleicher Datenbestand als binärer Snapshot (einmalig umgewandelt)
+    if not os.path.exists(ctx.binary_file):
+        migrate_json_to_binary(ctx.data_file, ctx.journal_file, ctx.binary_file)
+    # Sofort geladen werden die letzten EAGER_MONTHS Monate der Testdaten, nicht die vor heute
+    last = GENERATED_END - timedelta(days=1)
+    today = date.today()
+    eager_months = (today.year - last.year) * 12 + today.month - last.month + EAGER_MONTHS
+    return lambda: BinaryBackend(ctx.binary_file, eager_months=eager_months)
+
+
+def bench_dashboard_totals(ctx):
+    store = ctx.store()
+    return lambda: (store.overall_totals(), store.totals_by_user(), store.totals_by_user_category())
+
+
+def bench_dashboard_rebuild(ctx):
+    sales = list(ctx.store().sales.values())
+    return lambda: SalesAggregates.build(sales)
+
+
+def bench_dashboard_range(ctx):
+    store = ctx.store()
+    end = GENERATED_END
+    start = end - timedelta(days=365)
+    return lambda: store.period_aggregates(start.isoformat(), end.isoformat())
+
+
+def bench_chart(ctx):
+    from verkauf_analytics import top_n
+
+    store = ctx.store()
+    return lambda: top_n(store.totals_by_category(), 10)
+
+
+def bench_streamlit_totals(ctx):
+    store = ctx.store()
+    return lambda: (store.overall_totals(), store.totals_by_category(), store.revenue_by_month())
+
+
+def bench_streamlit_range(ctx):
+    store = ctx.store()
+    end = GENERATED_END
+    start = (end - timedelta(days=90)).isoformat()
+
+    def run():
+        period = store.period_aggregates(start, end.isoformat())
+        return period.overall_totals(), period.totals_by_category(), store.revenue_by_month(start, end.isoformat())
+
+    return run
+
+
+BENCHMARKS = {
+    "load_data": bench_load_data,
+    "save_data": bench_save_data,
+    "open_store": bench_open_store,
+    "open_binary": bench_open_binary,
+    "dashboard_totals": bench_dashboard_totals,
+    "dashboard_rebuild": bench_dashboard_rebuild,
+    "dashboard_range": bench_dashboard_range,
+    "chart": bench_chart,
+    "streamlit_totals": bench_streamlit_totals,
+    "streamlit_range": bench_streamlit_range,
+}
+
+
+def measure(fn, repeat=3, memory=True):
+    """
+    Führt fn `repeat`-mal aus und misst danach einmal unter tracemalloc
+    den Spitzen-Speicher (getrennt, weil tracemalloc die Laufzeit verfälscht).
+    """
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+    result = {"seconds": min(timings), "median": statistics.median(timings)}
+    if memory:
+        tracemalloc.start()
+        try:
+            fn()
+            result["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def run(data_file, names=None, repeat=3, memory=True, log=sys.stderr):
+    with tempfile.TemporaryDirectory() as workdir:
+        ctx = BenchContext(data_file, workdir)
+        results = {}
+        for name in names or BENCHMARKS:
+            results[name] = measure(BENCHMARKS[name](ctx), repeat, memory)
+            print(f"{name:<20} {results[name]['seconds']:.4f} s", file=log)
+        sale_count = ctx.store().sale_count()
+    return {
+        "meta": {
+            "data_file": os.path.abspath(data_file),
+            "sales": sale_count,
+            "repeat": repeat,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def compare(report, baseline, tolerance=0.25):
+    """
+    Vergleicht mit einer gespeicherten Basis. Gibt die Liste der
+    Verschlechterungen als (Operation, Messgröße, Basis, aktuell) zurück.
+    """
+    regressions = []
+    for name, current in report["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        for metric, min_delta in (("seconds", MIN_SECONDS_DELTA), ("peak_bytes", MIN_BYTES_DELTA)):
+            if metric not in base or metric not in current:
+                continue
+            if current[metric] > base[metric] * (1 + tolerance) and current[metric] - base[metric] > min_delta:
+                regressions.append((name, metric, base[metric], current[metric]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks für Laden, Speichern und Auswertungen.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    gen = commands.add_parser("generate", help="Testdatei erzeugen")
+    gen.add_argument("path")
+
+    bench = commands.add_parser("run", help="Benchmarks ausführen")
+    bench.add_argument("--data", help="Vorhandene Datendatei (sonst wird eine temporäre erzeugt)")
+    bench.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="Nur diese Operationen")
+    bench.add_argument("--repeat", type=int, default=3)
+    bench.add_argument("--no-memory", action="store_true", help="Speicherbedarf nicht messen (schneller)")
+    bench.add_argument("--output", help="Ergebnis als JSON in diese Datei (sonst stdout)")
+    bench.add_argument("--baseline", help="Mit gespeicherter Basis vergleichen; Exit-Code 1 bei Verschlechterung")
+    bench.add_argument("--tolerance", type=float, default=0.25, help="Erlaubte Verschlechterung (Anteil)")
+
+    for sub in (gen, bench):
+        sub.add_argument("--sales", type=int, default=100000)
+        sub.add_argument("--users", type=int, default=20)
+        sub.add_argument("--parents", type=int, default=10)
+        sub.add_argument("--subcategories", type=int, default=8)
+        sub.add_argument("--buyers", type=int, default=5000)
+        sub.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    sizes = dict(
+        sales=args.sales, users=args.users, parents=args.parents,
+        subcategories=args.subcategories, buyers=args.buyers, seed=args.seed,
+    )
+    if args.command == "generate":
+        generate(args.path, **sizes)
+        print(f"{args.sales} Verkäufe nach {args.path} geschrieben.", file=sys.stderr)
+        return 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_file = args.data
+        if data_file is None:
+            data_file = os.path.join(tmp, "verkauf_data.json")
+            generate(data_file, **sizes)
+        report = run(data_file, args.only, args.repeat, not args.no_memory)
+
+    text = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = compare(report, baseline, args.tolerance)
+        for name, metric, before, after in regressions:
+            print(f"Verschlechterung: {name} {metric} {before:.4g} -> {after:.4g}", file=sys.stderr)
+        if regressions:
+            return 1
+        print("Keine Verschlechterung gegenüber der Basis.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+# Binäres Snapshot-Format (verkauf_data.vkb).
+#
+#   "VKB1" | Header-Länge (uint64) | Header (JSON) | Blöcke
+#
+# Der Header enthält Benutzer, Kategorien, Zähler und pro Monat die Summen
+# sowie Lage (offset, length) und Kompression seines Blocks. Jeder Block
+# beginnt mit seiner Länge (uint32) und enthält die Verkäufe eines Monats
+# spaltenweise: IDs (int64) und Beträge (float64) als Zahlenfelder, die
+# Textspalten als Wörterbuch (JSON-Liste der verschiedenen Werte) plus
+# einem uint32-Code je Verkauf. Alle Zahlen sind Little-Endian.
+#
+# Zum Lesen reicht der Header; Blöcke werden erst bei Bedarf über mmap
+# dekodiert, unkomprimierte ohne die Datei vollständig einzulesen.
+import json
+import struct
+import sys
+import zlib
+from array import array
+
+MAGIC = b"VKB1"
+PREFIX = struct.Struct("<4sQ")
+BLOCK_LENGTH = struct.Struct("<I")
+
+NUMBER_COLUMNS = (("id", "q"), ("amount", "d"))
+TEXT_COLUMNS = ("user", "category", "date", "description", "buyer")
+COMPRESSIONS = (None, "zlib")
+
+
+def _pack(values, typecode):
+    column = array(typecode, values)
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column.tobytes()
+
+
+def _unpack(buffer, typecode, count, offset):
+    column = array(typecode)
+    column.frombytes(buffer[offset:offset + count * column.itemsize])
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column, offset + count * column.itemsize
+
+
+def encode_block(sales, compression=None):
+    """
+    Verkäufe -> Block (mit Längenpräfix).
+    """
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unbekannte Kompression: {compression!r}")
+    parts = [BLOCK_LENGTH.pack(len(sales))]
+    for column, typecode in NUMBER_COLUMNS:
+        parts.append(_pack([sale[column] for sale in sales], typecode))
+    for column in TEXT_COLUMNS:
+        codes = {}
+        column_codes = [codes.setdefault(sale.get(column) or "", len(codes)) for sale in sales]
+        labels = json.dumps(list(codes), ensure_ascii=False).encode("utf-8")
+        parts += [BLOCK_LENGTH.pack(len(labels)), labels, _pack(column_codes, "I")]
+    body = b"".join(parts)
+    if compression == "zlib":
+        body = zlib.compress(body, 1)
+    return BLOCK_LENGTH.pack(len(body)) + body
+
+
+def decode_block(buffer, offset=0, compression=None):
+    """
+    Block an `offset` (z. B. in einem mmap) -> Liste von Verkäufen.
+    """
+    (length,) = BLOCK_LENGTH.unpack_from(buffer, offset)
+    body = buffer[offset + BLOCK_LENGTH.size:offset + BLOCK_LENGTH.size + length]
+    if compression == "zlib":
+        body = zlib.decompress(body)
+    (count,) = BLOCK_LENGTH.unpack_from(body, 0)
+    position = BLOCK_LENGTH.size
+    columns = {}
+    for column, typecode in NUMBER_COLUMNS:
+        columns[column], position = _unpack(body, typecode, count, position)
+    for column in TEXT_COLUMNS:
+        (size,) = BLOCK_LENGTH.unpack_from(body, position)
+        position += BLOCK_LENGTH.size
+        labels = json.loads(bytes(body[position:position + size]).decode("utf-8"))
+        codes, position = _unpack(body, "I", count, position + size)
+        columns[column] = [labels[code] for code in codes]
+    return [
+        {
+            "id": sale_id,
+            "user": user,
+            "category": category,
+            "date": date,
+            "amount": amount,
+            "description": description,
+            "buyer": buyer,
+        }
+        for sale_id, user, category, date, amount, description, buyer in zip(
+            columns["id"].tolist(), columns["user"], columns["category"], columns["date"],
+            columns["amount"].tolist(), columns["description"], columns["buyer"],
+        )
+    ]
+
+
+def encode_file(header, blocks):
+    """
+    Header (Dict) und bereits kodierte Blöcke {Monat: bytes} -> (Dateiinhalt,
+    Beginn der Blöcke). Die Offsets der Blöcke (relativ zum Ende des
+    Headers) werden in header["partitions"] eingetragen.
+    """
+    offset = 0
+    for month, block in blocks.items():
+        entry = header["partitions"][month]
+        entry["offset"] = offset
+        entry["length"] = len(block)
+        offset += len(block)
+    text = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    return b"".join([PREFIX.pack(MAGIC, len(text)), text, *blocks.values()]), PREFIX.size + len(text)
+
+
+def read_header(file):
+    """
+    Liest den Header einer geöffneten Datei; gibt (Header, Beginn der Blöcke) zurück.
+    """
+    prefix = file.read(PREFIX.size)
+    if len(prefix) < PREFIX.size:
+        raise ValueError("Datei zu kurz für einen Snapshot")
+    magic, length = PREFIX.unpack(prefix)
+    if magic != MAGIC:
+        raise ValueError("Kein binärer Verkaufs-Snapshot")
+    return json.loads(file.read(length).decode("utf-8")), PREFIX.size + length
+
+
+def block_bytes(buffer, start, entry):
+    """
+    Rohdaten eines Blocks (zum unveränderten Übernehmen beim Neuschreiben).
+    """
+    return bytes(buffer[start + entry["offset"]:start + entry["offset"] + entry["length"]])
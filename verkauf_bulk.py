@@ -0,0 +1,152 @@
+# Massen-Import und -Export von Verkäufen ohne GUI.
+#
+#   python verkauf_bulk.py import verkaeufe.csv --user abii
+#   python verkauf_bulk.py export verkaeufe.jsonl
+#
+# Dateien werden zeilenweise gelesen bzw. geschrieben und in Stapeln
+# gespeichert (ein Journal-Eintrag-Block bzw. eine Transaktion pro Stapel).
+import argparse
+import csv
+import json
+import sys
+
+from verkauf_storage import SALE_COLUMNS, make_sale, open_store
+
+BATCH_SIZE = 10000
+
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    return "jsonl" if path.endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+
+def read_rows(file, fmt):
+    """
+    Liefert (Zeilennummer, Zeile) aus einer CSV- oder JSON-Lines-Datei:
+    bei CSV ein Dict, bei JSON Lines den noch nicht geparsten Text (siehe
+    parse_row), damit eine kaputte Zeile nicht den ganzen Import abbricht.
+    """
+    if fmt == "csv":
+        for line_number, row in enumerate(csv.DictReader(file), start=2):
+            yield line_number, row
+    else:
+        for line_number, line in enumerate(file, start=1):
+            if line.strip():
+                yield line_number, line
+
+
+def parse_row(row):
+    """
+    Zeile aus read_rows -> Dict; ValueError bei ungültigem JSON oder wenn
+    die Zeile kein Objekt ist.
+    """
+    if isinstance(row, str):
+        row = json.loads(row)  # JSONDecodeError ist ein ValueError
+    if not isinstance(row, dict):
+        raise ValueError("Verkauf muss ein JSON-Objekt sein")
+    return row
+
+
+def row_to_sale(categories, users, row, default_user=None):
+    """
+    Wandelt eine Importzeile in einen Verkauf um. Die Kategorie kann als
+    "Überkategorie > Unterkategorie" oder in den Spalten parent/subcategory
+    stehen.
+    """
+    user = row.get("user") or default_user
+    if not isinstance(user, str) or user not in users:
+        raise ValueError(f"Unbekannter Benutzer: {user!r}")
+
+    if row.get("category"):
+        if not isinstance(row["category"], str):
+            raise ValueError(f"Kategorie muss ein Text sein: {row['category']!r}")
+        parent, _, subcategory = row["category"].partition(" > ")
+    else:
+        parent, subcategory = row.get("parent", ""), row.get("subcategory", "")
+
+    return make_sale(
+        categories,
+        user,
+        parent,
+        subcategory,
+        date=row.get("date"),
+        amount=row.get("amount"),
+        description=row.get("description", ""),
+        buyer=row.get("buyer", ""),
+    )
+
+
+def import_sales(store, file, fmt, default_user=None, batch_size=BATCH_SIZE, errors=sys.stderr):
+    """
+    Importiert Verkäufe stapelweise. Ungültige Zeilen werden übersprungen
+    und gemeldet. Gibt (importiert, fehlerhaft) zurück.
+    """
+    imported = failed = 0
+    batch = []
+    for line_number, row in read_rows(file, fmt):
+        try:
+            batch.append(row_to_sale(store.data["categories"], store.data["users"], parse_row(row), default_user))
+        except ValueError as e:
+            failed += 1
+            print(f"Zeile {line_number}: {e}", file=errors)
+            continue
+        if len(batch) >= batch_size:
+            store.add_sales(batch)
+            imported += len(batch)
+            batch = []
+    if batch:
+        store.add_sales(batch)
+        imported += len(batch)
+    return imported, failed
+
+
+def export_sales(store, file, fmt):
+    """
+    Schreibt alle Verkäufe zeilenweise als CSV oder JSON Lines.
+    """
+    count = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(file, fieldnames=SALE_COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+        for sale in store.iter_sales():
+            writer.writerow(sale)
+            count += 1
+    else:
+        for sale in store.iter_sales():
+            file.write(json.dumps(sale, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verkäufe in großen Mengen importieren oder exportieren.")
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("path", help="CSV- oder JSON-Lines-Datei, '-' für stdin/stdout")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="Dateiformat (sonst anhand der Endung)")
+    parser.add_argument("--user", help="Benutzer für Zeilen ohne eigene user-Spalte")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--backend", choices=["json", "sqlite", "partitioned", "binary"], help="Speicher-Backend (sonst automatisch)")
+    args = parser.parse_args(argv)
+
+    fmt = detect_format(args.path, args.format)
+    store = open_store(args.backend)
+    try:
+        if args.command == "import":
+            file = sys.stdin if args.path == "-" else open(args.path, "r", encoding="utf-8", newline="")
+            with file:
+                imported, failed = import_sales(store, file, fmt, args.user, args.batch_size)
+            print(f"{imported} Verkäufe importiert, {failed} Zeilen fehlerhaft.", file=sys.stderr)
+            return 1 if failed else 0
+
+        file = sys.stdout if args.path == "-" else open(args.path, "w", encoding="utf-8", newline="")
+        with file:
+            count = export_sales(store, file, fmt)
+        print(f"{count} Verkäufe exportiert.", file=sys.stderr)
+        return 0
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,430 @@
+# Im Speicher gehaltene Indizes über die Verkäufe, die bei jeder Änderung
+# inkrementell nachgeführt werden.
+import bisect
+import heapq
+import re
+
+
+class SalesAggregates:
+    """
+    Umsatz und Anzahl gesamt, pro Benutzer, pro (Benutzer, Kategorie) und
+    pro Kategorie. Wird einmal beim Laden aufgebaut und danach von
+    add/remove in O(1) aktualisiert.
+    """
+
+    def __init__(self):
+        self.revenue = 0
+        self.count = 0
+        self.by_user = {}
+        self.by_user_category = {}
+        self.by_category = {}
+
+    @classmethod
+    def build(cls, sales):
+        aggregates = cls()
+        for sale in sales:
+            aggregates.add(sale)
+        return aggregates
+
+    @staticmethod
+    def _bump(table, key, amount, delta):
+        totals = table.get(key)
+        if totals is None:
+            totals = table[key] = [0, 0]
+        totals[0] += amount
+        totals[1] += delta
+        if totals[1] <= 0:
+            del table[key]
+
+    def add_totals(self, user, category, revenue, count):
+        """
+        Verbucht bereits zusammengefasste Werte (z. B. aus einem GROUP BY).
+        """
+        self.revenue += revenue
+        self.count += count
+        self._bump(self.by_user, user, revenue, count)
+        self._bump(self.by_user_category, (user, category), revenue, count)
+        self._bump(self.by_category, category, revenue, count)
+
+    def add(self, sale):
+        self.add_totals(sale["user"], sale["category"], sale["amount"], 1)
+
+    def remove(self, sale):
+        self.add_totals(sale["user"], sale["category"], -sale["amount"], -1)
+
+    # --- Abfragen ---
+    def overall_totals(self):
+        return self.revenue, self.count
+
+    def totals_by_user(self):
+        return {user: tuple(totals) for user, totals in self.by_user.items()}
+
+    def totals_by_user_category(self):
+        return {key: tuple(totals) for key, totals in self.by_user_category.items()}
+
+    def totals_by_category(self):
+        return {category: totals[0] for category, totals in self.by_category.items()}
+
+
+class SalesRollups:
+    """
+    Umsätze in Tages- und Monats-Buckets, jeweils aufgeteilt nach
+    (Benutzer, Kategorie). Zeitraumabfragen kosten die Anzahl der Buckets
+    statt der Anzahl der Verkäufe: volle Monate kommen aus den Monats-,
+    angebrochene Randmonate aus den Tages-Buckets.
+    """
+
+    def __init__(self):
+        self.days = {}
+        self.months = {}
+        self.day_keys = []
+        self.month_keys = []
+
+    @classmethod
+    def build(cls, sales):
+        rollups = cls()
+        for sale in sales:
+            rollups.add(sale)
+        return rollups
+
+    def _bucket(self, table, keys, key):
+        bucket = table.get(key)
+        if bucket is None:
+            bucket = table[key] = {}
+            bisect.insort(keys, key)
+        return bucket
+
+    def _add(self, table, keys, key, user, category, revenue, count):
+        bucket = self._bucket(table, keys, key)
+        totals = bucket.setdefault((user, category), [0, 0])
+        totals[0] += revenue
+        totals[1] += count
+        if totals[1] <= 0:
+            del bucket[(user, category)]
+        if not bucket:
+            del table[key]
+            del keys[bisect.bisect_left(keys, key)]
+
+    def add_totals(self, date, user, category, revenue, count):
+        self._add(self.days, self.day_keys, date, user, category, revenue, count)
+        self._add(self.months, self.month_keys, date[:7], user, category, revenue, count)
+
+    def add_month_totals(self, month, user, category, revenue, count):
+        """
+        Verbucht nur Monatswerte; die Tageswerte des Monats folgen bei
+        Bedarf über set_days.
+        """
+        self._add(self.months, self.month_keys, month, user, category, revenue, count)
+
+    def set_days(self, days, sales):
+        """
+        Ersetzt die Tages-Buckets `days` durch die Werte aus `sales`.
+        Die Monats-Buckets bleiben unverändert.
+        """
+        for day in days:
+            if self.days.pop(day, None) is not None:
+                del self.day_keys[bisect.bisect_left(self.day_keys, day)]
+        for sale in sales:
+            self._add(self.days, self.day_keys, sale["date"], sale["user"], sale["category"], sale["amount"], 1)
+
+    def add(self, sale):
+        self.add_totals(sale["date"], sale["user"], sale["category"], sale["amount"], 1)
+
+    def remove(self, sale):
+        self.add_totals(sale["date"], sale["user"], sale["category"], -sale["amount"], -1)
+
+    def _buckets_between(self, start, end):
+        start_month, end_month = start[:7], end[:7]
+        # Randmonate tageweise, dazwischen ganze Monate
+        for month in self.month_keys[bisect.bisect_left(self.month_keys, start_month):bisect.bisect_right(self.month_keys, end_month)]:
+            if start_month < month < end_month:
+                yield self.months[month]
+        for day in self.day_keys[bisect.bisect_left(self.day_keys, start):bisect.bisect_right(self.day_keys, end)]:
+            if day[:7] in (start_month, end_month):
+                yield self.days[day]
+
+    def aggregate(self, start=None, end=None):
+        """
+        SalesAggregates für den Zeitraum [start, end] (jeweils "YYYY-MM-DD",
+        inklusive). Ohne Grenzen wird der gesamte Bestand zusammengefasst.
+        """
+        start, end = start or "", end or "\uffff"
+        aggregates = SalesAggregates()
+        for bucket in self._buckets_between(start, end):
+            for (user, category), (revenue, count) in bucket.items():
+                aggregates.add_totals(user, category, revenue, count)
+        return aggregates
+
+    def revenue_by_month(self, start=None, end=None):
+        """
+        Umsatz pro Monat; wie bei aggregate kommen volle Monate aus den
+        Monats- und nur die Randmonate aus den Tages-Buckets.
+        """
+        if start is None and end is None:
+            return {month: sum(totals[0] for totals in self.months[month].values()) for month in self.month_keys}
+        start, end = start or "", end or "\uffff"
+        start_month, end_month = start[:7], end[:7]
+        revenue = {}
+        for month in self.month_keys[bisect.bisect_left(self.month_keys, start_month):bisect.bisect_right(self.month_keys, end_month)]:
+            if start_month < month < end_month:
+                revenue[month] = sum(totals[0] for totals in self.months[month].values())
+        for day in self.day_keys[bisect.bisect_left(self.day_keys, start):bisect.bisect_right(self.day_keys, end)]:
+            if day[:7] in (start_month, end_month):
+                revenue[day[:7]] = revenue.get(day[:7], 0) + sum(totals[0] for totals in self.days[day].values())
+        return dict(sorted(revenue.items()))
+
+    # --- Persistenz ---
+    def to_json(self):
+        return {
+            "days": [
+                [day, user, category, revenue, count]
+                for day in self.day_keys
+                for (user, category), (revenue, count) in self.days[day].items()
+            ]
+        }
+
+    @classmethod
+    def from_json(cls, payload):
+        rollups = cls()
+        for day, user, category, revenue, count in payload["days"]:
+            rollups.add_totals(day, user, category, revenue, count)
+        return rollups
+
+
+SEARCH_FIELDS = ("buyer", "description", "category")
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """
+    Zerlegt Text in kleingeschriebene Wörter ("Camos > Dark Matter" ->
+    ["camos", "dark", "matter"]).
+    """
+    return TOKEN_PATTERN.findall(text.casefold())
+
+
+class SalesSearch:
+    """
+    Invertierter Index für die Volltextsuche über Käufer, Beschreibung und
+    Kategorie. Zweistufig, weil sich viele Verkäufe dieselben Texte teilen:
+    Wort -> {(Feld, Text)} und (Feld, Text) -> {IDs}. Eine Suche prüft daher
+    nur die verschiedenen Wörter, nicht alle Verkäufe.
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.tokens = {}
+        self.vocabulary = []
+
+    @classmethod
+    def build(cls, sales):
+        search = cls()
+        for sale in sales:
+            search.add(sale)
+        return search
+
+    def add(self, sale):
+        for field in SEARCH_FIELDS:
+            value = sale.get(field) or ""
+            if not value:
+                continue
+            ids = self.values.get((field, value))
+            if ids is None:
+                ids = self.values[(field, value)] = set()
+                for token in set(tokenize(value)):
+                    keys = self.tokens.get(token)
+                    if keys is None:
+                        keys = self.tokens[token] = set()
+                        bisect.insort(self.vocabulary, token)
+                    keys.add((field, value))
+            ids.add(sale["id"])
+
+    def remove(self, sale):
+        for field in SEARCH_FIELDS:
+            value = sale.get(field) or ""
+            ids = self.values.get((field, value))
+            if ids is None:
+                continue
+            ids.discard(sale["id"])
+            if ids:
+                continue
+            del self.values[(field, value)]
+            for token in set(tokenize(value)):
+                keys = self.tokens[token]
+                keys.discard((field, value))
+                if not keys:
+                    del self.tokens[token]
+                    del self.vocabulary[bisect.bisect_left(self.vocabulary, token)]
+
+    def _matching_tokens(self, term, substring):
+        if substring:
+            return [token for token in self.vocabulary if term in token]
+        first = bisect.bisect_left(self.vocabulary, term)
+        last = bisect.bisect_left(self.vocabulary, term + "\uffff")
+        return self.vocabulary[first:last]
+
+    def search(self, query, fields=None, substring=True):
+        """
+        IDs der Verkäufe, die jedes Wort der Anfrage enthalten (als
+        Wortanfang oder, mit substring=True, irgendwo im Wort). `fields`
+        schränkt auf einzelne Felder ein, z. B. ("buyer",).
+        """
+        terms = tokenize(query)
+        if not terms:
+            return set()
+        fields = set(fields or SEARCH_FIELDS)
+        result = None
+        # Längere Wörter treffen meist seltener: zuerst, damit die Schnittmenge klein bleibt
+        for term in sorted(set(terms), key=len, reverse=True):
+            keys = set()
+            for token in self._matching_tokens(term, substring):
+                keys.update(key for key in self.tokens[token] if key[0] in fields)
+            ids = set()
+            for key in keys:
+                ids |= self.values[key] if result is None else self.values[key] & result
+            result = ids
+            if not result:
+                break
+        return result
+
+
+LEADERBOARD_DIMENSIONS = ("buyer", "category", "user")
+
+# Anzahl Kandidaten, die je Rangliste vorgehalten werden (angezeigt werden meist 10)
+LEADERBOARD_CAPACITY = 50
+
+
+def top_totals(totals, n):
+    """
+    Die n umsatzstärksten Einträge eines {Schlüssel: [Umsatz, Anzahl]}-Dicts
+    als [(Schlüssel, Umsatz, Anzahl)], absteigend nach Umsatz; bei gleichem
+    Umsatz entscheidet der Schlüssel (ebenfalls absteigend), damit die
+    Reihenfolge nicht vom Aufbau abhängt.
+    """
+    best = heapq.nlargest(n, totals.items(), key=lambda item: (item[1][0], item[0]))
+    return [(key, revenue, count) for key, (revenue, count) in best]
+
+
+class TopK:
+    """
+    Rangliste nach Umsatz. Die Summen aller Schlüssel werden exakt
+    mitgeführt, die besten `capacity` Kandidaten zusätzlich in einem
+    Min-Heap (veraltete Einträge werden beim Herausnehmen übersprungen).
+    `outside` ist eine obere Schranke (Umsatz, Schlüssel) für alle
+    Schlüssel außerhalb der Kandidaten; fällt ein Kandidat durch Löschungen
+    unter diese Schranke, wird beim nächsten Abruf exakt aus den Summen neu
+    aufgebaut. Verglichen wird überall (Umsatz, Schlüssel) wie in
+    top_totals, damit Gleichstände nach einem Neuaufbau gleich geordnet sind.
+    """
+
+    def __init__(self, capacity=LEADERBOARD_CAPACITY):
+        self.capacity = capacity
+        self.totals = {}
+        self.top = {}
+        self.heap = []
+        self.outside = None
+
+    def update(self, key, revenue, count):
+        totals = self.totals.get(key)
+        if totals is None:
+            totals = self.totals[key] = [0, 0]
+        totals[0] += revenue
+        totals[1] += count
+        if totals[1] <= 0:
+            del self.totals[key]
+            self.top.pop(key, None)
+            return
+        entry = (totals[0], key)
+        if key in self.top or len(self.top) < self.capacity:
+            self.top[key] = totals[0]
+            heapq.heappush(self.heap, entry)
+        elif entry > self._minimum():
+            self.top[key] = totals[0]
+            heapq.heappush(self.heap, entry)
+            evicted = heapq.heappop(self.heap)
+            del self.top[evicted[1]]
+            self._exclude(evicted)
+        else:
+            self._exclude(entry)
+        if len(self.heap) > 4 * self.capacity:
+            self._reheap()
+
+    def _exclude(self, entry):
+        if self.outside is None or entry > self.outside:
+            self.outside = entry
+
+    def _minimum(self):
+        # Veraltete Heap-Einträge (Schlüssel entfernt oder Wert geändert) verwerfen
+        while self.top.get(self.heap[0][1]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+        return self.heap[0]
+
+    def _reheap(self):
+        self.heap = [(value, key) for key, value in self.top.items()]
+        heapq.heapify(self.heap)
+
+    def rebuild(self):
+        best = top_totals(self.totals, self.capacity + 1)
+        self.top = {key: revenue for key, revenue, _ in best[:self.capacity]}
+        self.outside = (best[self.capacity][1], best[self.capacity][0]) if len(best) > self.capacity else None
+        self._reheap()
+
+    def ranked(self, n):
+        """
+        Die n besten Einträge als [(Schlüssel, Umsatz, Anzahl)].
+        """
+        if n > self.capacity:
+            return top_totals(self.totals, n)
+        wanted = min(n, len(self.totals))
+        ranked = sorted(((revenue, key) for key, revenue in self.top.items()), reverse=True)[:n]
+        if len(ranked) < wanted or (ranked and self.outside is not None and ranked[-1] < self.outside):
+            self.rebuild()
+            ranked = sorted(((revenue, key) for key, revenue in self.top.items()), reverse=True)[:n]
+        return [(key, revenue, self.totals[key][1]) for revenue, key in ranked]
+
+
+class SalesLeaderboards:
+    """
+    Ranglisten für Käufer, Kategorien (Unterkategorien) und Verkäufer,
+    nachgeführt bei jedem hinzugefügten oder gelöschten Verkauf.
+    """
+
+    def __init__(self, capacity=LEADERBOARD_CAPACITY):
+        self.boards = {dimension: TopK(capacity) for dimension in LEADERBOARD_DIMENSIONS}
+
+    @classmethod
+    def build(cls, sales, aggregates=None, buyers=None):
+        """
+        Exakter Neuaufbau. Mit `aggregates` kommen Verkäufer- und
+        Kategoriesummen aus SalesAggregates und aus `sales` nur die Käufer;
+        mit `buyers` ({Käufer: [Umsatz, Anzahl]}) auch diese ohne Verkäufe.
+        """
+        leaderboards = cls()
+        if aggregates is None:
+            for sale in sales:
+                leaderboards.add(sale)
+        else:
+            for user, (revenue, count) in aggregates.by_user.items():
+                leaderboards.boards["user"].update(user, revenue, count)
+            for category, (revenue, count) in aggregates.by_category.items():
+                leaderboards.boards["category"].update(category, revenue, count)
+            if buyers is not None:
+                for buyer, (revenue, count) in buyers.items():
+                    leaderboards.boards["buyer"].update(buyer, revenue, count)
+            for sale in sales:
+                leaderboards.boards["buyer"].update(sale.get("buyer", ""), sale["amount"], 1)
+        for board in leaderboards.boards.values():
+            board.rebuild()
+        return leaderboards
+
+    def add(self, sale):
+        for dimension, board in self.boards.items():
+            board.update(sale.get(dimension, ""), sale["amount"], 1)
+
+    def remove(self, sale):
+        for dimension, board in self.boards.items():
+            board.update(sale.get(dimension, ""), -sale["amount"], -1)
+
+    def top(self, dimension, n=10):
+        return self.boards[dimension].ranked(n)
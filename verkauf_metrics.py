@@ -0,0 +1,172 @@
+# Leichtgewichtige Messpunkte für die zeitkritischen Pfade (Laden,
+# Speichern, Dashboard, Diagramm, Streamlit-Seiten).
+#
+#   VERKAUF_METRICS=1                     Messung einschalten
+#   VERKAUF_METRICS_FILE=metrics.jsonl    Beim Beenden als JSON-Zeilen anhängen
+#
+# Ausgeschaltet gibt `timed` die Funktion unverändert zurück und `span`
+# einen leeren Kontextmanager, im Aufrufpfad bleibt also kein Messcode.
+# Eingeschaltet werden pro Messpunkt die letzten WINDOW Laufzeiten
+# gehalten (für p50/p95) sowie Aufrufzahlen und Zähler wie geschriebene Bytes.
+import atexit
+import contextlib
+import functools
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+
+ENABLED = os.environ.get("VERKAUF_METRICS", "") not in ("", "0")
+METRICS_FILE = os.environ.get("VERKAUF_METRICS_FILE")
+
+# Anzahl Laufzeiten pro Messpunkt, aus denen die Perzentile berechnet werden
+WINDOW = 1000
+
+
+def percentile(ordered, fraction):
+    """
+    Perzentil (Nearest-Rank) einer aufsteigend sortierten Liste.
+    """
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class Metrics:
+    """
+    Rollender Puffer der Laufzeiten je Messpunkt plus Zähler. Die Methoden
+    dürfen aus mehreren Threads aufgerufen werden (z. B. vom Hintergrund-Speichern).
+    """
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.lock = threading.Lock()
+        self.timings = {}
+        self.calls = {}
+        self.counters = {}
+
+    def record(self, name, seconds):
+        with self.lock:
+            samples = self.timings.get(name)
+            if samples is None:
+                samples = self.timings[name] = deque(maxlen=self.window)
+            samples.append(seconds)
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def reset(self):
+        with self.lock:
+            self.timings.clear()
+            self.calls.clear()
+            self.counters.clear()
+
+    def summary(self):
+        """
+        {"timings": {Name: {calls, p50_ms, p95_ms, max_ms}}, "counters": {Name: Wert}}
+        """
+        with self.lock:
+            timings = {name: sorted(samples) for name, samples in self.timings.items()}
+            calls = dict(self.calls)
+            counters = dict(self.counters)
+        return {
+            "timings": {
+                name: {
+                    "calls": calls[name],
+                    "p50_ms": percentile(ordered, 0.5) * 1000,
+                    "p95_ms": percentile(ordered, 0.95) * 1000,
+                    "max_ms": ordered[-1] * 1000,
+                }
+                for name, ordered in sorted(timings.items())
+            },
+            "counters": dict(sorted(counters.items())),
+        }
+
+    def jsonl(self):
+        """
+        Aktueller Stand als JSON-Zeilen: eine Zeile pro Messpunkt bzw.
+        Zähler, alle mit demselben Zeitstempel.
+        """
+        summary = self.summary()
+        stamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+        lines = [
+            json.dumps({"time": stamp, "pid": os.getpid(), "name": name, **values})
+            for name, values in summary["timings"].items()
+        ]
+        lines += [
+            json.dumps({"time": stamp, "pid": os.getpid(), "name": name, "value": value})
+            for name, value in summary["counters"].items()
+        ]
+        return "".join(line + "\n" for line in lines)
+
+    def export(self, path):
+        """
+        Hängt den aktuellen Stand an `path` an; gibt die Anzahl Zeilen zurück.
+        """
+        text = self.jsonl()
+        if text:
+            with open(path, "a", encoding="utf-8") as file:
+                file.write(text)
+        return text.count("\n")
+
+
+registry = Metrics()
+
+
+def timed(name):
+    """
+    Decorator: misst jede Ausführung unter `name`. Ausgeschaltet wird die
+    Funktion unverändert zurückgegeben.
+    """
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                registry.record(name, time.perf_counter() - t0)
+
+        return wrapper
+
+    return decorate
+
+
+class _Span:
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        registry.record(self.name, time.perf_counter() - self.t0)
+        return False
+
+
+_NO_SPAN = contextlib.nullcontext()
+
+
+def span(name):
+    """
+    Kontextmanager für Abschnitte, die keine eigene Funktion sind
+    (z. B. Teile einer Streamlit-Seite).
+    """
+    return _Span(name) if ENABLED else _NO_SPAN
+
+
+def count(name, amount=1):
+    if ENABLED:
+        registry.count(name, amount)
+
+
+if ENABLED and METRICS_FILE:
+    atexit.register(registry.export, METRICS_FILE)
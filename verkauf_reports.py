@@ -0,0 +1,237 @@
+# Monatsabrechnungen pro Verkäufer und pro Kategorie, ohne GUI.
+#
+#   python verkauf_reports.py berichte/
+#   python verkauf_reports.py berichte/ --by user --from 2025-01 --to 2025-03 --workers 4
+#
+# Pro Monat und Verkäufer (bzw. Kategorie) entstehen
+# <Ziel>/<Monat>/<user|category>/<Name>.csv mit den Verkäufen und
+# <Name>.png mit dem Umsatz nach Kategorien (bzw. Verkäufern), gezeichnet
+# wie "Diagramm anzeigen". Gelesen wird Monat für Monat (store.month_sales;
+# bei den Monats-Partitionen werden nicht geladene Monate dabei nicht
+# behalten); geschrieben wird in einem Prozess-Pool mit matplotlib im
+# Agg-Backend (ohne Fenster). Über den Datenbestand des Backends hinaus
+# liegen also nur die Verkäufe eines Monats und höchstens
+# MAX_PENDING_PER_WORKER Berichte pro Worker gleichzeitig im Speicher.
+#
+# <Ziel>/reports.json merkt sich pro Bericht einen Hash seines Inhalts;
+# unveränderte Berichte werden beim nächsten Lauf übersprungen.
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from verkauf_metrics import timed
+from verkauf_storage import UNDATED_PARTITION, open_store, write_atomic
+
+MANIFEST_NAME = "reports.json"
+# Bei Änderungen am Berichtsformat erhöhen, damit alle Berichte neu entstehen
+REPORT_VERSION = 1
+REPORT_COLUMNS = ("id", "date", "user", "category", "buyer", "amount", "description")
+DIMENSIONS = ("user", "category")
+
+# Balken im Diagramm (der Rest wird als "Andere" zusammengefasst)
+CHART_TOP_N = 25
+# Diagramm eines Verkäufer-Berichts nach Kategorien und umgekehrt
+CHART_COLUMNS = {"user": "category", "category": "user"}
+CHART_LABELS = {"user": "Verkäufer", "category": "Kategorie"}
+
+# So viele Berichte pro Worker dürfen gleichzeitig unterwegs sein
+MAX_PENDING_PER_WORKER = 4
+
+
+def safe_name(name):
+    """
+    Dateiname für einen Verkäufer/eine Kategorie. Wurde etwas ersetzt, wird
+    ein kurzer Hash angehängt, damit verschiedene Namen nicht zusammenfallen.
+    """
+    safe = re.sub(r"[^\w.-]+", "_", name).strip("._")
+    if safe != name:
+        safe = f"{safe}-{hashlib.sha1(name.encode('utf-8')).hexdigest()[:8]}"
+    return safe
+
+
+def report_path(directory, month, dimension, name):
+    """
+    Pfad eines Berichts ohne Endung (.csv bzw. .png werden angehängt).
+    """
+    return os.path.join(directory, month, dimension, safe_name(name))
+
+
+def report_groups(sales, dimension):
+    """
+    Verkäufe eines Monats -> {Name: Zeilen}; Zeilen in REPORT_COLUMNS-Reihenfolge
+    und nach Datum und ID sortiert, damit der Hash nicht von der Ablage abhängt.
+    """
+    groups = {}
+    for sale in sales:
+        groups.setdefault(sale[dimension], []).append(tuple(sale.get(column, "") for column in REPORT_COLUMNS))
+    for rows in groups.values():
+        rows.sort(key=lambda row: (row[1], row[0]))
+    return groups
+
+
+def content_hash(dimension, rows):
+    text = json.dumps([REPORT_VERSION, CHART_TOP_N, dimension, rows], ensure_ascii=False)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def render_report(path, title, dimension, rows, top=CHART_TOP_N):
+    """
+    Schreibt CSV und Diagramm eines Berichts (im Worker-Prozess). Beide
+    Dateien werden erst unter .tmp geschrieben und dann umbenannt.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    from verkauf_analytics import top_n
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".csv.tmp", "w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(REPORT_COLUMNS)
+        writer.writerows(rows)
+    os.replace(path + ".csv.tmp", path + ".csv")
+
+    chart_index = REPORT_COLUMNS.index(CHART_COLUMNS[dimension])
+    amount_index = REPORT_COLUMNS.index("amount")
+    totals = {}
+    for row in rows:
+        totals[row[chart_index]] = totals.get(row[chart_index], 0) + row[amount_index]
+    ranked = top_n(totals, top)
+
+    figure = Figure(figsize=(10, 6))
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+    axes.bar([label for label, _ in ranked], [value for _, value in ranked], color="skyblue")
+    axes.set_title(f"{title} – {sum(totals.values()):.2f} €")
+    axes.set_xlabel(CHART_LABELS[CHART_COLUMNS[dimension]])
+    axes.set_ylabel("Umsatz (€)")
+    axes.tick_params(axis="x", rotation=45)
+    for label in axes.get_xticklabels():
+        label.set_horizontalalignment("right")
+        label.set_rotation_mode("anchor")
+    figure.tight_layout()
+    figure.savefig(path + ".png.tmp", format="png")
+    os.replace(path + ".png.tmp", path + ".png")
+    return path
+
+
+def load_manifest(directory):
+    """
+    {Schlüssel "Monat/Dimension/Name": Hash} des letzten Laufs.
+    """
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME), "r", encoding="utf-8") as file:
+            manifest = json.load(file)
+    except FileNotFoundError:
+        return {}
+    if manifest.get("version") != REPORT_VERSION:
+        return {}
+    return manifest["reports"]
+
+
+def save_manifest(directory, reports):
+    text = json.dumps({"version": REPORT_VERSION, "reports": reports}, ensure_ascii=False, indent=1)
+    write_atomic(os.path.join(directory, MANIFEST_NAME), text)
+
+
+def report_months(store, reports, start=None, end=None):
+    """
+    Monate (YYYY-MM) mit Verkäufen laut Rollups, dazu Monate früherer Läufe,
+    deren Berichte eventuell entfernt werden müssen.
+    """
+    months = set(store.revenue_by_month()) | {key.split("/", 1)[0] for key in reports}
+    return sorted(
+        month for month in months
+        if month != UNDATED_PARTITION and (start is None or month >= start) and (end is None or month <= end)
+    )
+
+
+@timed("reports")
+def generate_reports(store, directory, dimensions=DIMENSIONS, start=None, end=None, workers=None, force=False,
+                     log=sys.stderr):
+    """
+    Erzeugt die Berichte für alle Monate im Zeitraum (Monate als "YYYY-MM").
+    Gibt die Anzahl geschriebener, übersprungener, entfernter und
+    fehlgeschlagener Berichte zurück.
+    """
+    os.makedirs(directory, exist_ok=True)
+    reports = {} if force else load_manifest(directory)
+    stats = {"written": 0, "skipped": 0, "removed": 0, "failed": 0}
+    workers = workers or os.cpu_count() or 1
+    pending = {}
+
+    def collect(done):
+        for future in done:
+            key, digest = pending.pop(future)
+            try:
+                future.result()
+            except Exception as e:
+                stats["failed"] += 1
+                print(f"{key}: {e}", file=log)
+                continue
+            reports[key] = digest
+            stats["written"] += 1
+
+    with ProcessPoolExecutor(workers) as pool:
+        for month in report_months(store, reports, start, end):
+            present = set()
+            sales = store.month_sales(month)
+            for dimension in dimensions:
+                for name, rows in report_groups(sales, dimension).items():
+                    key = f"{month}/{dimension}/{name}"
+                    present.add(key)
+                    digest = content_hash(dimension, rows)
+                    path = report_path(directory, month, dimension, name)
+                    if reports.get(key) == digest and os.path.exists(path + ".csv") and os.path.exists(path + ".png"):
+                        stats["skipped"] += 1
+                        continue
+                    if len(pending) >= workers * MAX_PENDING_PER_WORKER:
+                        collect(wait(pending, return_when=FIRST_COMPLETED).done)
+                    pending[pool.submit(render_report, path, f"{name} ({month})", dimension, rows)] = (key, digest)
+            del sales
+
+            # Berichte von Verkäufern/Kategorien, die im Monat keine Verkäufe mehr haben
+            for key in [key for key in reports if key.startswith(month + "/") and key not in present]:
+                _, dimension, name = key.split("/", 2)
+                if dimension not in dimensions:
+                    continue
+                path = report_path(directory, month, dimension, name)
+                for suffix in (".csv", ".png"):
+                    if os.path.exists(path + suffix):
+                        os.remove(path + suffix)
+                del reports[key]
+                stats["removed"] += 1
+
+            collect([future for future in pending if future.done()])
+            save_manifest(directory, reports)
+            print(f"{month}: {stats['written']} geschrieben, {stats['skipped']} unverändert", file=log)
+        collect(wait(pending).done)
+    save_manifest(directory, reports)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monatsabrechnungen (CSV und Diagramm) pro Verkäufer und Kategorie.")
+    parser.add_argument("directory", help="Zielverzeichnis")
+    parser.add_argument("--by", nargs="+", choices=DIMENSIONS, default=list(DIMENSIONS), help="Berichte pro Verkäufer und/oder Kategorie")
+    parser.add_argument("--from", dest="start", help="Erster Monat (YYYY-MM)")
+    parser.add_argument("--to", dest="end", help="Letzter Monat (YYYY-MM)")
+    parser.add_argument("--workers", type=int, help="Anzahl Prozesse (Standard: alle Kerne)")
+    parser.add_argument("--force", action="store_true", help="Auch unveränderte Berichte neu schreiben")
+    parser.add_argument("--backend", choices=["json", "sqlite", "partitioned", "binary"], help="Speicher-Backend (sonst automatisch)")
+    args = parser.parse_args(argv)
+
+    # Nur lesend: kein store.close(), das würde den Snapshot kompaktieren
+    store = open_store(args.backend)
+    stats = generate_reports(store, args.directory, args.by, args.start, args.end, args.workers, args.force)
+    print(json.dumps(stats, indent=4))
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2153 @@
+import contextlib
+import heapq
+import json
+import mmap
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from verkauf_binary import block_bytes, decode_block, encode_block, encode_file, read_header
+from verkauf_index import SalesAggregates, SalesLeaderboards, SalesRollups, SalesSearch, top_totals
+from verkauf_metrics import count, timed
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Datei für gespeicherte Daten (Snapshot) und das zugehörige Journal
+DATA_FILE = "verkauf_data.json"
+JOURNAL_FILE = "verkauf_data.journal"
+DB_FILE = "verkauf_data.sqlite3"
+ROLLUP_FILE = "verkauf_data.rollups.json"
+
+# Verzeichnis für die nach Monaten aufgeteilte Ablage (Manifest + eine Datei pro Monat)
+PARTITION_DIR = "verkauf_data.parts"
+MANIFEST_FILE = os.path.join(PARTITION_DIR, "manifest.json")
+
+# Binärer Snapshot (ein spaltenweiser Block pro Monat, siehe verkauf_binary.py)
+BINARY_FILE = "verkauf_data.vkb"
+# Blöcke komprimieren ("zlib") oder unkomprimiert lassen (schneller, direkt per mmap lesbar)
+BINARY_COMPRESSION = os.environ.get("VERKAUF_BINARY_COMPRESSION") or None
+
+# So viele Monate (inkl. des aktuellen) werden beim Start sofort geladen
+EAGER_MONTHS = int(os.environ.get("VERKAUF_EAGER_MONTHS", "3"))
+
+# Ab dieser Journal-Größe (Bytes) wird der Snapshot neu geschrieben
+COMPACT_THRESHOLD = 1024 * 1024
+
+
+def empty_data():
+    # generation zählt die Kompaktierungen, seq die Journal-Einträge (beide fortlaufend)
+    return {"users": {}, "sales": [], "categories": {}, "next_id": 1, "generation": 0, "seq": 0}
+
+
+def ensure_schema(data):
+    """
+    Ergänzt fehlende Schlüssel. Gibt True zurück, wenn etwas ergänzt wurde.
+    """
+    changed = False
+    for key, default in empty_data().items():
+        if key not in data:
+            data[key] = default
+            changed = True
+    return changed
+
+
+def index_sales(data):
+    """
+    Baut den Index Verkaufs-ID -> Verkauf (in Einfügereihenfolge) und
+    stellt sicher, dass data["next_id"] größer als jede vergebene ID ist.
+    Doppelte IDs aus älteren Dateien erhalten dabei neue, eindeutige IDs.
+    Gibt (Index, ob umnummeriert wurde) zurück.
+    """
+    next_id = max([data.get("next_id", 1)] + [sale["id"] + 1 for sale in data["sales"]])
+    sales = {}
+    renumbered = False
+    for sale in data["sales"]:
+        if sale["id"] in sales:
+            sale["id"] = next_id
+            next_id += 1
+            renumbered = True
+        sales[sale["id"]] = sale
+    data["next_id"] = next_id
+    return sales, renumbered
+
+
+# ------------------------- Journal -------------------------
+def apply_record(data, record, sales):
+    """
+    Wendet einen einzelnen Journal-Eintrag auf die Daten an.
+    `sales` ist der ID-Index aus index_sales.
+    """
+    op = record["op"]
+    if "seq" in record:
+        data["seq"] = record["seq"]
+    if op == "header":
+        return
+    if op == "add_sale":
+        sale = record["sale"]
+        sales[sale["id"]] = sale
+        data["next_id"] = max(data["next_id"], sale["id"] + 1)
+    elif op == "delete_sale":
+        sales.pop(record["id"], None)
+    elif op == "delete_sales":
+        for sale_id in record["ids"]:
+            sales.pop(sale_id, None)
+    elif op == "register":
+        data["users"][record["username"]] = record["password"]
+    elif op == "add_parent_category":
+        data["categories"].setdefault(record["name"], {"subcategories": {}})
+    elif op == "add_sub_category":
+        parent = data["categories"].setdefault(record["parent"], {"subcategories": {}})
+        parent.setdefault("subcategories", {})[record["name"]] = {"price": record["price"]}
+    else:
+        raise ValueError(f"Unbekannter Journal-Eintrag: {op}")
+
+
+def read_journal(journal_file=None):
+    """
+    Liest alle vollständigen Einträge aus dem Journal.
+    Eine abgebrochene letzte Zeile (z. B. nach einem Absturz) wird ignoriert.
+    """
+    return read_journal_from(journal_file)[0]
+
+
+def read_journal_from(journal_file=None, offset=0):
+    """
+    Liest die vollständigen Einträge ab Byte-Position `offset` und gibt
+    (Einträge, Position hinter dem letzten vollständigen Eintrag) zurück.
+    Beschädigte Zeilen werden übersprungen.
+    """
+    journal_file = journal_file or JOURNAL_FILE
+    records = []
+    if not os.path.exists(journal_file):
+        return records, 0
+    with open(journal_file, "rb") as file:
+        file.seek(offset)
+        for line in file:
+            if not line.endswith(b"\n"):
+                break
+            offset += len(line)
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records, offset
+
+
+def journal_header(journal_file=None):
+    """
+    Generation aus der Kopfzeile des Journals; None, wenn es kein Journal
+    oder nur eines ohne Kopfzeile (ältere Dateien) gibt.
+    """
+    journal_file = journal_file or JOURNAL_FILE
+    try:
+        with open(journal_file, "rb") as file:
+            line = file.readline()
+    except FileNotFoundError:
+        return None
+    try:
+        record = json.loads(line)
+    except json.JSONDecodeError:
+        return None
+    return record.get("generation") if record.get("op") == "header" else None
+
+
+@timed("append_journal")
+def append_journal_text(lines, journal_file=None, sync=False):
+    """
+    Hängt bereits serialisierte Zeilen an. Endet das Journal nach einem
+    Absturz mitten in einer Zeile, wird diese zuerst abgeschlossen.
+    """
+    journal_file = journal_file or JOURNAL_FILE
+    with open(journal_file, "a+b") as file:
+        if file.tell() > 0:
+            file.seek(-1, os.SEEK_END)
+            if file.read(1) != b"\n":
+                lines = "\n" + lines
+        payload = lines.encode("utf-8")
+        file.write(payload)
+        count("bytes_written.journal", len(payload))
+        file.flush()
+        if sync:
+            os.fsync(file.fileno())
+
+
+def journal_has_records(journal_file=None):
+    """
+    Ob das Journal Einträge außer der Kopfzeile enthält.
+    """
+    journal_file = journal_file or JOURNAL_FILE
+    try:
+        with open(journal_file, "rb") as file:
+            first = file.readline()
+            second = file.readline()
+    except FileNotFoundError:
+        return False
+    if journal_header(journal_file) is None:
+        return bool(first.strip())  # Älteres Journal ohne Kopfzeile
+    return bool(second.strip())
+
+
+def journal_size(journal_file=None):
+    journal_file = journal_file or JOURNAL_FILE
+    if not os.path.exists(journal_file):
+        return 0
+    return os.path.getsize(journal_file)
+
+
+# ------------------------- Snapshot -------------------------
+def load_data(data_file=None, journal_file=None):
+    """
+    Lädt den Snapshot und spielt anschließend das Journal darüber ab.
+    """
+    return read_data(data_file, journal_file)[0]
+
+
+@timed("load_data")
+def read_data(data_file=None, journal_file=None):
+    """
+    Wie load_data, meldet aber zusätzlich, ob die Struktur beim Laden
+    ergänzt oder korrigiert werden musste (nur dann lohnt sich ein
+    Zurückschreiben). Es wird nichts geschrieben.
+    """
+    data_file = data_file or DATA_FILE
+    if os.path.exists(data_file):
+        with open(data_file, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        changed = ensure_schema(data)
+    else:
+        data = empty_data()
+        changed = True
+
+    sales, renumbered = index_sales(data)
+    for record in read_journal(journal_file):
+        if record.get("seq", data["seq"] + 1) <= data["seq"]:
+            continue  # Bereits im Snapshot enthalten
+        apply_record(data, record, sales)
+    data["sales"] = list(sales.values())
+    return data, changed or renumbered
+
+
+@timed("save_data")
+def save_data(data, data_file=None, journal_file=None):
+    """
+    Schreibt den vollständigen Snapshot und leert danach das Journal
+    (Kompaktierung). Der Snapshot wird erst in eine temporäre Datei
+    geschrieben und dann umbenannt, damit nie eine halbe Datei entsteht.
+    """
+    write_snapshot(json.dumps(data, indent=4), data_file, journal_file, data.get("generation", 0))
+
+
+@timed("write_snapshot")
+def write_snapshot(text, data_file=None, journal_file=None, generation=0):
+    """
+    Schreibt bereits serialisierte Daten atomar (temporäre Datei, fsync,
+    Umbenennen) und beginnt ein neues Journal mit der Generation des
+    Snapshots als Kopfzeile. Das bisherige Journal bleibt als
+    <Journal>.old liegen, damit andere Prozesse daraus die Einträge
+    nachholen können, die ihnen noch fehlen.
+    """
+    data_file = data_file or DATA_FILE
+    journal_file = journal_file or JOURNAL_FILE
+    write_atomic(data_file, text)
+
+    if os.path.exists(journal_file):
+        os.replace(journal_file, journal_file + ".old")
+    write_atomic(journal_file, json.dumps({"op": "header", "generation": generation}) + "\n")
+
+
+def write_atomic(path, text):
+    """
+    Schreibt über eine temporäre Datei (mit fsync) und benennt sie dann um,
+    damit nie eine halb geschriebene Datei entsteht. `text` darf auch
+    bereits kodierte Bytes sein.
+    """
+    tmp_file = path + ".tmp"
+    payload = text if isinstance(text, bytes) else text.encode("utf-8")
+    with open(tmp_file, "wb") as file:
+        file.write(payload)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_file, path)
+    count("bytes_written.snapshot", len(payload))
+
+
+def needs_compaction(data_file=None, journal_file=None, threshold=COMPACT_THRESHOLD, pending=0):
+    """
+    Das Journal wird gefaltet, sobald es größer als der Snapshot (mindestens
+    aber `threshold`) ist. So bleiben die Kosten pro Änderung amortisiert
+    konstant, auch wenn viele Verkäufe auf einmal hinzukommen.
+    `pending` sind Bytes, die gleich noch angehängt werden.
+    """
+    data_file = data_file or DATA_FILE
+    snapshot_size = os.path.getsize(data_file) if os.path.exists(data_file) else 0
+    return journal_size(journal_file) + pending >= max(threshold, snapshot_size)
+
+
+# ------------------------- Zeit-Rollups -------------------------
+def file_version(paths):
+    """
+    Änderungszeit und Größe der angegebenen (vorhandenen) Dateien. Wird
+    ohne Dateisperre aufgerufen; eine Datei, die ein anderer Prozess gerade
+    umbenennt, fehlt dann eben.
+    """
+    version = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        version.append([path, stat.st_mtime_ns, stat.st_size])
+    return version
+
+
+def load_rollups(version, rollup_file=None):
+    """
+    Lädt gespeicherte Rollups, sofern sie zum aktuellen Dateistand passen.
+    """
+    rollup_file = rollup_file or ROLLUP_FILE
+    if not os.path.exists(rollup_file):
+        return None
+    try:
+        with open(rollup_file, "r", encoding="utf-8") as file:
+            payload = json.load(file)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if payload.get("version") != version:
+        return None
+    return SalesRollups.from_json(payload)
+
+
+def save_rollups(rollups, version, rollup_file=None):
+    rollup_file = rollup_file or ROLLUP_FILE
+    payload = {"version": version, **rollups.to_json()}
+    tmp_file = rollup_file + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as file:
+        json.dump(payload, file)
+    os.replace(tmp_file, rollup_file)
+
+
+# ------------------------- Mehrere Prozesse -------------------------
+class FileLock:
+    """
+    Exklusive Sperre über eine Lock-Datei, damit mehrere Prozesse (Tk-App,
+    Streamlit, Massenimport) nicht gleichzeitig Journal oder Snapshot
+    schreiben. Innerhalb eines Prozesses wiedereintrittsfähig; zwischen
+    Threads wirkt sie wie ein gewöhnliches Lock.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.thread_lock = threading.RLock()
+        self.depth = 0
+        self.file = None
+
+    def acquire(self, blocking=True):
+        """
+        Mit blocking=False wird nicht gewartet: hält ein anderer Thread oder
+        Prozess die Sperre, kommt sofort False zurück.
+        """
+        if not self.thread_lock.acquire(blocking):
+            return False
+        if self.depth == 0:
+            locked = False
+            try:
+                self.file = open(self.path, "a+b")
+                locked = self._lock_file(blocking)
+            finally:
+                if not locked:
+                    if self.file is not None:
+                        self.file.close()
+                        self.file = None
+                    self.thread_lock.release()
+            if not locked:
+                return False
+        self.depth += 1
+        return True
+
+    def _lock_file(self, blocking):
+        if fcntl is not None:
+            try:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            return True
+        self.file.seek(0)
+        while True:
+            try:
+                msvcrt.locking(self.file.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                if not blocking:
+                    return False
+                continue  # LK_LOCK gibt nach zehn Versuchen auf
+
+    def release(self):
+        self.depth -= 1
+        if self.depth == 0:
+            if fcntl is not None:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+            else:
+                self.file.seek(0)
+                msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+            self.file.close()
+            self.file = None
+        self.thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+# ------------------------- Write-Behind -------------------------
+class WriteBehindWriter(threading.Thread):
+    """
+    Schreibt Journal-Einträge im Hintergrund. Schnell aufeinanderfolgende
+    Änderungen werden gesammelt und mit einem einzigen Schreibvorgang (inkl.
+    fsync) abgelegt; wird das Journal zu groß, schreibt der Thread auch den
+    Snapshot. Fehler landen in `errors` und werden vom UI-Thread abgeholt.
+    """
+
+    def __init__(self, backend, delay=0.2):
+        super().__init__(name="verkauf-write-behind", daemon=True)
+        self.backend = backend
+        self.delay = delay
+        self.errors = queue.Queue()
+        self.pending = []
+        self.busy = False
+        self.stopping = False
+        self.condition = threading.Condition()
+
+    def submit(self, *records):
+        with self.condition:
+            self.pending.extend(records)
+            self.condition.notify_all()
+
+    def take(self):
+        """
+        Übernimmt alle ausstehenden Einträge (backend.lock gehalten).
+        """
+        with self.condition:
+            records, self.pending = self.pending, []
+            return records
+
+    def requeue(self, records):
+        """
+        Legt nicht geschriebene Einträge für den nächsten Versuch zurück.
+        """
+        with self.condition:
+            self.pending[:0] = records
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.stopping:
+                    self.condition.wait()
+                if not self.pending and self.stopping:
+                    return
+            # Kurz warten, damit weitere Änderungen im selben Schreibvorgang landen
+            if not self.stopping:
+                time.sleep(self.delay)
+            if not self._write_batch() and self.stopping:
+                return
+
+    def _write_batch(self):
+        with self.condition:
+            self.busy = True
+        try:
+            self.backend._commit()
+            return True
+        except OSError as error:
+            self.errors.put(error)
+            if not self.stopping:
+                time.sleep(1)
+            return False
+        finally:
+            with self.condition:
+                self.busy = False
+                self.condition.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        Wartet, bis alle ausstehenden Einträge geschrieben sind.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            self.condition.notify_all()
+            while self.pending or self.busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+        return True
+
+    def stop(self):
+        with self.condition:
+            self.stopping = True
+            self.condition.notify_all()
+        self.join()
+
+
+# ------------------------- Speicher-Backends -------------------------
+class JsonBackend:
+    """
+    Speichert alles in verkauf_data.json (Snapshot + Journal).
+    Alle Daten liegen im Speicher; Verkäufe in einem Dict ID -> Verkauf,
+    damit Nachschlagen und Löschen per ID O(1) sind.
+
+    Mehrere Prozesse dürfen dieselbe Datei benutzen: geschrieben wird nur
+    unter der Dateisperre, und vorher werden die Einträge der anderen
+    übernommen (optimistisch: eigene, noch nicht geschriebene Verkäufe
+    bekommen bei einer ID-Kollision eine neue ID).
+    """
+
+    name = "json"
+
+    def __init__(self, data_file=None, journal_file=None, write_behind=False, rollup_file=None):
+        self.data_file = data_file or DATA_FILE
+        self.journal_file = journal_file or JOURNAL_FILE
+        self.rollup_file = rollup_file or ROLLUP_FILE
+        self.file_lock = FileLock(self.data_file + ".lock")
+        self.data = {}
+
+        # Zählt jede Änderung, damit Ansichten erkennen, ob neu berechnet werden muss
+        self.version = 0
+        # Übernommene Änderungen anderer Prozesse, die poll_changes noch nicht
+        # gemeldet hat (z. B. beim Schreiben im Hintergrund abgeglichen)
+        self.unreported = None
+
+        # Änderungen im Speicher und Schreiben im Hintergrund dürfen sich nicht überschneiden
+        self.lock = threading.RLock()
+        with self.file_lock:
+            self._load()
+        self.writer = None
+        if write_behind:
+            self.writer = WriteBehindWriter(self)
+            self.writer.start()
+
+    def _load(self):
+        """
+        Liest Snapshot und Journal vollständig (Dateisperre gehalten).
+        `self.data` wird an Ort und Stelle ersetzt, damit Ansichten, die es
+        halten, den neuen Stand sehen.
+        """
+        data, self.needs_rewrite = read_data(self.data_file, self.journal_file)
+        self.sales = {sale["id"]: sale for sale in data.pop("sales")}
+        self.data.clear()
+        self.data.update(data)
+        self.aggregates = SalesAggregates.build(self.sales.values())
+        self.text_index = None
+        self.leaderboards = None
+        self.rollups = load_rollups(self._file_version(), self.rollup_file) or SalesRollups.build(self.sales.values())
+        self.journal_pos = journal_size(self.journal_file)
+        self.seen = self._file_version()
+
+    def _file_version(self):
+        return file_version((self.data_file, self.journal_file))
+
+    def snapshot(self):
+        """
+        Vollständiger Datenbestand im Format von verkauf_data.json.
+        """
+        return {
+            "users": self.data["users"],
+            "sales": list(self.sales.values()),
+            "categories": self.data["categories"],
+            "next_id": self.data["next_id"],
+            "generation": self.data["generation"],
+            "seq": self.data["seq"],
+        }
+
+    def _index(self, sale):
+        self.sales[sale["id"]] = sale
+        self.aggregates.add(sale)
+        self.rollups.add(sale)
+        if self.text_index is not None:
+            self.text_index.add(sale)
+        if self.leaderboards is not None:
+            self.leaderboards.add(sale)
+
+    def _unindex(self, sale_id):
+        sale = self.sales.pop(sale_id, None)
+        if sale is not None:
+            self.aggregates.remove(sale)
+            self.rollups.remove(sale)
+            if self.text_index is not None:
+                self.text_index.remove(sale)
+            if self.leaderboards is not None:
+                self.leaderboards.remove(sale)
+        return sale
+
+    # --- Abgleich mit anderen Prozessen ---
+    def _pending(self):
+        return self.writer.pending if self.writer is not None else []
+
+    @timed("poll_changes")
+    def poll_changes(self, blocking=True):
+        """
+        Prüft billig (Größe/Änderungszeit der Dateien), ob ein anderer
+        Prozess geschrieben hat, und übernimmt dann nur dessen neue Einträge.
+        Gibt None zurück, wenn sich nichts geändert hat, sonst die Menge der
+        betroffenen (Benutzer, Kategorie)-Paare. Dazu gehören auch Änderungen,
+        die schon beim Schreiben oder Nachladen übernommen wurden, sowie
+        eigene Verkäufe, die dabei eine neue ID bekommen haben.
+
+        Mit blocking=False (UI-Thread) wird nicht gewartet, solange der
+        Hintergrund-Thread oder ein anderer Prozess schreibt; dann kommt
+        None zurück und die Änderungen folgen beim nächsten Aufruf.
+        """
+        if self._file_version() == self.seen and self.unreported is None:
+            return None
+        if not self.lock.acquire(blocking):
+            return None
+        try:
+            if self._file_version() != self.seen:
+                if not self.file_lock.acquire(blocking):
+                    return None
+                try:
+                    self._sync(self._pending())
+                finally:
+                    self.file_lock.release()
+            changes, self.unreported = self.unreported, None
+            return changes
+        finally:
+            self.lock.release()
+
+    def _sync(self, pending):
+        """
+        Übernimmt Änderungen anderer Prozesse (self.lock und Dateisperre
+        gehalten). Normalerweise werden nur die neuen Journal-Zeilen
+        gelesen; hat ein anderer Prozess inzwischen kompaktiert, kommen die
+        fehlenden Einträge aus <Journal>.old. Nur wenn auch das nicht reicht,
+        wird alles neu geladen. `pending` sind die eigenen, noch nicht
+        geschriebenen Einträge. Die Änderungen werden zurückgegeben und bis
+        zum nächsten poll_changes in self.unreported gesammelt.
+        """
+        version = self._file_version()
+        if version == self.seen:
+            return None
+        generation = self.data["generation"]
+        header = journal_header(self.journal_file)
+        old_journal = self.journal_file + ".old"
+        snapshot_changed = [entry for entry in version if entry[0] == self.data_file] != [
+            entry for entry in self.seen if entry[0] == self.data_file
+        ]
+
+        if header in (None, generation) and not snapshot_changed:
+            records, self.journal_pos = read_journal_from(self.journal_file, self.journal_pos)
+        elif header == generation + 1 and journal_header(old_journal) in (None, generation):
+            records, _ = read_journal_from(old_journal, self.journal_pos)
+            newer, self.journal_pos = read_journal_from(self.journal_file)
+            records += newer
+            self.data["generation"] = header
+        else:
+            return self._unreported(self._reload(pending))
+
+        changes = self._apply_remote(records, pending)
+        self.seen = self._file_version()
+        return self._unreported(changes)
+
+    def _unreported(self, changes):
+        if changes is not None:
+            self.unreported = (self.unreported or set()) | changes
+        return changes
+
+    def _apply_remote(self, records, pending):
+        changes = set()
+        applied = 0
+        pending_ids = {record["sale"]["id"] for record in pending if record["op"] == "add_sale"}
+        for record in records:
+            op = record["op"]
+            if op == "header" or record.get("seq", self.data["seq"] + 1) <= self.data["seq"]:
+                continue
+            applied += 1
+            if op == "add_sale":
+                sale = record["sale"]
+                if sale["id"] in pending_ids:
+                    # Ein anderer Prozess war schneller: eigener Verkauf bekommt eine neue ID
+                    own = self._unindex(sale["id"]) if sale["id"] in self.sales else None
+                    pending_ids.discard(sale["id"])
+                    pending_ids.add(self._renumber(sale["id"], pending))
+                    if own is not None:
+                        self._index(own)
+                        changes.add((own["user"], own["category"]))
+                elif sale["id"] in self.sales:
+                    self._unindex(sale["id"])
+                self._index(sale)
+                self.data["next_id"] = max(self.data["next_id"], sale["id"] + 1)
+                changes.add((sale["user"], sale["category"]))
+            elif op in ("delete_sale", "delete_sales"):
+                changes |= self._apply_delete(record)
+            else:
+                apply_record(self.data, record, self.sales)
+            if "seq" in record:
+                self.data["seq"] = record["seq"]
+        if not applied:
+            return None
+        self.version += 1
+        return changes
+
+    def _apply_delete(self, record):
+        changes = set()
+        for sale_id in record.get("ids", [record.get("id")]):
+            sale = self._unindex(sale_id)
+            if sale is not None:
+                changes.add((sale["user"], sale["category"]))
+        return changes
+
+    def _renumber(self, old_id, pending):
+        """
+        Vergibt einem eigenen, noch nicht geschriebenen Verkauf eine neue ID
+        und passt die ausstehenden Einträge an. Gibt die neue ID zurück.
+        """
+        new_id = max(self.data["next_id"], old_id + 1)
+        self.data["next_id"] = new_id + 1
+        for record in pending:
+            if record["op"] == "add_sale" and record["sale"]["id"] == old_id:
+                record["sale"]["id"] = new_id
+            elif record["op"] == "delete_sales":
+                record["ids"] = [new_id if sale_id == old_id else sale_id for sale_id in record["ids"]]
+                for info in record.get("sales", []):
+                    if info["id"] == old_id:
+                        info["id"] = new_id
+        return new_id
+
+    def _reload(self, pending):
+        """
+        Lädt alles neu und wendet die eigenen ausstehenden Einträge wieder an.
+        """
+        self._load()
+        for record in pending:
+            if record["op"] == "add_sale":
+                sale = record["sale"]
+                if sale["id"] in self.sales:
+                    self._renumber(sale["id"], pending)
+                self._index(sale)
+                self.data["next_id"] = max(self.data["next_id"], sale["id"] + 1)
+            elif record["op"] == "delete_sales":
+                for sale_id in record["ids"]:
+                    self._unindex(sale_id)
+            else:
+                apply_record(self.data, record, self.sales)
+        self.version += 1
+        # Alle Paare gelten als geändert
+        return set(self.aggregates.totals_by_user_category())
+
+    @timed("commit")
+    def _commit(self, records=(), snapshot=False):
+        """
+        Schreibt Einträge unter der Dateisperre: erst die Änderungen anderer
+        Prozesse übernehmen, dann die eigenen Einträge fortlaufend nummeriert
+        anhängen und bei Bedarf (oder mit snapshot=True) den Snapshot neu
+        schreiben. Serialisiert wird unter self.lock, geschrieben danach.
+        """
+        self.lock.acquire()
+        try:
+            self.file_lock.acquire()
+        except BaseException:
+            self.lock.release()
+            raise
+        try:
+            try:
+                records = list(records)
+                if self.writer is not None:
+                    records += self.writer.take()
+                self._sync(records)
+                seq = self.data["seq"]
+                for record in records:
+                    seq += 1
+                    record["seq"] = seq
+                lines = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+                payload = None
+                if snapshot or needs_compaction(self.data_file, self.journal_file, pending=len(lines)):
+                    generation = self.data["generation"] + 1
+                    payload = self._snapshot_payload(generation, seq)
+            finally:
+                self.lock.release()
+
+            if lines:
+                try:
+                    append_journal_text(lines, self.journal_file, sync=self.writer is not None)
+                except OSError:
+                    if self.writer is not None:
+                        self.writer.requeue(records)
+                    raise
+            self.data["seq"] = seq
+            if payload is not None:
+                self._write_snapshot_payload(payload, generation)
+                self.data["generation"] = generation
+                self.needs_rewrite = False
+            self.journal_pos = journal_size(self.journal_file)
+            self.seen = self._file_version()
+        finally:
+            self.file_lock.release()
+
+    def _snapshot_payload(self, generation, seq):
+        """
+        Serialisiert den Snapshot (self.lock gehalten).
+        """
+        return json.dumps({**self.snapshot(), "generation": generation, "seq": seq}, indent=4)
+
+    def _write_snapshot_payload(self, text, generation):
+        write_snapshot(text, self.data_file, self.journal_file, generation)
+
+    # --- Änderungen ---
+    def _persist(self, op, **payload):
+        self._persist_records([{"op": op, **payload}])
+
+    def _persist_records(self, records):
+        self.version += 1
+        if self.writer is not None:
+            self.writer.submit(*records)
+            return
+        self._commit(records)
+
+    def register(self, username, password):
+        with self.lock:
+            self.data["users"][username] = password
+            self._persist("register", username=username, password=password)
+
+    def add_parent_category(self, name):
+        with self.lock:
+            self.data["categories"][name] = {"subcategories": {}}
+            self._persist("add_parent_category", name=name)
+
+    def add_sub_category(self, parent, name, price):
+        with self.lock:
+            parent_info = self.data["categories"].setdefault(parent, {"subcategories": {}})
+            parent_info["subcategories"][name] = {"price": price}
+            self._persist("add_sub_category", parent=parent, name=name, price=price)
+
+    def add_sale(self, sale):
+        """
+        Vergibt eine neue, fortlaufende ID und speichert den Verkauf.
+        """
+        return self.add_sales([sale])[0]
+
+    def add_sales(self, sales):
+        """
+        Speichert mehrere Verkäufe mit einem einzigen Schreibvorgang.
+        Schreibt ein anderer Prozess gleichzeitig, können sich die IDs beim
+        Speichern noch ändern; zurückgegeben werden die endgültigen.
+        """
+        with self.lock:
+            records = []
+            for sale in sales:
+                sale["id"] = self.data["next_id"]
+                self.data["next_id"] += 1
+                self._index(sale)
+                records.append({"op": "add_sale", "sale": sale})
+            self._persist_records(records)
+            return [sale["id"] for sale in sales]
+
+    def delete_sales(self, sale_ids):
+        """
+        Löscht mehrere Verkäufe mit einem einzigen Journal-Eintrag.
+        """
+        with self.lock:
+            removed = [sale_id for sale_id in sale_ids if self._unindex(sale_id) is not None]
+            if removed:
+                self._persist("delete_sales", ids=removed)
+            return removed
+
+    def delete_sale(self, sale_id):
+        return self.delete_sales([sale_id])
+
+    def flush(self):
+        if self.writer is not None:
+            self.writer.flush()
+
+    def _unchanged(self):
+        """
+        Nichts zu kompaktieren: keine ausstehenden Einträge, keine im Journal
+        (auch nicht von anderen Prozessen) und der Snapshot ist aktuell.
+        Dann bleiben Datei und Generation unverändert, damit nur lesende
+        Programme (Export, Berichte) anderen Instanzen keinen vollständigen
+        Neuladevorgang verursachen.
+        """
+        return not self.needs_rewrite and not self._pending() and not journal_has_records(self.journal_file)
+
+    def compact(self):
+        with self.lock:
+            if self._unchanged():
+                return
+            self._commit(snapshot=True)
+            # Rollups passend zum gerade geschriebenen Snapshot ablegen
+            save_rollups(self.rollups, self._file_version(), self.rollup_file)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.stop()
+            self.writer = None
+        self.compact()
+
+    # --- Abfragen ---
+    # Abfragen halten self.lock, weil andere Threads (Hintergrund-Speichern,
+    # parallele Streamlit-Sitzungen) self.sales gleichzeitig ändern können.
+    def sale_count(self):
+        return self.aggregates.count
+
+    def get_sale(self, sale_id):
+        return self.sales.get(sale_id)
+
+    def all_sales(self):
+        with self.lock:
+            return list(self.sales.values())
+
+    def iter_sales(self):
+        return iter(self.all_sales())
+
+    def sales_for_user(self, user):
+        with self.lock:
+            return [sale for sale in self.sales.values() if sale["user"] == user]
+
+    def sales_for_category(self, category):
+        with self.lock:
+            return [sale for sale in self.sales.values() if sale["category"] == category]
+
+    def sales_for_user_category(self, user, category, offset=0, limit=None, start=None, end=None):
+        with self.lock:
+            matches = [
+                sale for sale in self.sales.values()
+                if sale["user"] == user and sale["category"] == category
+                and (start is None or sale["date"] >= start)
+                and (end is None or sale["date"] <= end)
+            ]
+        return matches[offset:None if limit is None else offset + limit]
+
+    def sales_for_buyer(self, buyer):
+        with self.lock:
+            return [sale for sale in self.sales.values() if sale["buyer"] == buyer]
+
+    def sales_between(self, start, end):
+        with self.lock:
+            return [sale for sale in self.sales.values() if start <= sale["date"] <= end]
+
+    def month_sales(self, month):
+        """
+        Verkäufe eines Monats ("YYYY-MM").
+        """
+        return self.sales_between(month, month + "\uffff")
+
+    def query_sales(self, category=None, buyer=None, start=None, end=None, offset=0, limit=None):
+        """
+        Gefilterte Seite von Verkäufen samt Gesamtanzahl der Treffer.
+        """
+        with self.lock:
+            matches = [
+                sale for sale in self.sales.values()
+                if (category is None or sale["category"] == category)
+                and (buyer is None or sale["buyer"] == buyer)
+                and (start is None or sale["date"] >= start)
+                and (end is None or sale["date"] <= end)
+            ]
+        return matches[offset:None if limit is None else offset + limit], len(matches)
+
+    def overall_totals(self):
+        with self.lock:
+            return self.aggregates.overall_totals()
+
+    def totals_by_user(self):
+        with self.lock:
+            return self.aggregates.totals_by_user()
+
+    def totals_by_user_category(self):
+        with self.lock:
+            return self.aggregates.totals_by_user_category()
+
+    def totals_by_category(self):
+        with self.lock:
+            return self.aggregates.totals_by_category()
+
+    def period_aggregates(self, start=None, end=None):
+        """
+        Summen für einen Zeitraum aus den Tages-/Monats-Rollups.
+        """
+        with self.lock:
+            return self.rollups.aggregate(start, end)
+
+    def revenue_by_month(self, start=None, end=None):
+        with self.lock:
+            return self.rollups.revenue_by_month(start, end)
+
+    def search_sales(self, query, fields=None, substring=True, offset=0, limit=None):
+        """
+        Volltextsuche über Käufer, Beschreibung und Kategorie: Seite der
+        Treffer (neueste zuerst) samt Gesamtanzahl. Der Index wird bei der
+        ersten Suche aufgebaut und danach bei jeder Änderung nachgeführt.
+        """
+        with self.lock:
+            if self.text_index is None:
+                self.text_index = SalesSearch.build(self.sales.values())
+            ids = self.text_index.search(query, fields, substring)
+            return [self.sales[sale_id] for sale_id in newest_first(ids, offset, limit)], len(ids)
+
+    def leaderboard(self, dimension, n=10, start=None, end=None):
+        """
+        Die n umsatzstärksten Käufer ("buyer"), Kategorien ("category") oder
+        Verkäufer ("user") als [(Name, Umsatz, Anzahl)]. Ohne Zeitraum aus
+        den mitgeführten Ranglisten, mit Zeitraum aus den Rollups (Käufer
+        über die Verkäufe des Zeitraums).
+        """
+        if start is None and end is None:
+            with self.lock:
+                if self.leaderboards is None:
+                    self.leaderboards = self._build_leaderboards()
+                return self.leaderboards.top(dimension, n)
+        if dimension == "buyer":
+            return top_totals(self._buyer_totals(start, end), n)
+        period = self.period_aggregates(start, end)
+        return top_totals(period.by_user if dimension == "user" else period.by_category, n)
+
+    def _build_leaderboards(self):
+        return SalesLeaderboards.build(self.iter_sales(), self.aggregates)
+
+    def _buyer_totals(self, start, end):
+        totals = {}
+        for sale in self.sales_between(start or "", end or "\uffff"):
+            entry = totals.setdefault(sale.get("buyer", ""), [0, 0])
+            entry[0] += sale["amount"]
+            entry[1] += 1
+        return totals
+
+
+# ------------------------- Monats-Partitionen -------------------------
+UNDATED_PARTITION = "0000-00"
+SALE_SUMMARY_FIELDS = ("id", "user", "category", "date", "amount", "buyer")
+
+
+def partition_key(date):
+    """
+    Monat ("YYYY-MM") eines Verkaufsdatums; ungültige Angaben landen in "0000-00".
+    """
+    if isinstance(date, str) and len(date) >= 7 and date[4] == "-" and date[:4].isdigit() and date[5:7].isdigit():
+        return date[:7]
+    return UNDATED_PARTITION
+
+
+def eager_cutoff(months=EAGER_MONTHS, today=None):
+    """
+    Ältester Monat, der beim Start noch sofort geladen wird.
+    """
+    today = today or datetime.now()
+    index = today.year * 12 + today.month - 1 - (months - 1)
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+class PartitionedBackend(JsonBackend):
+    """
+    Verkäufe in Monatsdateien (verkauf_data.parts/sales-YYYY-MM.json) und
+    ein kleines Manifest mit Benutzern, Kategorien und den Summen jeder
+    Partition. Beim Start werden nur die letzten EAGER_MONTHS Monate
+    gelesen; Summen und Rollups kommen aus dem Manifest. Ältere Monate
+    werden erst geladen, wenn eine Abfrage sie braucht.
+
+    Journal, Dateisperre und Abgleich mit anderen Prozessen funktionieren
+    wie beim JSON-Backend; beim Kompaktieren werden nur die geänderten
+    Monate neu geschrieben.
+    """
+
+    name = "partitioned"
+
+    def __init__(self, directory=None, write_behind=False, eager_months=None):
+        self.directory = directory or PARTITION_DIR
+        self.eager_months = EAGER_MONTHS if eager_months is None else eager_months
+        os.makedirs(self.directory, exist_ok=True)
+        super().__init__(
+            os.path.join(self.directory, "manifest.json"),
+            os.path.join(self.directory, "journal"),
+            write_behind,
+            os.path.join(self.directory, "rollups.json"),
+        )
+
+    def _load(self):
+        manifest = self._read_manifest()
+        data = empty_data()
+        del data["sales"]
+        data.update((key, value) for key, value in manifest.items() if key != "partitions")
+        self.data.clear()
+        self.data.update(data)
+
+        self.partitions = manifest.get("partitions", {})
+        self.sales = {}
+        self.loaded = set()
+        # Geänderte Monate (beim Kompaktieren neu zu schreiben)
+        self.dirty = set()
+        # Gelöscht, während der Monat nicht geladen war
+        self.deleted = set()
+        # Monat -> {(Benutzer, Kategorie): Anzahl}
+        self.month_keys = {}
+        self.aggregates = SalesAggregates()
+        self.rollups = SalesRollups()
+        # Käufer -> [Umsatz, Anzahl] über alle Monate, damit die Käufer-Rangliste
+        # ohne die alten Monate auskommt; None, solange ein Monat (ältere
+        # Ablage) keine Käufersummen hat
+        self.buyer_totals = {}
+        self.text_index = None
+        self.leaderboards = None
+        for month, entry in self.partitions.items():
+            keys = self.month_keys.setdefault(month, {})
+            for rollup_month, user, category, revenue, count in entry["totals"]:
+                self.aggregates.add_totals(user, category, revenue, count)
+                self.rollups.add_month_totals(rollup_month, user, category, revenue, count)
+                keys[(user, category)] = keys.get((user, category), 0) + count
+            if "buyers" not in entry:
+                self.buyer_totals = None
+                self.dirty.add(month)  # Beim nächsten Kompaktieren ergänzen
+            elif self.buyer_totals is not None:
+                for buyer, revenue, count in entry["buyers"]:
+                    self._count_buyer(buyer, revenue, count)
+
+        cutoff = eager_cutoff(self.eager_months)
+        eager = [month for month in self.partitions if month >= cutoff]
+        for month in eager:
+            self._read_partition(month)
+        self._complete_days(eager)
+        self.needs_rewrite = False
+        self._apply_remote(read_journal(self.journal_file), [])
+        self.journal_pos = journal_size(self.journal_file)
+        self.seen = self._file_version()
+
+    def _read_manifest(self):
+        if not os.path.exists(self.data_file):
+            return {}
+        with open(self.data_file, "r", encoding="utf-8") as file:
+            return json.load(file)
+
+    def _partition_sales(self, month):
+        """
+        Verkäufe eines Monats so, wie sie in der Ablage stehen.
+        """
+        entry = self.partitions.get(month)
+        if entry is None:
+            return []
+        try:
+            with open(os.path.join(self.directory, entry["file"]), "r", encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return []  # Monat wurde inzwischen geleert
+
+    def _read_partition(self, month):
+        for sale in self._partition_sales(month):
+            # Neuere Stände aus dem Journal haben Vorrang
+            if sale["id"] not in self.sales and sale["id"] not in self.deleted:
+                self.sales[sale["id"]] = sale
+        self.loaded.add(month)
+
+    @timed("load_months")
+    def _load_months(self, months):
+        """
+        Lädt Monate nach. Vorher werden die Änderungen anderer Prozesse
+        übernommen, damit die Datei nicht neuer ist als der eigene Stand.
+        """
+        months = [month for month in months if month not in self.loaded]
+        if not months:
+            return
+        with self.lock, self.file_lock:
+            self._sync(self._pending())
+            months = [month for month in months if month not in self.loaded]
+            for month in months:
+                self._read_partition(month)
+            self._complete_days(months)
+
+    def _complete_days(self, months):
+        """
+        Tages-Rollups geladener Monate aus deren Verkäufen aufbauen (das
+        Manifest enthält nur Monatssummen).
+        """
+        months = set(months)
+        if not months:
+            return
+        days = [day for day in self.rollups.day_keys if partition_key(day) in months]
+        sales = [sale for sale in self.sales.values() if partition_key(sale["date"]) in months]
+        self.rollups.set_days(days, sales)
+
+    def _months(self, start=None, end=None, user=None, category=None):
+        """
+        Monate (aufsteigend), die Verkäufe im Zeitraum bzw. zu Benutzer/Kategorie enthalten können.
+        """
+        months = []
+        with self.lock:
+            for month in sorted(set(self.partitions) | set(self.month_keys)):
+                if start is not None and (month == UNDATED_PARTITION or month < start[:7]):
+                    continue
+                if end is not None and month > end[:7]:
+                    continue
+                if user is not None or category is not None:
+                    keys = self.month_keys.get(month, {})
+                    if not any((user is None or u == user) and (category is None or c == category) for u, c in keys):
+                        continue
+                months.append(month)
+        return months
+
+    def _months_for_id(self, sale_id):
+        return [
+            month for month, entry in self.partitions.items()
+            if month not in self.loaded and entry["min_id"] <= sale_id <= entry["max_id"]
+        ]
+
+    def _count(self, sale, delta):
+        month = partition_key(sale["date"])
+        keys = self.month_keys.setdefault(month, {})
+        key = (sale["user"], sale["category"])
+        keys[key] = keys.get(key, 0) + delta
+        if keys[key] <= 0:
+            del keys[key]
+        self.dirty.add(month)
+        if self.buyer_totals is not None:
+            self._count_buyer(sale.get("buyer", ""), delta * sale["amount"], delta)
+
+    def _count_buyer(self, buyer, revenue, count):
+        totals = self.buyer_totals.setdefault(buyer, [0, 0])
+        totals[0] += revenue
+        totals[1] += count
+        if totals[1] <= 0:
+            del self.buyer_totals[buyer]
+
+    def _index(self, sale):
+        super()._index(sale)
+        self._count(sale, 1)
+
+    def _unindex(self, sale_id):
+        if sale_id not in self.sales:
+            self._load_months(self._months_for_id(sale_id))
+        sale = super()._unindex(sale_id)
+        if sale is not None:
+            self._count(sale, -1)
+        return sale
+
+    def _apply_delete(self, record):
+        # Löschungen in nicht geladenen Monaten über die mitgeschriebenen Eckdaten verbuchen
+        summaries = {summary["id"]: summary for summary in record.get("sales", [])}
+        changes = set()
+        for sale_id in record.get("ids", [record.get("id")]):
+            if sale_id in self.sales:
+                sale = self._unindex(sale_id)
+            elif sale_id in summaries:
+                sale = summaries[sale_id]
+                self.aggregates.remove(sale)
+                self.rollups.remove(sale)
+                if "buyer" not in sale:
+                    # Älterer Eintrag ohne Käufer: Ranglisten aus den Verkäufen neu aufbauen
+                    self.leaderboards = None
+                    self.buyer_totals = None
+                elif self.leaderboards is not None:
+                    self.leaderboards.remove(sale)
+                self._count(sale, -1)
+                self.deleted.add(sale_id)
+            else:
+                continue
+            changes.add((sale["user"], sale["category"]))
+        return changes
+
+    def _dirty_partitions(self):
+        """
+        Verkäufe und neue Manifest-Einträge der geänderten Monate (self.lock
+        gehalten). Gibt (Monate, alle Einträge, {Monat: Verkäufe}) zurück;
+        leer gewordene Monate haben None statt Verkäufen.
+        """
+        months = set(self.dirty)
+        for month in months:
+            if month not in self.loaded:
+                self._read_partition(month)
+        by_month = {month: [] for month in months}
+        for sale in self.sales.values():
+            month = partition_key(sale["date"])
+            if month in by_month:
+                by_month[month].append(sale)
+
+        partitions = {month: dict(entry) for month, entry in self.partitions.items()}
+        changed = {}
+        for month, sales in by_month.items():
+            if not sales:
+                partitions.pop(month, None)
+                changed[month] = None
+                continue
+            totals = {}
+            buyers = {}
+            for sale in sales:
+                bucket = totals.setdefault((sale["date"][:7], sale["user"], sale["category"]), [0, 0])
+                bucket[0] += sale["amount"]
+                bucket[1] += 1
+                bucket = buyers.setdefault(sale.get("buyer", ""), [0, 0])
+                bucket[0] += sale["amount"]
+                bucket[1] += 1
+            ids = [sale["id"] for sale in sales]
+            partitions[month] = {
+                "count": len(sales),
+                "revenue": sum(sale["amount"] for sale in sales),
+                "min_id": min(ids),
+                "max_id": max(ids),
+                "totals": [[*key, *bucket] for key, bucket in totals.items()],
+                "buyers": [[buyer, *bucket] for buyer, bucket in buyers.items()],
+            }
+            changed[month] = sales
+        self.dirty.clear()
+        return months, partitions, changed
+
+    def _manifest(self, generation, seq, partitions):
+        return {
+            "users": self.data["users"],
+            "categories": self.data["categories"],
+            "next_id": self.data["next_id"],
+            "generation": generation,
+            "seq": seq,
+            "partitions": partitions,
+        }
+
+    def _snapshot_payload(self, generation, seq):
+        """
+        Serialisiert die geänderten Monate und das Manifest (self.lock gehalten).
+        """
+        months, partitions, changed = self._dirty_partitions()
+        files = {}
+        for month, sales in changed.items():
+            name = f"sales-{month}.json"
+            if sales is None:
+                files[name] = None
+                continue
+            partitions[month]["file"] = name
+            files[name] = json.dumps(sales, ensure_ascii=False)
+        return months, partitions, files, json.dumps(self._manifest(generation, seq, partitions), indent=4)
+
+    def _write_snapshot_payload(self, payload, generation):
+        months, partitions, files, manifest = payload
+        try:
+            for name, text in files.items():
+                if text is not None:
+                    write_atomic(os.path.join(self.directory, name), text)
+            write_snapshot(manifest, self.data_file, self.journal_file, generation)
+        except OSError:
+            self.dirty |= months
+            raise
+        self.partitions = partitions
+        for name, text in files.items():
+            path = os.path.join(self.directory, name)
+            if text is None and os.path.exists(path):
+                os.remove(path)
+
+    # --- Änderungen ---
+    def delete_sales(self, sale_ids):
+        """
+        Wie beim JSON-Backend; der Journal-Eintrag enthält zusätzlich die
+        Eckdaten der Verkäufe, damit andere Prozesse ihre Summen anpassen
+        können, ohne den Monat zu laden.
+        """
+        with self.lock:
+            removed = []
+            for sale_id in sale_ids:
+                sale = self._unindex(sale_id)
+                if sale is not None:
+                    removed.append({field: sale[field] for field in SALE_SUMMARY_FIELDS})
+            if removed:
+                self._persist("delete_sales", ids=[sale["id"] for sale in removed], sales=removed)
+            return [sale["id"] for sale in removed]
+
+    def _unchanged(self):
+        # Direkt indizierte Verkäufe (Migration) stehen nicht im Journal, nur in self.dirty
+        return super()._unchanged() and not self.dirty
+
+    def compact(self):
+        # Summen und Rollups stehen im Manifest, eine eigene Rollup-Datei braucht es nicht
+        with self.lock:
+            if self._unchanged():
+                return
+            self._commit(snapshot=True)
+
+    # --- Abfragen ---
+    def get_sale(self, sale_id):
+        if sale_id not in self.sales:
+            self._load_months(self._months_for_id(sale_id))
+        return super().get_sale(sale_id)
+
+    def all_sales(self):
+        self._load_months(self._months())
+        return super().all_sales()
+
+    def iter_sales(self):
+        """
+        Liefert alle Verkäufe; nicht geladene Monate werden nur gelesen, nicht behalten.
+        """
+        with self.lock:
+            sales = list(self.sales.values())
+            known = set(self.sales) | self.deleted
+            unloaded = [month for month in sorted(self.partitions) if month not in self.loaded]
+        yield from sales
+        for month in unloaded:
+            with self.lock:
+                month_sales = self._partition_sales(month)
+            for sale in month_sales:
+                if sale["id"] not in known:
+                    yield sale
+
+    def sales_for_user(self, user):
+        self._load_months(self._months(user=user))
+        return super().sales_for_user(user)
+
+    def sales_for_category(self, category):
+        self._load_months(self._months(category=category))
+        return super().sales_for_category(category)
+
+    def sales_for_user_category(self, user, category, offset=0, limit=None, start=None, end=None):
+        self._load_months(self._months(start, end, user, category))
+        return super().sales_for_user_category(user, category, offset, limit, start, end)
+
+    def sales_for_buyer(self, buyer):
+        self._load_months(self._months())
+        return super().sales_for_buyer(buyer)
+
+    def sales_between(self, start, end):
+        self._load_months(self._months(start, end))
+        return super().sales_between(start, end)
+
+    def month_sales(self, month):
+        """
+        Verkäufe eines Monats; ein nicht geladener Monat wird wie bei
+        iter_sales nur gelesen, nicht behalten.
+        """
+        with self.lock:
+            sales = [sale for sale in self.sales.values() if partition_key(sale["date"]) == month]
+            if month in self.loaded:
+                return sales
+            known = set(self.sales) | self.deleted
+            stored = self._partition_sales(month)
+        return sales + [sale for sale in stored if sale["id"] not in known]
+
+    def query_sales(self, category=None, buyer=None, start=None, end=None, offset=0, limit=None):
+        """
+        Ohne Käufer- und Zeitraumfilter wird die Anzahl aus den Monatssummen
+        bestimmt und nur die Monate der angeforderten Seite geladen
+        (chronologisch nach Monat, innerhalb eines Monats nach ID).
+        """
+        if buyer is not None or start is not None or end is not None or limit is None:
+            self._load_months(self._months(start, end, category=category))
+            return super().query_sales(category, buyer, start, end, offset, limit)
+
+        rows = []
+        total = 0
+        for month in self._months(category=category):
+            with self.lock:
+                keys = dict(self.month_keys.get(month, {}))
+            count = sum(n for (_, key_category), n in keys.items() if category is None or key_category == category)
+            if count and total + count > offset and len(rows) < limit:
+                self._load_months([month])
+                with self.lock:
+                    matches = sorted(
+                        (sale for sale in self.sales.values()
+                         if partition_key(sale["date"]) == month and (category is None or sale["category"] == category)),
+                        key=lambda sale: sale["id"],
+                    )
+                rows.extend(matches[max(0, offset - total):])
+            total += count
+        return rows[:limit], total
+
+    def period_aggregates(self, start=None, end=None):
+        # Randmonate werden tageweise ausgewertet und müssen dafür geladen sein
+        self._load_months([partition_key(date) for date in (start, end) if date])
+        return self.rollups.aggregate(start, end)
+
+    def revenue_by_month(self, start=None, end=None):
+        self._load_months([partition_key(date) for date in (start, end) if date])
+        return super().revenue_by_month(start, end)
+
+    def search_sales(self, query, fields=None, substring=True, offset=0, limit=None):
+        # Der Suchindex umfasst alle Monate
+        self._load_months(self._months())
+        return super().search_sales(query, fields, substring, offset, limit)
+
+    def _build_leaderboards(self):
+        # Käufersummen aus dem Manifest und den seither geänderten Verkäufen
+        if self.buyer_totals is None:
+            return super()._build_leaderboards()
+        return SalesLeaderboards.build((), self.aggregates, self.buyer_totals)
+
+
+class BinaryBackend(PartitionedBackend):
+    """
+    Wie die Monats-Partitionen, aber in einer einzigen Datei
+    (verkauf_data.vkb): ein Header mit Benutzern, Kategorien und den Summen
+    jedes Monats, danach ein spaltenweiser Block pro Monat (Format siehe
+    verkauf_binary.py). Beim Start wird nur der Header gelesen und die
+    letzten EAGER_MONTHS Monate dekodiert; ältere Blöcke werden über mmap
+    gelesen, wenn eine Abfrage sie braucht.
+
+    Beim Kompaktieren wird die Datei atomar neu geschrieben; unveränderte
+    Blöcke werden dabei als Bytes übernommen, ohne sie zu dekodieren.
+    """
+
+    name = "binary"
+
+    def __init__(self, binary_file=None, write_behind=False, eager_months=None, compression=BINARY_COMPRESSION):
+        binary_file = binary_file or BINARY_FILE
+        self.eager_months = EAGER_MONTHS if eager_months is None else eager_months
+        self.compression = compression
+        # Beginn der Blöcke und Kennung (Inode, Größe, Änderungszeit) der Datei, zu der self.partitions passt
+        self.block_start = 0
+        self.block_file = None
+        JsonBackend.__init__(
+            self, binary_file, binary_file + ".journal", write_behind, binary_file + ".rollups.json"
+        )
+
+    def _read_manifest(self):
+        self.block_file = None
+        try:
+            with open(self.data_file, "rb") as file:
+                header, self.block_start = read_header(file)
+                self.block_file = self._identity(file)
+        except FileNotFoundError:
+            return {}
+        return header
+
+    @staticmethod
+    def _identity(file):
+        stat = os.fstat(file.fileno())
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    @contextlib.contextmanager
+    def _mapped(self):
+        """
+        Die aktuelle Datei als mmap (None, wenn es noch keine gibt). Hat ein
+        anderer Prozess sie inzwischen neu geschrieben, wird vorher die Lage
+        der Blöcke aus ihrem Header übernommen (self.lock gehalten).
+        """
+        try:
+            file = open(self.data_file, "rb")
+        except FileNotFoundError:
+            yield None
+            return
+        with file:
+            identity = self._identity(file)
+            if identity != self.block_file:
+                header, self.block_start = read_header(file)
+                self.partitions = header.get("partitions", {})
+                self.block_file = identity
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                yield buffer
+
+    def _partition_sales(self, month):
+        with self._mapped() as buffer:
+            entry = self.partitions.get(month)
+            if buffer is None or entry is None:
+                return []
+            return decode_block(buffer, self.block_start + entry["offset"], entry.get("compression"))
+
+    def _snapshot_payload(self, generation, seq):
+        """
+        Kodiert die geänderten Monate und setzt sie mit den unveränderten
+        Blöcken der bisherigen Datei zu einer neuen zusammen (self.lock und
+        Dateisperre gehalten).
+        """
+        with self._mapped() as buffer:
+            months, partitions, changed = self._dirty_partitions()
+            blocks = {}
+            for month in sorted(partitions):
+                sales = changed.get(month)
+                if sales is None:
+                    blocks[month] = block_bytes(buffer, self.block_start, self.partitions[month])
+                else:
+                    partitions[month]["compression"] = self.compression
+                    blocks[month] = encode_block(sales, self.compression)
+        content, block_start = encode_file(self._manifest(generation, seq, partitions), blocks)
+        return months, partitions, content, block_start
+
+    def _write_snapshot_payload(self, payload, generation):
+        months, partitions, content, block_start = payload
+        try:
+            write_snapshot(content, self.data_file, self.journal_file, generation)
+        except OSError:
+            self.dirty |= months
+            raise
+        self.partitions = partitions
+        self.block_start = block_start
+        with open(self.data_file, "rb") as file:
+            self.block_file = self._identity(file)
+
+
+SALE_COLUMNS = ("id", "user", "category", "date", "amount", "description", "buyer")
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS categories (
+    name TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS subcategories (
+    parent TEXT NOT NULL,
+    name TEXT NOT NULL,
+    price REAL,
+    PRIMARY KEY (parent, name)
+);
+CREATE TABLE IF NOT EXISTS sales (
+    id INTEGER NOT NULL,
+    user TEXT NOT NULL,
+    category TEXT NOT NULL,
+    date TEXT NOT NULL,
+    amount REAL NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    buyer TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sales_id ON sales (id);
+CREATE INDEX IF NOT EXISTS idx_sales_user ON sales (user, category);
+CREATE INDEX IF NOT EXISTS idx_sales_category ON sales (category);
+CREATE INDEX IF NOT EXISTS idx_sales_buyer ON sales (buyer);
+CREATE INDEX IF NOT EXISTS idx_sales_date ON sales (date);
+"""
+
+
+class SqliteBackend:
+    """
+    Eingebettete SQLite-Datenbank mit Indizes auf Benutzer, Kategorie,
+    Käufer und Datum. Nur Benutzer und Kategorien werden im Speicher
+    gehalten, Verkäufe werden per Index-Abfrage und SQL-Aggregat gelesen.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, db_file=None, rollup_file=None):
+        import sqlite3
+
+        self.db_file = db_file or DB_FILE
+        # Die Verbindung darf von mehreren Threads genutzt werden (z. B. Streamlit-Läufe);
+        # schreibt gerade ein anderer Prozess, wird bis zu 30 s gewartet
+        self.conn = sqlite3.connect(self.db_file, check_same_thread=False, timeout=30)
+        self.conn.executescript(SQLITE_SCHEMA)
+        self.conn.commit()
+        self.data = self._load_meta()
+        self.aggregates = self._load_aggregates()
+        self.text_index = None
+        self.leaderboards = None
+
+        # Neben der Datenbank, damit temporäre Datenbanken keinen Cache im Arbeitsverzeichnis hinterlassen
+        self.rollup_file = rollup_file or self.db_file + ".rollups.json"
+        self.rollups = load_rollups(self._file_version(), self.rollup_file) or self._load_rollups()
+
+        # Zählt jede Änderung, damit Ansichten erkennen, ob neu berechnet werden muss
+        self.version = 0
+        self.lock = threading.RLock()
+        self.needs_rewrite = False
+        # Ändert sich, sobald eine andere Verbindung geschrieben hat
+        self.data_version = self._data_version()
+
+    def _data_version(self):
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _next_id(self):
+        max_id = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM sales").fetchone()[0]
+        stored = self.conn.execute("SELECT value FROM meta WHERE key = 'next_id'").fetchone()
+        return max(max_id + 1, stored[0] if stored else 1)
+
+    def _load_meta(self):
+        data = {"users": {}, "categories": {}, "next_id": self._next_id()}
+        for username, password in self.conn.execute("SELECT username, password FROM users"):
+            data["users"][username] = password
+        for (name,) in self.conn.execute("SELECT name FROM categories ORDER BY rowid"):
+            data["categories"][name] = {"subcategories": {}}
+        for parent, name, price in self.conn.execute("SELECT parent, name, price FROM subcategories ORDER BY rowid"):
+            data["categories"].setdefault(parent, {"subcategories": {}})["subcategories"][name] = {"price": price}
+        return data
+
+    def _file_version(self):
+        return file_version((self.db_file, self.db_file + "-wal"))
+
+    def _load_aggregates(self):
+        # Einmal per GROUP BY aufbauen, danach inkrementell nachführen
+        aggregates = SalesAggregates()
+        rows = self.conn.execute("SELECT user, category, SUM(amount), COUNT(*) FROM sales GROUP BY user, category")
+        for user, category, revenue, count in rows:
+            aggregates.add_totals(user, category, revenue, count)
+        return aggregates
+
+    def _load_rollups(self):
+        rollups = SalesRollups()
+        rows = self.conn.execute(
+            "SELECT date, user, category, SUM(amount), COUNT(*) FROM sales GROUP BY date, user, category"
+        )
+        for date, user, category, revenue, count in rows:
+            rollups.add_totals(date, user, category, revenue, count)
+        return rollups
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """
+        Schreibende Transaktion; erhöht den Datenstand-Zähler `version`.
+        """
+        with self.lock, self.conn:
+            yield
+            self.version += 1
+
+    def _sales(self, where="", params=(), limit=""):
+        query = f"SELECT {', '.join(SALE_COLUMNS)} FROM sales {where} ORDER BY rowid {limit}"
+        return [dict(zip(SALE_COLUMNS, row)) for row in self.conn.execute(query, params)]
+
+    # --- Änderungen ---
+    def register(self, username, password):
+        self.data["users"][username] = password
+        with self._transaction():
+            self.conn.execute("INSERT OR REPLACE INTO users VALUES (?, ?)", (username, password))
+
+    def add_parent_category(self, name):
+        self.data["categories"][name] = {"subcategories": {}}
+        with self._transaction():
+            self.conn.execute("INSERT OR IGNORE INTO categories VALUES (?)", (name,))
+
+    def add_sub_category(self, parent, name, price):
+        parent_info = self.data["categories"].setdefault(parent, {"subcategories": {}})
+        parent_info["subcategories"][name] = {"price": price}
+        with self._transaction():
+            self.conn.execute("INSERT OR IGNORE INTO categories VALUES (?)", (parent,))
+            self.conn.execute("INSERT OR REPLACE INTO subcategories VALUES (?, ?, ?)", (parent, name, price))
+
+    def add_sale(self, sale):
+        """
+        Vergibt eine neue, fortlaufende ID und speichert den Verkauf.
+        """
+        return self.add_sales([sale])[0]
+
+    def add_sales(self, sales):
+        """
+        Speichert mehrere Verkäufe in einer einzigen Transaktion.
+        """
+        with self._transaction():
+            # Schreibsperre vor dem Vergeben der IDs holen, damit parallel
+            # laufende Prozesse nicht dieselben IDs vergeben
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.data["next_id"] = max(self.data["next_id"], self._next_id())
+            for sale in sales:
+                sale["id"] = self.data["next_id"]
+                self.data["next_id"] += 1
+            self.conn.executemany(
+                f"INSERT INTO sales ({', '.join(SALE_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [tuple(sale.get(column, "") for column in SALE_COLUMNS) for sale in sales],
+            )
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('next_id', ?)", (self.data["next_id"],))
+            for sale in sales:
+                self.aggregates.add(sale)
+                self.rollups.add(sale)
+                if self.text_index is not None:
+                    self.text_index.add(sale)
+                if self.leaderboards is not None:
+                    self.leaderboards.add(sale)
+        return [sale["id"] for sale in sales]
+
+    def delete_sales(self, sale_ids):
+        """
+        Löscht mehrere Verkäufe in einer einzigen Transaktion.
+        """
+        removed = []
+        with self._transaction():
+            for sale_id in sale_ids:
+                sales = self._sales("WHERE id = ?", (sale_id,))
+                if not sales:
+                    continue
+                self.conn.execute("DELETE FROM sales WHERE id = ?", (sale_id,))
+                for sale in sales:
+                    self.aggregates.remove(sale)
+                    self.rollups.remove(sale)
+                    if self.text_index is not None:
+                        self.text_index.remove(sale)
+                    if self.leaderboards is not None:
+                        self.leaderboards.remove(sale)
+                removed.append(sale_id)
+        return removed
+
+    def delete_sale(self, sale_id):
+        return self.delete_sales([sale_id])
+
+    @timed("poll_changes")
+    def poll_changes(self, blocking=True):
+        """
+        Übernimmt Änderungen anderer Prozesse. Verkäufe liegen ohnehin nicht
+        im Speicher; neu gelesen werden nur Stammdaten und Summen (per
+        GROUP BY). Gibt None zurück, wenn sich nichts geändert hat, sonst die
+        Menge der (Benutzer, Kategorie)-Paare mit geänderten Summen.
+        blocking=False wie bei JsonBackend.poll_changes.
+        """
+        if not self.lock.acquire(blocking):
+            return None
+        try:
+            data_version = self._data_version()
+            if data_version == self.data_version:
+                return None
+            self.data_version = data_version
+            before = self.aggregates.totals_by_user_category()
+            data = self._load_meta()
+            data["next_id"] = max(data["next_id"], self.data["next_id"])
+            self.data.clear()
+            self.data.update(data)
+            self.aggregates = self._load_aggregates()
+            self.rollups = self._load_rollups()
+            self.text_index = None
+            self.leaderboards = None
+            self.version += 1
+            after = self.aggregates.totals_by_user_category()
+            return {key for key in before.keys() | after.keys() if before.get(key) != after.get(key)}
+        finally:
+            self.lock.release()
+
+    def flush(self):
+        self.conn.commit()
+
+    def compact(self):
+        self.conn.commit()
+        save_rollups(self.rollups, self._file_version(), self.rollup_file)
+
+    def close(self):
+        self.compact()
+        self.conn.close()
+
+    # --- Abfragen ---
+    def sale_count(self):
+        return self.aggregates.count
+
+    def get_sale(self, sale_id):
+        sales = self._sales("WHERE id = ?", (sale_id,))
+        return sales[0] if sales else None
+
+    def all_sales(self):
+        return self._sales()
+
+    def iter_sales(self, batch_size=10000):
+        """
+        Liefert alle Verkäufe über einen Cursor, ohne sie gesammelt zu laden.
+        """
+        cursor = self.conn.execute(f"SELECT {', '.join(SALE_COLUMNS)} FROM sales ORDER BY rowid")
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for row in rows:
+                yield dict(zip(SALE_COLUMNS, row))
+
+    def sales_for_user(self, user):
+        return self._sales("WHERE user = ?", (user,))
+
+    def sales_for_category(self, category):
+        return self._sales("WHERE category = ?", (category,))
+
+    def sales_for_user_category(self, user, category, offset=0, limit=None, start=None, end=None):
+        return self._sales(
+            "WHERE user = ? AND category = ? AND date BETWEEN ? AND ?",
+            (user, category, start or "", end or "\uffff"),
+            f"LIMIT {-1 if limit is None else int(limit)} OFFSET {int(offset)}",
+        )
+
+    def sales_for_buyer(self, buyer):
+        return self._sales("WHERE buyer = ?", (buyer,))
+
+    def sales_between(self, start, end):
+        return self._sales("WHERE date BETWEEN ? AND ?", (start, end))
+
+    def month_sales(self, month):
+        return self.sales_between(month, month + "\uffff")
+
+    def query_sales(self, category=None, buyer=None, start=None, end=None, offset=0, limit=None):
+        conditions, params = [], []
+        for condition, value in (
+            ("category = ?", category),
+            ("buyer = ?", buyer),
+            ("date >= ?", start),
+            ("date <= ?", end),
+        ):
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        total = self.conn.execute(f"SELECT COUNT(*) FROM sales {where}", params).fetchone()[0]
+        rows = self._sales(where, params, f"LIMIT {-1 if limit is None else int(limit)} OFFSET {int(offset)}")
+        return rows, total
+
+    # Summen, Rollups und Indizes unter self.lock lesen: add_sales und
+    # poll_changes (z. B. aus einer anderen Streamlit-Sitzung) ändern oder
+    # ersetzen sie gleichzeitig
+    def overall_totals(self):
+        with self.lock:
+            return self.aggregates.overall_totals()
+
+    def totals_by_user(self):
+        with self.lock:
+            return self.aggregates.totals_by_user()
+
+    def totals_by_user_category(self):
+        with self.lock:
+            return self.aggregates.totals_by_user_category()
+
+    def totals_by_category(self):
+        with self.lock:
+            return self.aggregates.totals_by_category()
+
+    def period_aggregates(self, start=None, end=None):
+        """
+        Summen für einen Zeitraum aus den Tages-/Monats-Rollups.
+        """
+        with self.lock:
+            return self.rollups.aggregate(start, end)
+
+    def revenue_by_month(self, start=None, end=None):
+        with self.lock:
+            return self.rollups.revenue_by_month(start, end)
+
+    def search_sales(self, query, fields=None, substring=True, offset=0, limit=None):
+        """
+        Wie JsonBackend.search_sales; der Index wird einmal per Cursor
+        aufgebaut, die Treffer der Seite per ID nachgelesen.
+        """
+        with self.lock:
+            if self.text_index is None:
+                self.text_index = SalesSearch.build(self.iter_sales())
+            ids = self.text_index.search(query, fields, substring)
+        page = newest_first(ids, offset, limit)
+        rows = []
+        for first in range(0, len(page), 500):
+            chunk = page[first:first + 500]
+            rows += self._sales(f"WHERE id IN ({', '.join('?' * len(chunk))})", chunk)
+        rows.sort(key=lambda sale: sale["id"], reverse=True)
+        return rows, len(ids)
+
+    def leaderboard(self, dimension, n=10, start=None, end=None):
+        """
+        Wie JsonBackend.leaderboard; Käufersummen kommen per GROUP BY.
+        """
+        if start is None and end is None:
+            with self.lock:
+                if self.leaderboards is None:
+                    buyers = {
+                        buyer: [revenue, count]
+                        for buyer, revenue, count in self.conn.execute("SELECT buyer, SUM(amount), COUNT(*) FROM sales GROUP BY buyer")
+                    }
+                    self.leaderboards = SalesLeaderboards.build((), self.aggregates, buyers)
+                return self.leaderboards.top(dimension, n)
+        if dimension == "buyer":
+            totals = {
+                buyer: [revenue, count]
+                for buyer, revenue, count in self.conn.execute(
+                    "SELECT buyer, SUM(amount), COUNT(*) FROM sales WHERE date BETWEEN ? AND ? GROUP BY buyer",
+                    (start or "", end or "\uffff"),
+                )
+            }
+            return top_totals(totals, n)
+        period = self.period_aggregates(start, end)
+        return top_totals(period.by_user if dimension == "user" else period.by_category, n)
+
+
+def newest_first(ids, offset=0, limit=None):
+    """
+    IDs absteigend (neueste zuerst), nur die angeforderte Seite; mit
+    Limit ohne die ganze Menge zu sortieren.
+    """
+    if limit is None:
+        return sorted(ids, reverse=True)[offset:]
+    return heapq.nlargest(offset + limit, ids)[offset:]
+
+
+# ------------------------- Verkaufsregeln -------------------------
+def subcategory_price(categories, parent, subcategory):
+    """
+    Hinterlegter Preis einer Unterkategorie oder None.
+    """
+    return categories.get(parent, {}).get("subcategories", {}).get(subcategory, {}).get("price")
+
+
+def make_sale(categories, user, parent, subcategory, date=None, amount=None, description="", buyer=""):
+    """
+    Prüft die Angaben gegen den Kategorienbaum und baut einen Verkauf.
+    Ohne Betrag wird der Preis der Unterkategorie übernommen, ohne Datum
+    das heutige. Bei ungültigen Angaben wird ein ValueError ausgelöst.
+    """
+    for label, value in (("Überkategorie", parent), ("Unterkategorie", subcategory)):
+        if not isinstance(value, str):
+            raise ValueError(f"{label} muss ein Text sein: {value!r}")
+    for label, value in (("Datum", date), ("Beschreibung", description), ("Käufer", buyer)):
+        if value is not None and not isinstance(value, str):
+            raise ValueError(f"{label} muss ein Text sein: {value!r}")
+    if parent not in categories:
+        raise ValueError(f"Unbekannte Überkategorie: {parent!r}")
+    if subcategory not in categories[parent].get("subcategories", {}):
+        raise ValueError(f"Unbekannte Unterkategorie: {parent!r} > {subcategory!r}")
+
+    if date:
+        datetime.strptime(date, "%Y-%m-%d")  # ValueError bei falschem Format
+    else:
+        date = datetime.now().strftime("%Y-%m-%d")
+
+    if amount is None or amount == "":
+        amount = subcategory_price(categories, parent, subcategory)
+        if amount is None:
+            raise ValueError(f"Kein Betrag und kein Preis für {parent} > {subcategory}")
+    try:
+        amount = float(amount)
+    except (TypeError, ValueError):
+        raise ValueError(f"Betrag muss eine Zahl sein: {amount!r}")
+
+    return {
+        "user": user,
+        "category": f"{parent} > {subcategory}",
+        "date": date,
+        "amount": amount,
+        "description": description or "",
+        "buyer": buyer or "",
+    }
+
+
+def default_backend():
+    """
+    Backend laut VERKAUF_BACKEND; sonst SQLite, sobald die Datenbankdatei
+    existiert, dann der binäre Snapshot, die Monats-Partitionen und
+    ansonsten die JSON-Datei.
+    """
+    backend = os.environ.get("VERKAUF_BACKEND")
+    if backend:
+        return backend
+    if os.path.exists(DB_FILE):
+        return "sqlite"
+    if os.path.exists(BINARY_FILE):
+        return "binary"
+    if os.path.exists(MANIFEST_FILE):
+        return "partitioned"
+    return "json"
+
+
+def open_store(backend=None, write_behind=False):
+    """
+    Öffnet das konfigurierte Backend (ohne Angabe siehe default_backend).
+    Mit write_behind schreiben die JSON-Backends in einem Hintergrund-Thread;
+    SQLite schreibt ohnehin nur die geänderten Zeilen.
+    """
+    backend = backend or default_backend()
+    if backend == "sqlite":
+        return SqliteBackend()
+    if backend == "json":
+        return JsonBackend(write_behind=write_behind)
+    if backend == "partitioned":
+        return PartitionedBackend(write_behind=write_behind)
+    if backend == "binary":
+        return BinaryBackend(write_behind=write_behind)
+    raise ValueError(f"Unbekanntes Speicher-Backend: {backend}")
+
+
+def migrate_json_to_sqlite(data_file=None, db_file=None, journal_file=None):
+    """
+    Einmalige Übernahme einer bestehenden verkauf_data.json (inkl. Journal)
+    in die SQLite-Datenbank. Gibt die Anzahl übernommener Verkäufe zurück.
+    """
+    data = load_data(data_file, journal_file)
+    db_file = db_file or DB_FILE
+    if os.path.exists(db_file):
+        raise FileExistsError(f"Datenbank existiert bereits: {db_file}")
+
+    store = SqliteBackend(db_file)
+    with store.conn:
+        store.conn.executemany("INSERT INTO users VALUES (?, ?)", data["users"].items())
+        for parent, info in data["categories"].items():
+            store.conn.execute("INSERT INTO categories VALUES (?)", (parent,))
+            store.conn.executemany(
+                "INSERT INTO subcategories VALUES (?, ?, ?)",
+                [(parent, name, sub.get("price")) for name, sub in info.get("subcategories", {}).items()],
+            )
+        store.conn.executemany(
+            f"INSERT INTO sales ({', '.join(SALE_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [tuple(sale.get(column, "") for column in SALE_COLUMNS) for sale in data["sales"]],
+        )
+        store.conn.execute("INSERT INTO meta VALUES ('next_id', ?)", (data["next_id"],))
+    # Rollups passend zur befüllten Datenbank neu aufbauen, bevor sie gespeichert werden
+    store.rollups = store._load_rollups()
+    store.close()
+    return len(data["sales"])
+
+
+def migrate_json_to_partitions(data_file=None, journal_file=None, directory=None):
+    """
+    Einmalige Aufteilung einer bestehenden verkauf_data.json (inkl. Journal)
+    in Monats-Partitionen. Gibt die Anzahl übernommener Verkäufe zurück.
+    """
+    data = load_data(data_file, journal_file)
+    directory = directory or PARTITION_DIR
+    if os.path.exists(os.path.join(directory, "manifest.json")):
+        raise FileExistsError(f"Partitionen existieren bereits: {directory}")
+
+    store = PartitionedBackend(directory)
+    with store.lock:
+        store.data["users"].update(data["users"])
+        store.data["categories"].update(data["categories"])
+        store.data["next_id"] = data["next_id"]
+        for sale in data["sales"]:
+            store._index(sale)
+        # Auch ohne Verkäufe schreiben (Benutzer und Kategorien stehen nicht im Journal)
+        store.needs_rewrite = True
+    store.close()
+    return len(data["sales"])
+
+
+def migrate_json_to_binary(data_file=None, journal_file=None, binary_file=None, compression=BINARY_COMPRESSION):
+    """
+    Einmalige Umwandlung einer bestehenden verkauf_data.json (inkl. Journal)
+    in den binären Snapshot. Gibt die Anzahl übernommener Verkäufe zurück.
+    """
+    data = load_data(data_file, journal_file)
+    binary_file = binary_file or BINARY_FILE
+    if os.path.exists(binary_file):
+        raise FileExistsError(f"Binärer Snapshot existiert bereits: {binary_file}")
+
+    store = BinaryBackend(binary_file, compression=compression)
+    with store.lock:
+        store.data["users"].update(data["users"])
+        store.data["categories"].update(data["categories"])
+        store.data["next_id"] = data["next_id"]
+        for sale in data["sales"]:
+            store._index(sale)
+        # Auch ohne Verkäufe schreiben (Benutzer und Kategorien stehen nicht im Journal)
+        store.needs_rewrite = True
+    store.close()
+    return len(data["sales"])
+
+
+def export_binary_to_json(binary_file=None, data_file=None, journal_file=None):
+    """
+    Umkehrung von migrate_json_to_binary: schreibt den binären Snapshot
+    (inkl. Journal) als verkauf_data.json. Gibt die Anzahl Verkäufe zurück.
+    """
+    data_file = data_file or DATA_FILE
+    if os.path.exists(data_file):
+        raise FileExistsError(f"JSON-Datei existiert bereits: {data_file}")
+
+    store = BinaryBackend(binary_file, eager_months=0)
+    with store.lock:
+        data = store.snapshot()
+        data["sales"] = sorted(store.iter_sales(), key=lambda sale: sale["id"])
+        save_data(data, data_file, journal_file)
+    return len(data["sales"])
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:2] == ["migrate"]:
+        n = migrate_json_to_sqlite()
+        print(f"{n} Verkäufe nach {DB_FILE} übernommen.")
+    elif sys.argv[1:2] == ["partition"]:
+        n = migrate_json_to_partitions()
+        print(f"{n} Verkäufe nach {PARTITION_DIR} aufgeteilt.")
+    elif sys.argv[1:2] == ["binary"]:
+        n = migrate_json_to_binary()
+        print(f"{n} Verkäufe nach {BINARY_FILE} umgewandelt.")
+    elif sys.argv[1:2] == ["json"]:
+        n = export_binary_to_json()
+        print(f"{n} Verkäufe aus {BINARY_FILE} nach {DATA_FILE} zurückgeschrieben.")
+    else:
+        print("Verwendung: python verkauf_storage.py migrate|partition|binary|json")
@@ -1,39 +1,164 @@
 import streamlit as st
-import json
+import threading
 from datetime import datetime
 
-# Datei für gespeicherte Daten
-DATA_FILE = "verkauf_data.json"
+import verkauf_metrics
+from verkauf_metrics import span
+from verkauf_storage import open_store
 
-# Daten laden und speichern
-def load_data():
-    with open(DATA_FILE, "r") as file:
-        return json.load(file)
+# Anzahl Verkäufe pro Seite in der Verkaufsliste
+PAGE_SIZE = 50
 
-def save_data(data):
-    with open(DATA_FILE, "w") as file:
-        json.dump(data, file, indent=4)
+# Ranglisten im Dashboard
+LEADERBOARD_SIZE = 10
+LEADERBOARDS = (("buyer", "Top-Käufer"), ("category", "Top-Kategorien"), ("user", "Top-Verkäufer"))
 
-data = load_data()
+# Suchfelder zur Auswahl (None = alle)
+SEARCH_FIELDS = {"Alle Felder": None, "Käufer": ("buyer",), "Beschreibung": ("description",), "Kategorie": ("category",)}
+
+# Das Backend wird über alle Läufe und Sitzungen hinweg gehalten. Änderungen
+# anderer Instanzen (z. B. der Tk-App) werden bei jedem Lauf nachgezogen;
+# dabei werden nur die neuen Einträge gelesen, nicht die ganze Datei.
+@st.cache_resource
+def store_cache():
+    return {"store": None, "lock": threading.Lock()}
+
+def get_store():
+    cache = store_cache()
+    with cache["lock"], span("streamlit.get_store"):
+        if cache["store"] is None:
+            cache["store"] = open_store()
+        else:
+            cache["store"].poll_changes()
+        return cache["store"]
 
 # Streamlit Layout
 st.set_page_config(page_title="Verkaufstool", layout="wide", initial_sidebar_state="expanded")
 
+# Speicher-Backend (JSON oder SQLite) öffnen
+store = get_store()
+data = store.data
+
 # Navigation
-menu = st.sidebar.radio("Menü", ["Dashboard", "Verkauf hinzufügen", "Kategorien verwalten", "Benutzer"])
+menu = st.sidebar.radio("Menü", ["Dashboard", "Suche", "Verkauf hinzufügen", "Kategorien verwalten", "Benutzer"])
 
 # Dashboard
 if menu == "Dashboard":
     st.title("📊 Dashboard Übersicht")
-    
-    total_sales = len(data["sales"])
-    total_revenue = sum(sale["amount"] for sale in data["sales"])
-    
-    st.metric("Gesamtumsatz (€)", f"{total_revenue:.2f}")
-    st.metric("Anzahl Verkäufe", total_sales)
 
-    for sale in data["sales"]:
-        st.write(f"- {sale['category']}: {sale['amount']} € (Käufer: {sale['buyer']}, Datum: {sale['date']})")
+    # Zeitraum gilt für Kennzahlen, Diagramme und Verkaufsliste
+    date_range = st.date_input("Zeitraum", value=())
+    start = end = None
+    if len(date_range) == 2:
+        start, end = str(date_range[0]), str(date_range[1])
+
+    with span("streamlit.kennzahlen"):
+        if start:
+            # Zeitraumabfragen laufen über die Tages-/Monats-Rollups
+            period = store.period_aggregates(start, end)
+            total_revenue, total_sales = period.overall_totals()
+            revenue_by_category = period.totals_by_category()
+            revenue_by_month = store.revenue_by_month(start, end)
+        else:
+            # Summen und Monatsumsätze aus Aggregaten und Rollups, ohne alle Verkäufe zu laden
+            total_revenue, total_sales = store.overall_totals()
+            revenue_by_category = store.totals_by_category()
+            revenue_by_month = store.revenue_by_month()
+
+        st.metric("Gesamtumsatz (€)", f"{total_revenue:.2f}")
+        st.metric("Anzahl Verkäufe", total_sales)
+
+        chart_left, chart_right = st.columns(2)
+        with chart_left:
+            st.subheader("Umsatz nach Kategorie")
+            st.bar_chart(revenue_by_category)
+        with chart_right:
+            st.subheader("Umsatz pro Monat")
+            st.bar_chart(revenue_by_month)
+
+    with span("streamlit.ranglisten"):
+        # Ranglisten aus den mitgeführten Top-K-Strukturen (mit Zeitraum aus den Rollups)
+        for column, (dimension, title) in zip(st.columns(len(LEADERBOARDS)), LEADERBOARDS):
+            with column:
+                st.subheader(title)
+                st.dataframe(
+                    [
+                        {"Name": name or "—", "Umsatz (€)": round(revenue, 2), "Anzahl": count}
+                        for name, revenue, count in store.leaderboard(dimension, LEADERBOARD_SIZE, start, end)
+                    ],
+                    use_container_width=True,
+                )
+
+    with span("streamlit.verkaufsliste"):
+        # Verkaufsliste: Filtern und Blättern passiert im Backend, angezeigt wird nur eine Seite
+        st.subheader("Verkäufe")
+        filter_category, filter_buyer = st.columns(2)
+        with filter_category:
+            category_filter = st.selectbox("Kategorie", ["Alle"] + sorted(store.totals_by_category()))
+        with filter_buyer:
+            buyer_filter = st.text_input("Käufer (exakt)")
+
+        _, match_count = store.query_sales(
+            category=None if category_filter == "Alle" else category_filter,
+            buyer=buyer_filter or None,
+            start=start,
+            end=end,
+            limit=0,
+        )
+        page_count = max(1, -(-match_count // PAGE_SIZE))
+        page = st.number_input(f"Seite (von {page_count})", min_value=1, max_value=page_count, value=1, step=1)
+        rows, _ = store.query_sales(
+            category=None if category_filter == "Alle" else category_filter,
+            buyer=buyer_filter or None,
+            start=start,
+            end=end,
+            offset=(page - 1) * PAGE_SIZE,
+            limit=PAGE_SIZE,
+        )
+        st.caption(f"{match_count} Treffer")
+        st.dataframe(
+            [
+                {"Kategorie": sale["category"], "Betrag (€)": sale["amount"], "Käufer": sale["buyer"], "Datum": sale["date"]}
+                for sale in rows
+            ],
+            use_container_width=True,
+        )
+
+# Suche über Käufer, Beschreibung und Kategorie (invertierter Index im Backend)
+elif menu == "Suche":
+    st.title("🔍 Suche")
+
+    query_column, field_column, mode_column = st.columns([3, 1, 1])
+    with query_column:
+        query = st.text_input("Suchbegriff", placeholder="z. B. jonas2 oder Dark Matter")
+    with field_column:
+        field_choice = st.selectbox("Feld", list(SEARCH_FIELDS))
+    with mode_column:
+        prefix_only = st.checkbox("Nur Wortanfang")
+
+    with span("streamlit.suche"):
+        if query.strip():
+            _, match_count = store.search_sales(query, SEARCH_FIELDS[field_choice], not prefix_only, limit=0)
+            page_count = max(1, -(-match_count // PAGE_SIZE))
+            page = st.number_input(f"Seite (von {page_count})", min_value=1, max_value=page_count, value=1, step=1)
+            rows, _ = store.search_sales(
+                query, SEARCH_FIELDS[field_choice], not prefix_only, offset=(page - 1) * PAGE_SIZE, limit=PAGE_SIZE
+            )
+            st.caption(f"{match_count} Treffer")
+            st.dataframe(
+                [
+                    {
+                        "ID": sale["id"],
+                        "Datum": sale["date"],
+                        "Kategorie": sale["category"],
+                        "Käufer": sale["buyer"],
+                        "Beschreibung": sale["description"],
+                        "Betrag (€)": sale["amount"],
+                    }
+                    for sale in rows
+                ],
+                use_container_width=True,
+            )
 
 # Verkauf hinzufügen
 elif menu == "Verkauf hinzufügen":
@@ -53,7 +178,6 @@ elif menu == "Verkauf hinzufügen":
 
     if st.button("Verkauf hinzufügen"):
         new_sale = {
-            "id": len(data["sales"]) + 1,
             "user": "admin",  # Ersetze dies durch den aktuellen Benutzer
             "category": f"{parent_category} > {subcategory}",
             "date": str(date),
@@ -61,8 +185,7 @@ elif menu == "Verkauf hinzufügen":
             "description": description,
             "buyer": buyer
         }
-        data["sales"].append(new_sale)
-        save_data(data)
+        store.add_sale(new_sale)
         st.success("Verkauf hinzugefügt!")
 
 # Kategorien verwalten
@@ -80,8 +203,7 @@ elif menu == "Kategorien verwalten":
         if new_category in data["categories"]:
             st.error("Kategorie existiert bereits.")
         else:
-            data["categories"][new_category] = {"subcategories": {}}
-            save_data(data)
+            store.add_parent_category(new_category)
             st.success("Überkategorie hinzugefügt!")
 
     st.subheader("Neue Unterkategorie hinzufügen")
@@ -94,8 +216,7 @@ elif menu == "Kategorien verwalten":
             if new_subcategory in data["categories"][parent_category]["subcategories"]:
                 st.error("Unterkategorie existiert bereits.")
             else:
-                data["categories"][parent_category]["subcategories"][new_subcategory] = {"price": price}
-                save_data(data)
+                store.add_sub_category(parent_category, new_subcategory, price)
                 st.success("Unterkategorie hinzugefügt!")
         else:
             st.error("Bitte Überkategorie auswählen.")
@@ -104,3 +225,19 @@ elif menu == "Kategorien verwalten":
 elif menu == "Benutzer":
     st.title("👤 Benutzerverwaltung")
     st.write("Hier können Benutzer verwaltet werden.")
+
+# Diagnose: Laufzeiten und Zähler dieses Streamlit-Prozesses (VERKAUF_METRICS=1)
+if verkauf_metrics.ENABLED:
+    with st.sidebar.expander("🩺 Diagnose"):
+        summary = verkauf_metrics.registry.summary()
+        st.dataframe(
+            [
+                {"Messpunkt": name, "Aufrufe": values["calls"], "p50 (ms)": round(values["p50_ms"], 1),
+                 "p95 (ms)": round(values["p95_ms"], 1), "max (ms)": round(values["max_ms"], 1)}
+                for name, values in summary["timings"].items()
+            ],
+            use_container_width=True,
+        )
+        for name, value in summary["counters"].items():
+            st.write(f"{name}: {value}")
+        st.download_button("Als JSON-Zeilen herunterladen", verkauf_metrics.registry.jsonl(), file_name="verkauf_metrics.jsonl")